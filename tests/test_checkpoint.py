@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from v2.checkpoint import ant_arrays
+from v2.convergence import SteadyVisits
+from v2.model import Board
+from v2.visits import VisitLog, load
+
+FOOD = {(40, 20) : 60, (20, 44) : 60}
+
+
+def run(board, minutes, directory, **options):
+    log = VisitLog(FOOD, path=str(directory / 'run.visits'))
+    remaining = board.run(
+        minutes, FOOD, path=None, verbose=False, checkpoint=str(directory / 'run.ckpt'), checkpoint_interval=2,
+        observers=[log], stop=[SteadyVisits(window=2, tolerance=0)], **options,
+    )
+    return board, remaining, load(str(directory / 'run.visits'))[0]
+
+
+@pytest.mark.parametrize('engine', ["objects", "arrays"])
+@pytest.mark.parametrize('storage', ["dense", "tiled"])
+def test_resumed_run_matches_an_uninterrupted_run(tmp_path, engine, storage):
+    options = {'size' : 64, 'engine' : engine, 'storage' : storage, 'evaporation' : "linear", 'seed' : 11}
+    (tmp_path / 'whole').mkdir()
+    (tmp_path / 'parts').mkdir()
+    whole, expected, expected_events = run(Board(**options), 6, tmp_path / 'whole')
+
+    #Checkpointed after minutes 2 and 4 (both slots, the second time only the changed tiles),
+    #then interrupted after minute 5, whose work is lost
+    run(Board(**options), 5, tmp_path / 'parts')
+    resumed, remaining, events = run(Board.resume(str(tmp_path / 'parts' / 'run.ckpt')), 6, tmp_path / 'parts')
+
+    assert whole.stop_reason is None and resumed.stop_reason is None
+    assert np.array_equal(remaining, expected)
+    assert resumed.time == whole.time
+    assert np.array_equal(resumed.pheromones.to_array(), whole.pheromones.to_array())
+    assert np.array_equal(resumed.food.to_array(), whole.food.to_array())
+    assert resumed.rng.bit_generator.state == whole.rng.bit_generator.state
+    for field, values in ant_arrays(whole).items():
+        assert np.array_equal(ant_arrays(resumed)[field], values), field
+    assert np.array_equal(np.array(events), np.array(expected_events))
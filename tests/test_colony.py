@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from v2.colony import deposit_pheromones
+from v2.lattice import Lattice
+
+TAU = 8
+SATURATION = 100
+
+
+def lattice_with_trails(seed):
+    lattice = Lattice(16)
+    rng = np.random.default_rng(seed)
+    for x, y in zip(*np.nonzero(rng.random((16, 16)) < 0.5)):
+        lattice.set(x, y, rng.uniform(0, 150))
+    return lattice
+
+
+def ants(seed, shared):
+    rng = np.random.default_rng(seed)
+    if shared:
+        #Many ants on a few cells
+        x, y = rng.integers(0, 4, 200), rng.integers(0, 4, 200)
+    else:
+        cells = rng.choice(16 * 16, 100, replace=False)
+        x, y = cells // 16, cells % 16
+    return x, y, rng.integers(0, 60, len(x)) * (rng.random(len(x)) < 0.5)
+
+
+def deposit_sequentially(lattice, x, y, food_seen):
+    #The per-ant loop Board.deposit used to run
+    for ant_x, ant_y, ant_food_seen in zip(x, y, food_seen):
+        pheromone = lattice.get(ant_x, ant_y)
+        pheromone -= ((TAU / SATURATION) * pheromone)
+        pheromone += TAU
+        pheromone += ant_food_seen
+        lattice.set(ant_x, ant_y, pheromone)
+
+
+def deposit_simultaneously(lattice, x, y, food_seen):
+    #Every ant sees the pheromone from before the step
+    before = lattice.values.copy()
+    deposits = {}
+    for ant_x, ant_y, ant_food_seen in zip(x, y, food_seen):
+        count, seen = deposits.get((ant_x, ant_y), (0, 0))
+        deposits[(ant_x, ant_y)] = (count + 1, seen + ant_food_seen)
+    for (ant_x, ant_y), (count, seen) in deposits.items():
+        pheromone = before[ant_x, ant_y]
+        pheromone = max(pheromone - count * (TAU / SATURATION) * pheromone, 0)
+        lattice.set(ant_x, ant_y, pheromone + count * TAU + seen)
+
+
+@pytest.mark.parametrize('semantics, reference', [("sequential", deposit_sequentially), ("simultaneous", deposit_simultaneously)])
+@pytest.mark.parametrize('shared', [False, True])
+def test_batched_deposit_matches_a_per_ant_loop(semantics, reference, shared):
+    for seed in range(3):
+        x, y, food_seen = ants(seed, shared)
+        expected = lattice_with_trails(seed)
+        reference(expected, x, y, food_seen)
+        lattice = lattice_with_trails(seed)
+        deposit_pheromones(lattice, x, y, food_seen, TAU, SATURATION, semantics)
+        if shared:
+            #Closed form powers round differently from repeated updates
+            assert np.allclose(lattice.values, expected.values, rtol=1e-12, atol=0)
+        else:
+            assert np.array_equal(lattice.values, expected.values)
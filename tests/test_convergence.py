@@ -0,0 +1,32 @@
+import numpy as np
+
+from v2.convergence import StationaryPopulation, SteadyVisits
+from v2.model import Board
+from v2.visits import VisitLog
+
+FOOD = {(30, 20) : 40, (20, 40) : 40}
+
+
+def run(board, minutes, detector, **options):
+    board.run(minutes, FOOD, path=None, verbose=False, stop=[detector], observers=[VisitLog(FOOD)], **options)
+    return board.time // 60, board.stop_reason
+
+
+def test_resumed_detectors_stop_at_the_same_minute(tmp_path):
+    for detector in (lambda: StationaryPopulation(window=4, tolerance=0.3), lambda: SteadyVisits(window=3, tolerance=0.3, min_visits=5)):
+        expected = run(Board(size=64, seed=3, engine='arrays'), 30, detector())
+        assert 4 < expected[0] < 30
+        #Interrupted after minute 4, inside the detector's first window
+        path = str(tmp_path / repr(detector()))
+        run(Board(size=64, seed=3, engine='arrays'), 4, detector(), checkpoint=path, checkpoint_interval=2)
+        assert run(Board.resume(path), 30, detector()) == expected
+
+
+def test_steady_visits_counts_the_visit_log():
+    board = Board(size=64, seed=3, engine='arrays')
+    detector = SteadyVisits(window=3)
+    log = VisitLog(FOOD)
+    board.run(3, FOOD, path=None, verbose=False, stop=[detector], observers=[log])
+    counted = log.totals.copy()
+    assert np.array_equal(counted, np.bincount(log.events()['source'], minlength=len(FOOD)))
+    assert np.array_equal(detector.counted, counted)
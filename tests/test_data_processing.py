@@ -0,0 +1,52 @@
+import numpy as np
+
+from v2.data_processing import RunningStatistics, read_visits, source_fractions, summarize_files
+from v2.model import Board
+from v2.recorder import Recorder
+from v2.sweep import ResultCache, run_sweep
+from v2.visits import VisitLog
+
+
+def test_every_output_format_counts_the_first_minute(tmp_path):
+    food = {(70, 64) : 30, (58, 64) : 20}
+    recording = str(tmp_path / 'run.bin')
+    log = str(tmp_path / 'run.visits')
+    board = Board(size=128, engine="arrays", seed=3)
+    remaining = board.run(
+        4, food, path=str(tmp_path / 'run.csv'), verbose=False,
+        recorder=Recorder(food, path=recording), observers=[VisitLog(food, path=log)],
+    )
+    cache = ResultCache(str(tmp_path / 'cache'))
+    cache.put('run', remaining, initial=list(food.values()))
+
+    expected = -np.diff(np.concatenate([[list(food.values())], remaining]), axis=0)
+    assert expected[0].sum() > 0
+    for path in (str(tmp_path / 'run.csv'), recording, log, cache.path('run')):
+        _, chunks = read_visits(path, chunksize=3)
+        assert np.array_equal(np.concatenate(list(chunks)), expected), path
+
+
+def test_sweep_results_summarize_with_csv_files(tmp_path):
+    food = {(70, 64) : 30, (58, 64) : 20}
+    csv_path = str(tmp_path / 'run.csv')
+    Board(size=128, engine="arrays", seed=3).run(3, food, path=csv_path, verbose=False)
+    results = run_sweep([{'min_phi' : 247}], 3, ResultCache(str(tmp_path / 'cache')), food_locations=food,
+                        board_options={'size' : 128, 'engine' : "arrays"}, workers=1)
+    npy_path = ResultCache(str(tmp_path / 'cache')).path(results[0]['key'])
+
+    locations, visits, _ = summarize_files([csv_path, npy_path])
+    assert locations == [str(location) for location in food]
+    assert visits.count.tolist() == [2, 2, 2]
+
+
+def test_minutes_without_visits_are_left_out_of_the_fractions():
+    runs = [np.array([[3., 1.], [0., 0.]]), np.array([[1., 1.], [2., 2.]]), np.array([[0., 0.], [0., 0.]])]
+    whole, first, rest = (RunningStatistics(2) for _ in range(3))
+    for i, visits in enumerate(runs):
+        whole.add(source_fractions(visits))
+        (first if i == 0 else rest).add(source_fractions(visits))
+    first.merge(rest)
+    for statistics in (whole, first):
+        assert statistics.count.tolist() == [2, 1]
+        assert np.allclose(statistics.mean, [[0.625, 0.375], [0.5, 0.5]])
+        assert np.allclose(statistics.mean.sum(axis=1), 1)
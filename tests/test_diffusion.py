@@ -0,0 +1,27 @@
+import numpy as np
+
+from v2.lattice import Lattice
+from v2.model import Board
+
+
+def test_dense_and_tiled_boards_diffuse_alike():
+    food = {(80, 64) : 50, (50, 64) : 50}
+    pheromones = {}
+    for storage in ("dense", "tiled"):
+        board = Board(size=128, engine="arrays", seed=2, storage=storage, diffusion=0.2, diffusion_interval=2,
+                      evaporation="exponential", evaporation_rate=0.02)
+        board.run(2, food, path=None, verbose=False)
+        pheromones[storage] = board.pheromones.to_array()
+    assert pheromones["dense"].sum() > 0
+    assert np.array_equal(pheromones["dense"], pheromones["tiled"])
+
+
+def test_dense_lattices_are_scanned_only_once(monkeypatch):
+    board = Board(size=256, engine="arrays", seed=1, diffusion=0.5)
+    board.add_food({(140, 128) : 20})
+    board.step()
+    scans = []
+    monkeypatch.setattr(Lattice, 'occupied_tiles', lambda lattice, tile_size: scans.append(tile_size))
+    for _ in range(5):
+        board.step()
+    assert scans == []
@@ -0,0 +1,22 @@
+import numpy as np
+
+from v2.model import Board
+
+FOOD = {(44, 32) : 200, (20, 32) : 200}
+SEEDS = range(10)
+
+
+def food_taken(engine):
+    taken = []
+    for seed in SEEDS:
+        remaining = Board(size=64, engine=engine, seed=seed).run(2, FOOD, path=None, verbose=False)
+        taken.append(sum(FOOD.values()) - remaining[-1].sum())
+    return np.array(taken)
+
+
+def test_engines_agree_statistically():
+    objects, arrays = food_taken("objects"), food_taken("arrays")
+    assert objects.mean() > 0 and arrays.mean() > 0
+    #The engines draw their random numbers differently, so only their means must agree
+    error = np.sqrt(objects.var(ddof=1) / len(objects) + arrays.var(ddof=1) / len(arrays))
+    assert abs(objects.mean() - arrays.mean()) < 4 * error
@@ -0,0 +1,46 @@
+import numpy as np
+
+from v2.checkpoint import ant_arrays
+from v2.ensemble import run_ensemble
+from v2.model import Board
+
+FOOD = {(30, 20) : 10, (20, 40) : 10}
+
+
+def test_ensemble_with_every_trial_failed_is_empty(tmp_path):
+    ensemble = run_ensemble(2, 1, FOOD, workers=1, board_options={'size' : 64, 'engine' : 'bogus'}, retries=0)
+    assert ensemble.failed == [0, 1]
+    assert ensemble.visits().shape == (0, 0, len(FOOD))
+    assert ensemble.mean().shape == (0, len(FOOD))
+    assert np.array_equal(ensemble.counts(), [])
+    path = tmp_path / 'ensemble.csv'
+    ensemble.to_csv(str(path))
+    assert path.read_text().strip() == 'minute,location,mean,variance,low,high'
+
+
+def test_trials_do_not_depend_on_the_worker_count():
+    runs = [
+        run_ensemble(4, 1, FOOD, seed=9, workers=workers, chunksize=chunksize, board_options={'size' : 64, 'engine' : engine})
+        for engine in ("objects", "arrays") for workers, chunksize in ((1, 1), (2, 1), (2, 3))
+    ]
+    for engine_runs in (runs[:3], runs[3:]):
+        first = engine_runs[0]
+        assert sorted(first.remaining) == [0, 1, 2, 3]
+        for ensemble in engine_runs[1:]:
+            for trial, remaining in first.remaining.items():
+                assert np.array_equal(ensemble.remaining[trial], remaining)
+    #Each trial has a seed of its own
+    assert not np.array_equal(runs[0].remaining[0], runs[0].remaining[1])
+
+
+def test_the_same_seed_gives_the_same_trajectory():
+    for engine in ("objects", "arrays"):
+        boards = [Board(size=64, engine=engine, seed=9) for _ in range(2)]
+        for board in boards:
+            board.add_food(FOOD)
+        for step in range(90):
+            counts = [board.step() for board in boards]
+            assert counts[0] == counts[1]
+            positions = [ant_arrays(board) for board in boards]
+            for field, values in positions[0].items():
+                assert np.array_equal(positions[1][field], values), (engine, step, field)
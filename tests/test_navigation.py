@@ -0,0 +1,26 @@
+import numpy as np
+
+from v2 import navigation
+from v2.navigation import navigation_field
+
+
+def test_fields_are_shared_and_the_cache_is_bounded():
+    assert navigation_field(32, [(16, 16)]) is navigation_field(32, [(16, 16)])
+    for size in range(8, 8 + 2 * navigation.MAX_FIELDS):
+        navigation_field(size, [(size // 2, size // 2)])
+    assert len(navigation.FIELDS) == navigation.MAX_FIELDS
+
+
+def test_obstacle_fields_route_around_walls():
+    obstacles = np.zeros((16, 16), dtype=bool)
+    obstacles[8, 2:14] = True
+    field = navigation_field(16, [(12, 8)], obstacles)
+    #Straight towards the nest runs into the wall, so the shortest path turns off it
+    x, y = 4, 8
+    for _ in range(40):
+        if (x, y) == (12, 8):
+            break
+        dx, dy = navigation.MOVES[field.heading(x, y)]
+        x, y = x + dx, y + dy
+        assert not obstacles[x, y]
+    assert (x, y) == (12, 8)
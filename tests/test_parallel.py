@@ -0,0 +1,29 @@
+import numpy as np
+
+from v2.parallel import DomainBoard
+
+
+def run_domain(workers, seed, minutes=2):
+    with DomainBoard(size=64, workers=workers, seed=seed, nests=[(16, 32), (48, 32)]) as board:
+        board.run(minutes, {(40, 20) : 50, (24, 44) : 50}, path=None, verbose=False)
+        ants = {field : getattr(board.ants, field).copy() for field in board.ants.fields}
+        return ants, board.pheromones.to_array().copy(), board.food.to_array().copy()
+
+
+def test_domain_board_is_repeatable_with_more_than_two_workers():
+    first_ants, first_pheromones, first_food = run_domain(4, 7)
+    for _ in range(2):
+        ants, pheromones, food = run_domain(4, 7)
+        for field, values in first_ants.items():
+            assert np.array_equal(ants[field], values), field
+        assert np.array_equal(pheromones, first_pheromones)
+        assert np.array_equal(food, first_food)
+
+
+def test_added_ants_are_stepped_by_the_strip_that_holds_them():
+    with DomainBoard(size=64, workers=4, seed=7) as board:
+        xs = np.array([1, 20, 40, 62])
+        board.add_ants(x=xs, y=xs, direction=np.zeros(4, dtype=np.int64), food_seen=0, nest_x=32, nest_y=32, nest=0, id=-1 - np.arange(4))
+        assert sorted(board.ants.x.tolist()) == xs.tolist()
+        board.advance(1)
+        assert set(board.ants.id.tolist()) >= {-1, -2, -3, -4}
@@ -0,0 +1,42 @@
+import numpy as np
+
+from v2.lattice import Lattice, PRECISIONS
+from v2.model import Board
+
+SEEDS = range(4)
+
+
+def trail_statistics(precision):
+    """
+    Returns the mean food collected and the mean number of trail cells over a few seeded runs
+    """
+    food = {(110, 96) : 200, (80, 96) : 200}
+    collected, trails = [], []
+    for seed in SEEDS:
+        board = Board(size=192, engine="arrays", seed=seed, precision=precision, evaporation="exponential", evaporation_rate=0.01)
+        remaining = board.run(4, food, path=None, verbose=False)
+        collected.append(sum(food.values()) - remaining[-1].sum())
+        trails.append(np.count_nonzero(board.pheromones.to_array() > 0.5))
+    return np.mean(collected), np.mean(trails)
+
+
+def test_reduced_precisions_keep_the_trail_statistics_of_float64():
+    reference_collected, reference_trails = trail_statistics("float64")
+    assert reference_collected > 0
+    for precision in ("float32", "fixed16"):
+        collected, trails = trail_statistics(precision)
+        assert abs(collected - reference_collected) <= 0.25 * reference_collected, precision
+        assert abs(trails - reference_trails) <= 0.1 * reference_trails, precision
+
+
+def test_fixed16_saturates_instead_of_wrapping():
+    dtype, scale = PRECISIONS["fixed16"]
+    lattice = Lattice(4, dtype=dtype, scale=scale)
+    largest = np.iinfo(dtype).max / scale
+    lattice.set(1, 1, 4000)
+    lattice.add(1, 1, 500)
+    assert lattice.get(1, 1) == largest
+    lattice.scatter_add(np.array([2, 2, 2]), np.array([2, 2, 2]), 2000)
+    assert lattice.get(2, 2) == largest
+    lattice.add(1, 1, -10000)
+    assert lattice.get(1, 1) == 0
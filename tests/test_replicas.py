@@ -0,0 +1,38 @@
+import numpy as np
+
+from v2.model import Board
+from v2.replicas import ReplicaBoard
+
+FOOD = {(44, 32) : 200, (20, 32) : 200}
+REPLICAS = 12
+
+
+def test_replicas_match_board_statistics():
+    remaining = ReplicaBoard(REPLICAS, size=64, seed=0).run(2, FOOD)
+    replicas = sum(FOOD.values()) - remaining[:, -1].sum(axis=1)
+    boards = np.array([
+        sum(FOOD.values()) - Board(size=64, engine="arrays", seed=seed).run(2, FOOD, path=None, verbose=False)[-1].sum()
+        for seed in range(REPLICAS)
+    ])
+    assert replicas.mean() > 0 and boards.mean() > 0
+    error = np.sqrt(replicas.var(ddof=1) / len(replicas) + boards.var(ddof=1) / len(boards))
+    assert abs(replicas.mean() - boards.mean()) < 4 * error
+
+
+def test_replicas_have_their_own_parameters():
+    #Without food, the second replica's ants deposit nothing, and they explore straight ahead
+    board = ReplicaBoard(2, size=64, seed=0, deposition_rate=[8, 0], turning_kernel=[[.36, .047, .008, .004], [0, 0, 0, 0]])
+    assert board.tau.tolist() == [8, 0]
+    for step in range(60):
+        board.step()
+    pheromones = board.pheromones.to_array()
+    assert pheromones[0].any() and not pheromones[1].any()
+    straight = board.ants.replica == 1
+    dx, dy = board.ants.x[straight] - 32, board.ants.y[straight] - 32
+    assert straight.any() and ((dx == 0) | (dy == 0) | (abs(dx) == abs(dy))).all()
+
+    replica = np.repeat([0, 1], 10000)
+    turns = board.turning.sample(np.random.default_rng(0), len(replica), replica)
+    turning = turns[replica == 0] != 0
+    assert abs(turning.mean() - 2 * (.36 + .047 + .008 + .004)) < 0.02
+    assert not turns[replica == 1].any()
@@ -0,0 +1,18 @@
+import pytest
+
+from v2.sweep import ResultCache, run_sweep
+
+FOOD = {(30, 20) : 10, (20, 40) : 10}
+
+
+def test_failed_runs_record_their_error(tmp_path):
+    with pytest.warns(RuntimeWarning, match="failed"):
+        results = run_sweep([{'min_phi' : 247}], 1, ResultCache(str(tmp_path)), food_locations=FOOD,
+                            board_options={'size' : 64, 'engine' : 'bogus'}, workers=1)
+    assert 'remaining' not in results[0]
+    assert 'bogus' in results[0]['error']
+
+
+def test_points_need_a_food_layout(tmp_path):
+    with pytest.raises(ValueError, match="food_locations"):
+        run_sweep([{'min_phi' : 247}], 1, ResultCache(str(tmp_path)))
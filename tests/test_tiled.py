@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from v2.lattice import Lattice
+from v2.model import Board
+from v2.tiled import SparseLattice, TiledLattice
+
+FOOD = {(40, 20) : 30, (20, 44) : 30}
+
+
+def run(minutes=2, **options):
+    board = Board(size=64, seed=5, **options)
+    remaining = board.run(minutes, FOOD, path=None, verbose=False)
+    return board, remaining
+
+
+@pytest.mark.parametrize('engine', ["objects", "arrays"])
+@pytest.mark.parametrize('evaporation', [None, "linear", "exponential"])
+@pytest.mark.parametrize('precision', ["float64", "fixed16"])
+def test_tiled_storage_matches_dense_storage(engine, evaporation, precision):
+    options = {'engine' : engine, 'evaporation' : evaporation, 'evaporation_rate' : 0.5 if evaporation == "exponential" else 1, 'precision' : precision}
+    dense, dense_remaining = run(storage="dense", **options)
+    tiled, tiled_remaining = run(storage="tiled", **options)
+    assert np.array_equal(tiled_remaining, dense_remaining)
+    assert np.array_equal(tiled.food.to_array(), dense.food.to_array())
+    assert np.array_equal(tiled.pheromones.to_array(), dense.pheromones.to_array())
+    assert tiled.pheromones.to_array().any()
+
+
+def test_tiled_checkpoint_restores_exactly(tmp_path):
+    path = str(tmp_path / 'run.ckpt')
+    board = Board(size=64, seed=5, engine="arrays", storage="tiled", evaporation="linear")
+    board.run(2, FOOD, path=None, verbose=False, checkpoint=path, checkpoint_interval=1)
+    resumed = Board.resume(path)
+    assert resumed.time == board.time
+    assert np.array_equal(resumed.pheromones.to_array(), board.pheromones.to_array())
+    assert np.array_equal(resumed.food.to_array(), board.food.to_array())
+    for field in board.ants.fields:
+        assert np.array_equal(getattr(resumed.ants, field), getattr(board.ants, field)), field
+
+
+def test_tiled_storage_only_allocates_visited_tiles():
+    board = Board(size=16384, seed=5, engine="arrays", storage="tiled")
+    board.run(1, {(8200, 8192) : 10}, path=None, verbose=False)
+    assert board.pheromones.memory() < 2 ** 20
+
+
+@pytest.mark.parametrize('storage', ["tiled", "sparse"])
+def test_peek_reads_without_writing_or_building_a_dense_copy(storage, monkeypatch):
+    if storage == "tiled":
+        lattice, dense = TiledLattice(256, decay="exponential", decay_rate=0.1), Lattice(256, decay="exponential", decay_rate=0.1)
+    else:
+        lattice, dense = SparseLattice(256), Lattice(256, dtype=np.int32)
+    rng = np.random.default_rng(0)
+    xs, ys = rng.integers(0, 100, 50), rng.integers(0, 100, 50)
+    for target in (lattice, dense):
+        target.scatter_add(xs, ys, 5)
+        if target.decay is not None:
+            target.tick()
+    monkeypatch.setattr(type(lattice), 'values', property(lambda self: pytest.fail("built a dense copy")))
+    before = {name : np.copy(array) for name, array in vars(lattice).items() if isinstance(array, np.ndarray)}
+    read_xs, read_ys = rng.integers(-5, 260, (30, 3)), rng.integers(-5, 260, (30, 3))
+    read_xs[:10], read_ys[:10] = xs[:30].reshape(10, 3), ys[:30].reshape(10, 3)
+    assert np.array_equal(lattice.peek(read_xs, read_ys, fill=-1), dense.peek(read_xs, read_ys, fill=-1))
+    for name, array in before.items():
+        assert np.array_equal(getattr(lattice, name), array), name
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from v2.model import Board
+from v2.visits import VisitLog, load, visits_per_interval
+
+FOOD = {(40, 32) : 30, (24, 32) : 30}
+#Enough food to still be gathered after the checkpoint
+LASTING_FOOD = {(40, 32) : 300, (24, 32) : 300}
+
+
+@pytest.mark.parametrize('engine', ["objects", "arrays"])
+def test_every_food_taken_is_logged(engine):
+    log = VisitLog(FOOD, capacity=16)
+    remaining = Board(size=64, engine=engine, seed=4).run(3, FOOD, path=None, verbose=False, observers=[log])
+    events = log.events()
+    taken = np.array(list(FOOD.values())) - remaining[-1]
+    assert taken.sum() > 0
+    assert len(events) == taken.sum()
+    assert np.array_equal(np.bincount(events['source'], minlength=len(FOOD)), taken)
+    assert np.array_equal(log.totals, taken)
+    assert np.array_equal(visits_per_interval(events, len(FOOD)).sum(axis=0), taken)
+
+
+def test_a_resumed_log_drops_events_after_the_checkpoint(tmp_path):
+    path, checkpoint = str(tmp_path / 'run.visits'), str(tmp_path / 'run.ckpt')
+    board = Board(size=64, engine="arrays", seed=4)
+    board.run(3, LASTING_FOOD, path=None, verbose=False, checkpoint=checkpoint, checkpoint_interval=2, observers=[VisitLog(LASTING_FOOD, path=path)])
+    events, _ = load(path)
+    assert (events['step'] >= 120).any()
+    before = np.array(events[events['step'] < 120])
+
+    log = VisitLog(LASTING_FOOD, path=path)
+    log.start(Board.resume(checkpoint))
+    kept, header = load(path)
+    assert header['steps'] == 120
+    assert np.array_equal(np.array(kept), before)
+    assert np.array_equal(log.totals, np.bincount(before['source'], minlength=len(LASTING_FOOD)))
@@ -9,7 +9,8 @@ class Ant:
         self.direction = random.randint(1,7)
         self.mode = "explore"
         self.adjacent_cells_pheromones= []
-        self.nearby_food = []
+        self.food_target = None
+        self.food_direction = -1
         self.board_size = board_size
         self.turning_kernel = turning_kernel
         self.possible_moves = [(0, 1), (1, 1), (1,0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1)]
@@ -21,7 +22,7 @@ class Ant:
         """
         Returns true if the posotion is in the grid and false if else
             Parameters:
-                grid (df) : the dataframe to check
+                grid (Lattice) : the lattice to check
                 x (int) : x position
                 y (int) : y position
 
@@ -43,12 +44,12 @@ class Ant:
         self.x += self.possible_moves[self.direction][0]
         self.y += self.possible_moves[self.direction][1]
 
-    def find_adjacnet_cells_values(self, dataframe):
+    def find_adjacnet_cells_values(self, lattice):
         """
         Finds the values of the cells adjacent to the ant
 
             Parameters:
-                dataframe (df) : the dataframe to check
+                lattice (Lattice) : the lattice to check
             Returns
                 values (lst of floats) : the values of the adjecent cells
 
@@ -58,21 +59,13 @@ class Ant:
             i = i % 8 
             x = self.x + self.possible_moves[i][0] 
             y = self.y + self.possible_moves[i][1]
-            is_in_grid = self.is_in_grid(dataframe, x, y)
+            is_in_grid = self.is_in_grid(lattice, x, y)
             if is_in_grid:
-                values.append(dataframe[x][y])
+                values.append(lattice.get(x, y))
             else: 
                 values.append(0.0)
         return values
 
-    def smell_nearby_food(self, food):
-        min_x = max([self.x - self.k , 0])
-        max_x = min([self.x + self.k , self.board_size])
-        min_y = max([self.y - self.k , 0])
-        max_y = min([self.y + self.k , self.board_size])
-        return food.iloc[min_x:max_x, min_y:max_y]
-
-
     def follows_trail(self):
         """
         Determines if ant explores or follows a trail at any one time step.
@@ -119,24 +112,33 @@ class Ant:
         elif right > left :
             self.direction = (self.direction - 1) % 8 
 
+    def smell_food(self, target, direction):
+        """
+        Remembers the food the ant smells, as found for every ant at once by FoodIndex.query
+
+            Parameters:
+                target (tuple of ints or None) : the food cell the ant picked, None if it smells none
+                direction (int) : the direction towards it, -1 if there is none
+        """
+        self.food_target = target
+        self.food_direction = direction
+
     def gather(self, food, k):
         """
         Updates a food gather ant's potistion and direction 
         """ 
-        col = self.nearby_food.idxmax().idxmax()
-        row = self.nearby_food.max(axis=1).idxmax()
-        delta_x = np.sign(col - self.x)
-        delta_y = np.sign(row - self.y)
-        self.direction = self.possible_moves.index((delta_x, delta_y))
+        #An ant already standing on the food keeps its direction
+        if self.food_direction >= 0:
+            self.direction = self.food_direction
 
 
-    def go_home(self, food):
+    def go_home(self, navigation):
         """
         Updates a returning ant's potistion and direction 
+            Parameters:
+                navigation (NavigationField) : the precomputed headings towards the hive
         """
-        delta_x = np.sign((self.board_size // 2) - self.x)
-        delta_y = np.sign((self.board_size // 2) - self.y)
-        self.direction = self.possible_moves.index((delta_x, delta_y))
+        self.direction = navigation.heading(self.x, self.y)
 
 
     def determine_mode(self, food):
@@ -145,10 +147,10 @@ class Ant:
             if at_home:
                 return "explore"
         else: 
-            if self.mode == "gather" and food[self.x][self.y]:
-                food[self.x][self.y] -= 1
+            if self.mode == "gather" and food.get(self.x, self.y):
+                food.add(self.x, self.y, -1)
                 return "go_home"
-            elif self.nearby_food.any().any():
+            elif self.food_target is not None:
                 return "gather"
             elif self.follows_trail():
                 if (self.adjacent_cells_pheromones[1] != 0) and (self.adjacent_cells_pheromones[0] != self.adjacent_cells_pheromones[2]):
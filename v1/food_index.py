@@ -0,0 +1,139 @@
+import numpy as np
+from v2.colony import DIRECTION_OF
+
+#How an ant picks among the food cells it can smell
+RULES = ("richest", "nearest")
+
+
+class FoodIndex:
+    """The cells of a food lattice that hold food, bucketed on a coarse grid
+    The food cells are kept sorted by the square bucket of bucket_size cells they fall
+    in, so the cells near an ant are found by looking up the buckets around it instead
+    of scanning a window of the lattice. query() answers this for every ant at once.
+    Amounts are read from the lattice at query time, so food that runs out is ignored
+    straight away; empty cells are dropped from the index every compact_interval queries.
+    Call rebuild() after adding food.
+
+    Attributes:
+    food : Lattice
+        the food lattice
+    bucket_size : int
+        the width and height of a bucket
+    xs, ys : np arrays of ints
+        the positions of the indexed cells, sorted by bucket
+    buckets : np array of ints
+        the bucket of each indexed cell
+    """
+    def __init__(self, food, bucket_size, compact_interval=60):
+        """
+            Parameters:
+                food (Lattice) : the food lattice
+                bucket_size (int) : the width and height of a bucket, best set to the smelling radius
+                compact_interval (int) : the number of queries between removals of empty cells
+        """
+        self.food = food
+        self.bucket_size = max(int(bucket_size), 1)
+        self.buckets_per_row = -(-food.shape[1] // self.bucket_size)
+        self.compact_interval = compact_interval
+        self.queries = 0
+        self.rebuild()
+
+    def bucket_of(self, x, y):
+        return (x // self.bucket_size) * self.buckets_per_row + y // self.bucket_size
+
+    def rebuild(self):
+        """
+        Indexes every cell of the lattice that holds food
+        """
+        xs, ys = np.nonzero(self.food.values)
+        self.index(xs, ys)
+
+    def index(self, xs, ys):
+        buckets = self.bucket_of(xs, ys)
+        order = np.argsort(buckets, kind='stable')
+        self.xs, self.ys, self.buckets = xs[order], ys[order], buckets[order]
+
+    def compact(self):
+        """
+        Drops the cells whose food has run out
+        """
+        left = self.food.values[self.xs, self.ys] != 0
+        self.index(self.xs[left], self.ys[left])
+
+    def query(self, x, y, k, rule="richest"):
+        """
+        Finds the food each ant smells: the cells with min_x <= food_x < max_x and
+        min_y <= food_y < max_y, where min_x = x - k and max_x = x + k (the window
+        Ant.smell_nearby_food used to cut out of the lattice)
+            Parameters:
+                x, y (np arrays of ints) : the positions of the ants
+                k (int) : the smelling radius
+                rule (str) : "richest" picks the cell with the most food, like the old
+                    argmax over the window, "nearest" the closest cell (fewest moves away)
+                    and the most food among those. Ties go to the smallest x, then y.
+            Returns
+                found (np array of bools) : whether each ant smells any food
+                food_x, food_y (np arrays of ints) : the cell each ant picked, -1 if none
+                direction (np array of ints) : the direction from each ant towards its cell,
+                    -1 if it found none or is standing on it
+        """
+        if rule not in RULES:
+            raise ValueError(f"unknown rule {rule!r}, expected one of {RULES}")
+        self.queries += 1
+        if self.queries % self.compact_interval == 0:
+            self.compact()
+
+        x = np.asarray(x, dtype=np.int64)
+        y = np.asarray(y, dtype=np.int64)
+        count = len(x)
+        found = np.zeros(count, dtype=bool)
+        food_x = np.full(count, -1, dtype=np.int64)
+        food_y = np.full(count, -1, dtype=np.int64)
+        direction = np.full(count, -1, dtype=np.int64)
+        if count == 0 or len(self.xs) == 0:
+            return found, food_x, food_y, direction
+
+        #Every bucket the window of an ant can overlap
+        reach = -(-k // self.bucket_size)
+        ants = []
+        cells = []
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                bucket_x = x // self.bucket_size + dx
+                bucket_y = y // self.bucket_size + dy
+                valid = (bucket_x >= 0) & (bucket_y >= 0) & (bucket_y < self.buckets_per_row)
+                bucket = np.where(valid, bucket_x * self.buckets_per_row + bucket_y, -1)
+                starts = np.searchsorted(self.buckets, bucket, side='left')
+                ends = np.searchsorted(self.buckets, bucket, side='right')
+                lengths = np.where(valid, ends - starts, 0)
+                ant = np.repeat(np.arange(count), lengths)
+                offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+                ants.append(ant)
+                cells.append(starts[ant] + offsets)
+        ant = np.concatenate(ants)
+        cell = np.concatenate(cells)
+        cx, cy = self.xs[cell], self.ys[cell]
+
+        inside = (cx >= x[ant] - k) & (cx < x[ant] + k) & (cy >= y[ant] - k) & (cy < y[ant] + k)
+        amount = self.food.values[cx, cy]
+        keep = inside & (amount != 0)
+        ant, cx, cy, amount = ant[keep], cx[keep], cy[keep], amount[keep]
+        if len(ant) == 0:
+            return found, food_x, food_y, direction
+
+        if rule == "richest":
+            order = np.lexsort((cy, cx, -amount, ant))
+        else:
+            moves = np.maximum(np.abs(cx - x[ant]), np.abs(cy - y[ant]))
+            order = np.lexsort((cy, cx, -amount, moves, ant))
+        first = order[np.r_[True, ant[order][1:] != ant[order][:-1]]]
+        picked = ant[first]
+        found[picked] = True
+        food_x[picked] = cx[first]
+        food_y[picked] = cy[first]
+
+        delta_x = np.sign(food_x[picked] - x[picked])
+        delta_y = np.sign(food_y[picked] - y[picked])
+        moving = (delta_x != 0) | (delta_y != 0)
+        direction[picked[moving]] = DIRECTION_OF[delta_x[moving] + 1, delta_y[moving] + 1]
+        return found, food_x, food_y, direction
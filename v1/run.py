@@ -1,9 +1,16 @@
-import pandas as pd
+import os
+import sys
 import numpy as np
-import matplotlib.pyplot as plt
 import random
 from ant import Ant
 
+#The lattice layer and the ant pool are shared with the v2 package
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from v2.lattice import Lattice
+from v2.pool import AntPool
+from v2.navigation import navigation_field
+from food_index import FoodIndex
+
 class Model:
     """The model containing the lattice and a set of ants
 
@@ -20,6 +27,8 @@ class Model:
         the amount that the proability an ant will follow a trail increase per unit pheramone
     sautration_concentration: int
         the amount of pheramone above which an ant cannot differentiate. 
+    ants : AntPool
+        the ants on the lattice, at most max_ants of them
     """
     def __init__(self, 
         size, 
@@ -29,15 +38,19 @@ class Model:
         delta_phi = 0, 
         sauturation_concentration = 1,
         food_locations = [[0,0,0]],
-        k = 10):
+        k = 10,
+        evaporation = None,
+        max_ants = None):
 
-        self.ants = set()
-        self.pheromones = pd.DataFrame(np.zeros((size, size))) 
-        self.food = pd.DataFrame(np.zeros((size, size))) 
+        self.ants = AntPool(cap=max_ants)
+        self.evaporation_rate = 1 
+        self.pheromones = Lattice(size, dtype=np.float64, decay=evaporation, decay_rate=self.evaporation_rate)
+        self.food = Lattice(size, dtype=np.float64)
         self.food_locations = food_locations
+        self.navigation = navigation_field(size, [(size // 2, size // 2)])
+        self.food_index = None
         self.add_food(food_locations)
 
-        self.evaporation_rate = 1 
         self.tau = tau
 
         self.min_phi = min_phi
@@ -47,30 +60,35 @@ class Model:
 
         self.food_collected = 0
         self.k = k 
+        self.food_index = FoodIndex(self.food, k)
 
     def add_food(self, food_locations):
         for location in food_locations:
             x = location[0]
             y = location[1]
             amount = location[2]
-            self.food[x][y] = amount
+            self.food.set(x, y, amount)
+        if self.food_index is not None:
+            self.food_index.rebuild()
 
     def draw(self):
         """
         Draws the pheromones
         """
+        #Imported here so that importing the model stays fast
+        import matplotlib.pyplot as plt
         ant_xs = []
         ant_ys = []
         center_x, center_y = self.pheromones.shape[0] // 2, self.pheromones.shape[1] // 2
-        pheromones = self.pheromones.copy()
-        food = self.food.copy()
+        pheromones = self.pheromones.to_frame()
+        food = self.food.to_frame()
         food[food == 0] = np.nan
         for ant in self.ants:
             ant_xs.append((ant.x + .5))
             ant_ys.append((ant.y + .5))
         plt.pcolormesh(pheromones, cmap='Greys')
         plt.pcolormesh(food, cmap='jet')
-        cmap = plt.cm.get_cmap('jet')
+        cmap = plt.get_cmap('jet')
         cmap.set_bad(alpha=0)
 
         # plt.scatter(ant_xs, ant_ys) #this line is still in development
@@ -83,19 +101,19 @@ class Model:
             Parameters:
                 ant (Ant) : the ant which is depositing the pheramones
         """
-        for ant in self.ants.copy():
+        for ant in self.ants:
             if (ant.is_in_grid(self.pheromones)):
                 x = ant.x
                 y = ant.y
-                self.pheromones[x][y] += self.tau - (self.tau / self.sauturation_concentration) * self.pheromones[x][y] 
+                self.pheromones.add(x, y, self.tau - (self.tau / self.sauturation_concentration) * self.pheromones.get(x, y))
             else:
                 self.ants.remove(ant)
 
     def evaporate(self): 
         """
-        Subtracts a set amount of pheramones from all cells in pheromones
+        Subtracts a set amount of pheramones from all cells in pheromones (lazily, see Lattice)
         """
-        self.pheromones.where(self.pheromones == 0, self.pheromones - self.evaporation_rate)
+        self.pheromones.tick()
 
 
     def update_ants(self):
@@ -107,12 +125,18 @@ class Model:
         gatherers = 0 
         returners = 0 
 
-        for ant in self.ants:
+        #Every ant smells for food within k cells in one query
+        ants = list(self.ants)
+        xs = np.array([ant.x for ant in ants], dtype=np.int64)
+        ys = np.array([ant.y for ant in ants], dtype=np.int64)
+        found, food_xs, food_ys, food_directions = self.food_index.query(xs, ys, self.k)
+
+        for i, ant in enumerate(ants):
             if not ant.is_in_grid(self.pheromones):
                 self.ants.remove(ant)
             else:
                 ant.adjacent_cells_pheromones = ant.find_adjacnet_cells_values(self.pheromones)
-                ant.nearby_food = ant.smell_nearby_food(self.food)
+                ant.smell_food((int(food_xs[i]), int(food_ys[i])) if found[i] else None, int(food_directions[i]))
                 ant.mode = ant.determine_mode(self.food)
 
                 if ant.mode == "explore":
@@ -125,7 +149,7 @@ class Model:
                     ant.gather(self.food, 10)
                     gatherers += 1
                 else: 
-                    ant.go_home(self.food)
+                    ant.go_home(self.navigation)
                     returners += 1
 
                 ant.move()
@@ -133,8 +157,10 @@ class Model:
 
     def release_ant(self):
         """
-        Release a new ant from the hive
+        Release a new ant from the hive, unless the pool of ants is full
         """
+        if self.ants.full():
+            return
         starting_x, starting_y = self.pheromones.shape[0] // 2, self.pheromones.shape[1] // 2
         ant = Ant(self.pheromones.shape[0], self.turning_kernel, self.min_phi, self.delta_phi, self.sauturation_concentration, self.k)
         self.ants.add(ant)
@@ -157,7 +183,8 @@ class Model:
         """
         Saves the data in the model to csv's
         """
-        self.pheromones.to_csv("pheromones.csv")
+        import pandas as pd
+        self.pheromones.to_frame().to_csv("pheromones.csv")
         ant_xs = []
         ant_ys = []
         for ant in self.ants:
@@ -171,27 +198,25 @@ class Model:
     def run(self, minutes):
         for minute in range(minutes): 
             for seconds in range(60):
-                model.step()
+                self.step()
                 for i, (x, y, last) in enumerate(self.food_locations): 
-                    current = self.food[x][y]
+                    current = self.food.get(x, y)
                     self.food_locations[i][2] = current
             print(self.food_locations)
 
 
-size = 256
-tau = 8
-min_phi = 247
-turning_kernel = [.36, .047, .008, .004]
-food_locations =[[38, 38, 1000]]
-model = Model(size, tau, min_phi, turning_kernel, 0, tau, food_locations, k = 2)
-mins = 60
-
-
-model.run(1)
-model.draw()
-
-for ant in model.ants:
-    print(ant.nearby_food)
+if __name__ == "__main__":
+    size = 256
+    tau = 8
+    min_phi = 247
+    turning_kernel = [.36, .047, .008, .004]
+    food_locations =[[38, 38, 1000]]
+    model = Model(size, tau, min_phi, turning_kernel, 0, tau, food_locations, k = 2)
+    mins = 60
 
 
+    model.run(1)
+    model.draw()
 
+    for ant in model.ants:
+        print(ant.food_target)
@@ -0,0 +1,42 @@
+"""The ant foraging model
+The modules of this package import each other relatively, so they never clash with
+same-named modules elsewhere on the module search path. Run the scripts from the
+repository root as modules, e.g. python -m v2.model. The classes below are only
+imported the first time they are used, so importing the package costs no more than the
+modules actually needed.
+"""
+import importlib
+
+#The public names of the package and the module each one is defined in
+EXPORTS = {
+    'Board' : 'model',
+    'DomainBoard' : 'parallel',
+    'ReplicaBoard' : 'replicas',
+    'Colony' : 'colony',
+    'Lattice' : 'lattice',
+    'TiledLattice' : 'tiled',
+    'SparseLattice' : 'tiled',
+    'Recorder' : 'recorder',
+    'History' : 'history',
+    'Replay' : 'history',
+    'Profiler' : 'profiler',
+    'VisitLog' : 'visits',
+    'FoodExhausted' : 'convergence',
+    'StationaryPopulation' : 'convergence',
+    'SteadyVisits' : 'convergence',
+    'run_ensemble' : 'ensemble',
+    'run_sweep' : 'sweep',
+    'read_config' : 'cli',
+}
+
+__all__ = list(EXPORTS)
+
+
+def __getattr__(name):
+    if name not in EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module('.' + EXPORTS[name], __name__), name)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(EXPORTS))
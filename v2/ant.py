@@ -1,8 +1,7 @@
-import random 
 import numpy as np 
 
 class Ant():
-    def __init__(self, nest_location):
+    def __init__(self, nest_location, rng, nest=0, ant_id=0):
         """An Ant Object
         Attributes:
         x : int 
@@ -14,15 +13,25 @@ class Ant():
             where 0 is north, 1 is north-est, 2 is east, etc. 
         food_seen: int
             the amount food that was at a source when a retuning ant left it.  
-        nest_location : int
-            the x and y position of the nest (assumed to be the same)
-        """
+        nest_x, nest_y : int
+            the position of the ant's nest
+        nest : int
+            the index of the ant's nest on the board (see Board.nests)
+        id : int
+            the ant's number, unique on its board (see Board.released)
 
-        self.x = nest_location
-        self.y = nest_location
-        self.direction = random.randint(1,7)
+        nest_location is the (x, y) position of the nest, or a single int when x and y
+        are the same. The ant's starting direction is drawn from rng (a numpy Generator).
+        """
+        if isinstance(nest_location, (int, np.integer)):
+            nest_location = (nest_location, nest_location)
+        self.nest_x, self.nest_y = nest_location
+        self.x = self.nest_x
+        self.y = self.nest_y
+        self.direction = int(rng.integers(1, 8))
         self.food_seen = 0
-        self.nest_location = nest_location
+        self.nest = nest
+        self.id = ant_id
 
     def follow(self, nearby_pheromones):
         """
@@ -41,19 +50,13 @@ class Ant():
         elif right > left :
             self.direction = (self.direction - 1) % 8 
 
-    def explore(self, turning_kernel):
+    def explore(self, turn):
         """
         Updates an exploring ant's direction
             Parameters:
-                turning_kernel (lst) : a list of probabilities that an ant will turn a particular amount
+                turn (int) : the change in direction, drawn from the turning kernel (see colony.TurningKernel)
         """
-        prob_go_straight = 1 - 2 * sum(turning_kernel)
-        turning_probabilities = [prob_go_straight] + turning_kernel
-        turning_amount_choices = [0,1,2,3,4]
-        turn_amount = random.choices(turning_amount_choices, weights=turning_probabilities, k=1)[0]
-        turn_direction = random.randint(-1, 1) #left or right
-
-        new_direction = (self.direction + turn_amount * turn_direction + 8) % 8
+        new_direction = (self.direction + turn + 8) % 8
         self.direction  = new_direction
 
     def gather(self, nearby_food, food, possible_moves):
@@ -61,8 +64,10 @@ class Ant():
         Decrease food in field and send a gathering ant home 
             Parameters:
                 nearby_food (lst): the food amount in the three cells in front of the ant
-                food (df) : a dataframe of food values on board
+                food (Lattice) : a lattice of food values on board
                 possible_moves (lst) : a list of all possible moves
+            Returns
+                food_x, food_y (ints) : the cell the food was taken from
         """
         #Calculates where max nearby food is
         max_food_index = nearby_food.index(max(nearby_food)) - 1
@@ -71,25 +76,24 @@ class Ant():
         food_y = self.y + possible_moves[food_direction][1]
 
         #sets ant to return to the nest
-        self.food_seen = food[food_x][food_y]
+        self.food_seen = food.get(food_x, food_y)
         #removes 1 food from location
-        food[food_x][food_y] -= 1
+        food.add(food_x, food_y, -1)
+        return food_x, food_y
 
-    def go_to_nest(self, possible_moves):
+    def go_to_nest(self, navigation):
         """
         Updates a ants direction to point towards nest
             Parameters:
-                possible_moves (lst) : a list of all possible moves
+                navigation (NavigationField) : the precomputed headings towards each nest
         """
-        x_direction_of_nest = np.sign(self.nest_location - self.x)
-        y_direction_of_nest = np.sign(self.nest_location - self.y)
-        self.direction = possible_moves.index((x_direction_of_nest, y_direction_of_nest))
+        self.direction = navigation.heading(self.x, self.y, self.nest)
 
     def ant_at_nest(self):
         """
         Updates and retuning ant's status if it is at the nest
         """
-        at_nest = (self.x == self.nest_location and self.y == self.nest_location)
+        at_nest = (self.x == self.nest_x and self.y == self.nest_y)
         if self.food_seen and at_nest:
             # sets a retuning ant at nest food_seen to 0
             self.food_seen = 0
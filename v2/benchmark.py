@@ -0,0 +1,252 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+#Benchmarks never open a window
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import numpy as np
+from .model import Board
+
+V1_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'v1')
+
+#The models that can be benchmarked and the stages of their step, in the order step() runs them
+#(v1's Model has no list of its stages, so they are copied from its step(); a DomainBoard
+#steps in its worker processes, so only its whole step is timed)
+TARGETS = {
+    'v2-objects' : Board.phases,
+    'v2-arrays' : Board.phases,
+    'v1' : ('release_ant', 'deposit', 'evaporate', 'update_ants'),
+    'domain-1' : (),
+    'domain-2' : (),
+    'domain-4' : (),
+}
+
+#The single process targets, and the DomainBoard targets that show how it scales with workers
+MODELS = ['v2-objects', 'v2-arrays', 'v1']
+DOMAINS = ['domain-1', 'domain-2', 'domain-4']
+
+PRESETS = {
+    'quick' : {'targets' : MODELS, 'sizes' : [64, 256], 'ants' : [10, 1000], 'steps' : [100]},
+    'full' : {'targets' : MODELS, 'sizes' : [64, 256, 1024, 4096], 'ants' : [10, 1000, 10000, 100000], 'steps' : [100, 1000]},
+    'scaling' : {'targets' : ['v2-arrays'] + DOMAINS, 'sizes' : [4096], 'ants' : [100000], 'steps' : [100]},
+}
+
+#A DomainBoard is benchmarked with nests spread along x, so every strip has ants to step
+DOMAIN_NESTS = 4
+
+
+def build(target, size, ants, seed=0):
+    """
+    Builds a model with food and a preloaded population of ants spread uniformly over it
+        Parameters:
+            target (str) : one of TARGETS
+            size (int) : the width and height of the board
+            ants (int) : the number of ants to preload
+            seed (int) : the seed of the model and the ant placement
+        Returns
+            model (Board, DomainBoard or Model) : the model, ready to step (close a DomainBoard after use)
+    """
+    rng = np.random.default_rng(seed)
+    xs = rng.integers(0, size, ants)
+    ys = rng.integers(0, size, ants)
+    directions = rng.integers(0, 8, ants)
+    food_locations = {(3 * size // 4, size // 2) : 100, (size // 4, size // 2) : 10}
+
+    if target == 'v1':
+        #v1 has modules with the same names as v2's, so it is only ever imported in a fresh process
+        import random
+        sys.path.insert(0, V1_DIRECTORY)
+        from run import Model
+        from ant import Ant
+        random.seed(seed)
+        model = Model(size, 8, 247, [.36, .047, .008, .004], 0, 8, [[x, y, amount] for (x, y), amount in food_locations.items()])
+        for x, y, direction in zip(xs.tolist(), ys.tolist(), directions.tolist()):
+            ant = Ant(size, model.turning_kernel, model.min_phi, model.delta_phi, model.sauturation_concentration, model.k)
+            ant.x, ant.y, ant.direction = x, y, direction
+            model.ants.add(ant)
+        return model
+
+    if target.startswith('domain'):
+        from .parallel import DomainBoard
+        nests = [((2 * i + 1) * size // (2 * DOMAIN_NESTS), size // 2) for i in range(DOMAIN_NESTS)]
+        board = DomainBoard(size=size, workers=int(target.split('-')[1]), seed=seed, nests=nests)
+        board.add_food(food_locations)
+        nest = rng.integers(0, DOMAIN_NESTS, ants)
+        nest_x = np.array(nests)[nest, 0]
+        #Negative ids never clash with the ids of released ants
+        board.add_ants(x=xs, y=ys, direction=directions, food_seen=0, nest_x=nest_x, nest_y=size // 2, nest=nest, id=-1 - np.arange(ants))
+        return board
+
+    from .ant import Ant
+    engine = target.split('-')[1]
+    board = Board(size=size, engine=engine, seed=seed)
+    board.add_food(food_locations)
+    if engine == "arrays":
+        board.released = len(xs)
+        board.ants.append(x=xs, y=ys, direction=directions, food_seen=0, nest_x=size // 2, nest_y=size // 2, nest=0, id=np.arange(len(xs)))
+    else:
+        for x, y, direction in zip(xs.tolist(), ys.tolist(), directions.tolist()):
+            ant = Ant(size // 2, board.rng, ant_id=board.released)
+            board.released += 1
+            ant.x, ant.y, ant.direction = x, y, direction
+            board.ants.append(ant)
+    return board
+
+
+def run_case(target, size, ants, steps, repeat=1, seed=0):
+    """
+    Times the stages of a model's step and the whole step. Each repetition starts from a
+    freshly built model; the fastest repetition is kept.
+        Parameters:
+            target (str) : one of TARGETS
+            size (int) : the width and height of the board
+            ants (int) : the number of ants to preload
+            steps (int) : the number of steps to time
+            repeat (int) : the number of repetitions
+        Returns
+            result (dict) : the case, the seconds spent in each stage, steps/sec and ant-updates/sec
+    """
+    best = None
+    for repetition in range(repeat):
+        #Stage by stage, calling the stages in the same order as step()
+        stages = {stage : 0.0 for stage in TARGETS[target]}
+        if stages:
+            model = build(target, size, ants, seed)
+            for step in range(steps):
+                for stage in stages:
+                    start = time.perf_counter()
+                    getattr(model, stage)()
+                    stages[stage] += time.perf_counter() - start
+
+        #End to end, counting the ants updated every step
+        model = build(target, size, ants, seed)
+        updates = 0
+        start = time.perf_counter()
+        if hasattr(model, 'advance'):
+            #A DomainBoard's workers run every step on one command, as in DomainBoard.run
+            updates = int(model.advance(steps).sum())
+        else:
+            for step in range(steps):
+                updates += len(model.ants)
+                model.step()
+        seconds = time.perf_counter() - start
+        if hasattr(model, 'close'):
+            model.close()
+
+        if best is None or seconds < best['seconds']:
+            best = {
+                'target' : target,
+                'size' : size,
+                'ants' : ants,
+                'steps' : steps,
+                'seconds' : seconds,
+                'stages' : stages,
+                'steps_per_sec' : steps / seconds,
+                'ant_updates_per_sec' : updates / seconds,
+            }
+    return best
+
+
+def run_benchmarks(targets, sizes, ants, steps, repeat=1, seed=0):
+    """
+    Runs every combination of target, board size, ant population and step count, each in
+    a fresh process so cases cannot affect each other (and v1 and v2 can both be imported)
+        Returns
+            results (lst of dicts) : one result per case (see run_case)
+    """
+    results = []
+    context = get_context('spawn')
+    for target in targets:
+        if target not in TARGETS:
+            raise ValueError(f"unknown target {target!r}, expected one of {list(TARGETS)}")
+        for size in sizes:
+            for population in ants:
+                for count in steps:
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        result = executor.submit(run_case, target, size, population, count, repeat, seed).result()
+                    results.append(result)
+                    print(f"{target:>10} size {size:>5} ants {population:>6} steps {count:>5}: "
+                          f"{result['steps_per_sec']:10.1f} steps/s {result['ant_updates_per_sec']:12.0f} ant-updates/s")
+    return results
+
+
+def case_key(result):
+    return (result['target'], result['size'], result['ants'], result['steps'])
+
+
+def compare(results, baseline, threshold=0.1):
+    """
+    Compares results against a baseline
+        Parameters:
+            results (lst of dicts) : the results of run_benchmarks
+            baseline (lst of dicts) : earlier results
+            threshold (float) : the fractional slowdown in steps/sec that counts as a regression
+        Returns
+            regressions (lst of (dict, dict)) : the (result, baseline result) pairs that regressed
+    """
+    earlier = {case_key(result) : result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = earlier.get(case_key(result))
+        if previous is None:
+            continue
+        change = result['steps_per_sec'] / previous['steps_per_sec'] - 1
+        print(f"{result['target']:>10} size {result['size']:>5} ants {result['ants']:>6} steps {result['steps']:>5}: {change:+.1%}")
+        if change < -threshold:
+            regressions.append((result, previous))
+    return regressions
+
+
+def environment():
+    """
+    Returns a description of the machine the benchmarks ran on
+    """
+    return {
+        'python' : platform.python_version(),
+        'numpy' : np.__version__,
+        'platform' : platform.platform(),
+        'processor' : platform.processor(),
+        'time' : time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the stages of Board.step, DomainBoard steps and v1 Model.step")
+    parser.add_argument('--preset', choices=list(PRESETS), default='quick')
+    parser.add_argument('--targets', nargs='+', default=None,
+                        help=f"any of {list(TARGETS)}, by default those of the preset")
+    parser.add_argument('--sizes', nargs='+', type=int, default=None)
+    parser.add_argument('--ants', nargs='+', type=int, default=None)
+    parser.add_argument('--steps', nargs='+', type=int, default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--baseline', default=None, help="a json file of earlier results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args()
+
+    preset = PRESETS[args.preset]
+    results = run_benchmarks(
+        args.targets or preset['targets'],
+        args.sizes or preset['sizes'],
+        args.ants or preset['ants'],
+        args.steps or preset['steps'],
+        repeat = args.repeat,
+        seed = args.seed,
+    )
+    with open(args.output, 'w') as file:
+        json.dump({'environment' : environment(), 'results' : results}, file, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} cases are more than {args.threshold:.0%} slower than the baseline")
+            sys.exit(1)
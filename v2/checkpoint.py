@@ -0,0 +1,195 @@
+import json
+import os
+
+import numpy as np
+from .ant import Ant
+
+#The width and height of the lattice tiles that are rewritten when they change
+TILE_SIZE = 64
+
+#A checkpoint alternates between two snapshots, so one is always complete
+SLOTS = ('a', 'b')
+
+#The attributes saved for every Ant object
+ANT_FIELDS = ('x', 'y', 'direction', 'food_seen', 'nest_x', 'nest_y', 'nest', 'id')
+
+
+def write_json(path, data):
+    """
+    Writes a json file atomically
+    """
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(data, file)
+    os.replace(temporary, path)
+
+
+def read_json(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_lattice(lattice, directory, name, since):
+    """
+    Writes a lattice into memory-mapped .npy files, rewriting only the tiles that changed
+        Parameters:
+            lattice (Lattice) : the lattice to save
+            directory (str) : the snapshot directory
+            name (str) : the name of the lattice's files
+            since (int or None) : the generation the files were last written in, None to write them in full
+    """
+    if not lattice.dense:
+        #Tiled and sparse lattices only hold the cells in use, so they are written in full
+        np.savez(os.path.join(directory, name + '.npz'), **lattice.state())
+        return
+    arrays = {name : lattice.values}
+    if lattice.last is not None:
+        arrays[name + '_last'] = lattice.last
+    for file_name, array in arrays.items():
+        path = os.path.join(directory, file_name + '.npy')
+        if since is None or not os.path.exists(path):
+            np.save(path, array)
+            continue
+        snapshot = np.lib.format.open_memmap(path, mode='r+')
+        for region in lattice.changed_tiles(since):
+            snapshot[region] = array[region]
+        snapshot.flush()
+        del snapshot
+
+
+def load_lattice(lattice, directory, name):
+    """
+    Reads a lattice saved by save_lattice
+    """
+    if not lattice.dense:
+        with np.load(os.path.join(directory, name + '.npz')) as arrays:
+            lattice.restore(dict(arrays))
+        return
+    lattice.values[...] = np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')
+    if lattice.last is not None:
+        lattice.last[...] = np.load(os.path.join(directory, name + '_last.npy'), mmap_mode='r')
+
+
+def ant_arrays(board):
+    """
+    Returns the state of every ant on a board as a dict of arrays
+    """
+    if board.engine == "arrays":
+        return {field : getattr(board.ants, field) for field in board.ants.fields}
+    return {
+        field : np.array([getattr(ant, field) for ant in board.ants], dtype=np.int64)
+        for field in ANT_FIELDS
+    }
+
+
+def save(board, path, recorder=None, detectors=None):
+    """
+    Saves a snapshot of a board that Board.resume can continue from bit for bit.
+    The snapshot holds the lattices (as memory-mapped .npy files), every ant, the random
+    number generator, the current step, the recording so far and the windows of the
+    convergence detectors. Two snapshots are kept
+    and written alternately, and a manifest names the newest complete one, so a crash
+    while checkpointing never loses the previous checkpoint. Lattice files are updated
+    in place, rewriting only the tiles written since that snapshot was last saved.
+        Parameters:
+            board (Board) : the board to save
+            path (str) : the checkpoint directory
+            recorder (Recorder or None) : the recorder of the run, whose samples are saved too
+            detectors (lst or None) : the convergence detectors of the run (see convergence.py)
+    """
+    os.makedirs(path, exist_ok=True)
+    manifest_path = os.path.join(path, 'manifest.json')
+    newest = read_json(manifest_path)['slot'] if os.path.exists(manifest_path) else SLOTS[1]
+    slot = SLOTS[1 - SLOTS.index(newest)]
+    directory = os.path.join(path, slot)
+    os.makedirs(directory, exist_ok=True)
+
+    #The snapshot is incomplete until its state is written again
+    state_path = os.path.join(directory, 'state.json')
+    previous = read_json(state_path) if os.path.exists(state_path) else None
+    if previous is not None:
+        os.remove(state_path)
+
+    lattices = {'pheromones' : board.pheromones, 'food' : board.food}
+    generations = {}
+    for name, lattice in lattices.items():
+        if lattice.dense and lattice.tile_generation is None:
+            lattice.track_changes(TILE_SIZE)
+        since = None
+        if previous is not None and previous['lattices'][name]['tracking_id'] == lattice.tracking_id:
+            since = previous['lattices'][name]['generation']
+        save_lattice(lattice, directory, name, since)
+        generations[name] = {'tracking_id' : lattice.tracking_id, 'generation' : lattice.generation}
+        lattice.generation += 1
+
+    np.savez(os.path.join(directory, 'ants.npz'), **ant_arrays(board))
+    recording = None
+    if recorder is not None:
+        np.save(os.path.join(directory, 'recording.npy'), recorder.samples())
+        recording = recorder.state()
+
+    seed_sequence = board.seed_sequence
+    write_json(state_path, {
+        'options' : board.options(),
+        'time' : board.time,
+        'released' : board.released,
+        'pheromone_clock' : board.pheromones.clock,
+        'rng' : board.rng.bit_generator.state,
+        'seed_sequence' : {
+            'entropy' : seed_sequence.entropy,
+            'spawn_key' : list(seed_sequence.spawn_key),
+            'pool_size' : seed_sequence.pool_size,
+            'n_children_spawned' : seed_sequence.n_children_spawned,
+        },
+        'lattices' : generations,
+        'recording' : recording,
+        'detectors' : None if detectors is None else [detector.state() for detector in detectors],
+    })
+    write_json(manifest_path, {'slot' : slot, 'time' : board.time})
+
+
+def load(board_class, path):
+    """
+    Rebuilds a board from the newest complete snapshot in a checkpoint directory (see save)
+        Parameters:
+            board_class (type) : Board
+            path (str) : the checkpoint directory
+        Returns
+            board (Board) : the board, whose recording attribute holds the saved
+                (samples, recorder state) or None, and whose detection attribute holds the
+                saved detector states or None
+    """
+    slot = read_json(os.path.join(path, 'manifest.json'))['slot']
+    directory = os.path.join(path, slot)
+    state = read_json(os.path.join(directory, 'state.json'))
+
+    saved_seed = state['seed_sequence']
+    seed_sequence = np.random.SeedSequence(
+        saved_seed['entropy'],
+        spawn_key=tuple(saved_seed['spawn_key']),
+        pool_size=saved_seed['pool_size'],
+        n_children_spawned=saved_seed['n_children_spawned'],
+    )
+    board = board_class(seed=seed_sequence, **state['options'])
+    load_lattice(board.pheromones, directory, 'pheromones')
+    load_lattice(board.food, directory, 'food')
+    board.pheromones.clock = state['pheromone_clock']
+    board.time = state['time']
+    board.released = state['released']
+
+    with np.load(os.path.join(directory, 'ants.npz')) as ants:
+        if board.engine == "arrays":
+            board.ants.append(**{field : ants[field] for field in board.ants.fields})
+        else:
+            for values in zip(*(ants[field] for field in ANT_FIELDS)):
+                ant = Ant(board.nests[0], board.rng)
+                for field, value in zip(ANT_FIELDS, values):
+                    setattr(ant, field, int(value))
+                board.ants.append(ant)
+    #Restored last, as recreating the ants draws from the generator
+    board.rng.bit_generator.state = state['rng']
+
+    if state['recording'] is not None:
+        board.recording = (np.load(os.path.join(directory, 'recording.npy')), state['recording'])
+    board.detection = state['detectors']
+    return board
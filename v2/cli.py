@@ -0,0 +1,117 @@
+import argparse
+import json
+
+#The run a config file describes when it leaves a key out (the run model.py makes)
+DEFAULT_CONFIG = {
+    'board' : {},
+    'food' : [[192, 128, 100], [64, 128, 10]],
+    'minutes' : 60,
+    'output' : 'data.csv',
+    'recording' : None,
+    'checkpoint' : None,
+    'checkpoint_interval' : 5,
+    'draw' : True,
+    'stop' : None,
+}
+
+
+def read_config(path=None):
+    """
+    Reads a run description from a json config file, for example
+        {"board" : {"size" : 512, "engine" : "arrays", "seed" : 1},
+         "food" : [[192, 128, 100], [64, 128, 10]], "minutes" : 30, "draw" : false}
+        Parameters:
+            path (str or None) : the config file, None for the default run
+        Returns
+            config (dict) : every key of DEFAULT_CONFIG, where
+                board -> keyword arguments for Board
+                food -> [x, y, amount] of every food source
+                minutes -> how many minutes to simulate
+                output -> the csv file the remaining food is written to, or null
+                recording -> the file a Recorder flushes its samples to, or null
+                checkpoint -> the directory to checkpoint the run to (resumed from if it exists), or null
+                checkpoint_interval -> how many minutes pass between checkpoints
+                draw -> whether to draw the board at the end
+                stop -> convergence detectors that end the run early, e.g. {"food_exhausted" : {}},
+                    or null (see convergence.detectors)
+    """
+    config = dict(DEFAULT_CONFIG)
+    if path is not None:
+        with open(path) as file:
+            loaded = json.load(file)
+        unknown = set(loaded) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise ValueError(f"unknown config keys {sorted(unknown)}, expected some of {sorted(DEFAULT_CONFIG)}")
+        config.update(loaded)
+    return config
+
+
+def food_locations(config):
+    """
+    Returns the food of a config as the {(x, y) : amount} dict Board.run takes
+    """
+    return {(int(x), int(y)) : int(amount) for x, y, amount in config['food']}
+
+
+def run(config, verbose=True):
+    """
+    Runs the simulation a config describes
+        Returns
+            board (Board) : the board after the run
+            remaining (np array) : the food remaining at each location at each sample
+    """
+    import os
+    from .convergence import detectors
+    from .model import Board
+    from .recorder import Recorder
+
+    food = food_locations(config)
+    checkpoint = config['checkpoint']
+    if checkpoint is not None and os.path.exists(os.path.join(checkpoint, 'manifest.json')):
+        board = Board.resume(checkpoint)
+    else:
+        board = Board(**config['board'])
+    recorder = Recorder(food, path=config['recording'])
+    remaining = board.run(
+        config['minutes'],
+        food,
+        path=config['output'],
+        verbose=verbose,
+        recorder=recorder,
+        checkpoint=checkpoint,
+        checkpoint_interval=config['checkpoint_interval'],
+        stop=detectors(config['stop']),
+    )
+    return board, remaining
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Run the ant model as described by a json config file")
+    parser.add_argument('config', nargs='?', default=None, help="the config file (see cli.read_config), the default run if left out")
+    parser.add_argument('--minutes', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--no-draw', action='store_true')
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args(arguments)
+
+    try:
+        config = read_config(args.config)
+    except ValueError as error:
+        parser.error(str(error))
+    if args.minutes is not None:
+        config['minutes'] = args.minutes
+    if args.seed is not None:
+        config['board'] = dict(config['board'], seed=args.seed)
+    if args.output is not None:
+        config['output'] = args.output
+    if args.no_draw:
+        config['draw'] = False
+
+    board, _ = run(config, verbose=not args.quiet)
+    if config['draw']:
+        board.draw()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+import numpy as np
+
+#The eight compass moves, indexed the same way as Board.possible_moves
+MOVES = np.array([(0, 1), (1, 1), (1,0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1)])
+
+#Offsets of the left, straight and right cells relative to an ant's direction
+AHEAD = np.array([-1, 0, 1])
+
+#DIRECTION_OF[dx + 1, dy + 1] is the direction index of the move (dx, dy)
+DIRECTION_OF = np.zeros((3, 3), dtype=np.int64)
+for index, (dx, dy) in enumerate(MOVES):
+    DIRECTION_OF[dx + 1, dy + 1] = index
+
+
+class TurningKernel():
+    """The turns exploring ants make, compiled once into a cumulative distribution table
+    turning_kernel[i] is the probability that an exploring ant turns i + 1 steps to the
+    left, and also the probability that it turns i + 1 steps to the right, so the ant goes
+    straight with probability 1 - 2 * sum(turning_kernel).
+
+    The legacy kernel reproduces the original Ant.explore, which picked an amount with
+    weights [1 - 2 * sum(turning_kernel)] + turning_kernel and then a side from
+    randint(-1, 1). Because that side can be 0, the legacy kernel goes straight more
+    often and turns less often than turning_kernel says.
+
+    A kernel can also hold one turning kernel per replica (see replicas.ReplicaBoard).
+    Attributes:
+    turns : np array of ints
+        every possible change in direction, from -len(turning_kernel) to len(turning_kernel)
+    probabilities : np array
+        the probability of each turn, one row per replica for stacked kernels
+    cumulative : np array
+        the cumulative sum of probabilities, ending in exactly 1
+    """
+    def __init__(self, turning_kernel, legacy=False):
+        """
+            Parameters:
+                turning_kernel (lst of floats, or lst of lsts for one kernel per replica) : the
+                    proabilitlies that an exploring ant will make a specfic turn to each side
+                legacy (bool) : whether to reproduce the original, skewed sampling
+        """
+        kernel = np.asarray(turning_kernel, dtype=np.float64)
+        prob_go_straight = 1 - 2 * kernel.sum(axis=-1, keepdims=True)
+        if (kernel < 0).any() or (prob_go_straight < 0).any():
+            raise ValueError(f"invalid turning kernel {turning_kernel}: probabilities must be positive and sum to at most 0.5")
+        if legacy:
+            weights = np.concatenate([prob_go_straight, kernel], axis=-1)
+            amounts = weights / weights.sum(axis=-1, keepdims=True)
+            #Each side (and going straight) is picked a third of the time
+            one_side = amounts[..., 1:] / 3
+            straight = amounts[..., :1] + (1 - amounts[..., :1]) / 3
+            self.probabilities = np.concatenate([one_side[..., ::-1], straight, one_side], axis=-1)
+        else:
+            self.probabilities = np.concatenate([kernel[..., ::-1], prob_go_straight, kernel], axis=-1)
+        self.turns = np.arange(-kernel.shape[-1], kernel.shape[-1] + 1)
+        self.cumulative = np.cumsum(self.probabilities, axis=-1)
+        self.cumulative /= self.cumulative[..., -1:]
+        self.cumulative[..., -1] = 1.0
+
+    def sample(self, rng, count, replica=None):
+        """
+        Draws the turns of many exploring ants at once
+            Parameters:
+                rng (numpy Generator) : the random number generator to draw from
+                count (int) : the number of turns to draw
+                replica (np array of ints or None) : the replica of each ant, for stacked kernels
+            Returns
+                turns (np array of ints) : the change in direction of each ant
+        """
+        draws = rng.random(count)
+        if self.cumulative.ndim == 1:
+            return self.turns[np.searchsorted(self.cumulative, draws, side='right')]
+        return self.turns[(self.cumulative[replica] <= draws[:, None]).sum(axis=1)]
+
+
+def rank_within_groups(keys):
+    """
+    Ranks every entry among the entries sharing its key, in order of appearance
+        Parameters:
+            keys (np array of ints) : a group key (e.g. a flat cell index) per entry
+        Returns
+            ranks (np array of ints) : 0 for the first entry of each key, 1 for the second, etc.
+    """
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    counts = np.diff(np.r_[starts, len(keys)])
+    ranks = np.empty(len(keys), dtype=np.int64)
+    ranks[order] = np.arange(len(keys)) - np.repeat(starts, counts)
+    return ranks
+
+
+DEPOSITION_SEMANTICS = ("sequential", "simultaneous")
+
+def deposit_pheromones(lattice, x, y, food_seen, tau, sauturation_concentration, semantics="sequential", replica=None):
+    """
+    Deposits pheromone for many ants at once (see Board.deposit). A single ant turns
+    the pheromone p on its cell into p - (tau / sauturation_concentration) * p + tau + food_seen.
+    Any number of ants may share a cell, which is resolved in one of two ways:
+        "sequential" : the ants deposit one after another in the order given, exactly as a
+                       loop over the ants would. With a = 1 - tau / sauturation_concentration
+                       and n ants on a cell, p becomes a^n p + sum of a^(n - 1 - i) (tau + food_seen_i)
+                       over the ants i = 0 .. n - 1.
+        "simultaneous" : every ant sees the pheromone from before the step, so the cell is damped
+                       once per ant from the same starting value (but never below 0) and receives
+                       every ant's tau + food_seen. The result does not depend on ant order.
+    Both give exactly the same result as the loop when each cell holds at most one ant.
+        Parameters:
+            lattice (Lattice) : the pheromone lattice
+            x, y (np arrays of ints) : the positions of the ants, which must be in the lattice
+            food_seen (np array of ints) : the food_seen of each ant
+            tau (float or np array) : the deposition rate, for all ants or per ant
+            sauturation_concentration (float or np array) : the saturation concentration, for all ants or per ant
+            semantics (str) : "sequential" or "simultaneous"
+            replica (np array of ints or None) : the replica of each ant, for stacked lattices
+    """
+    if semantics not in DEPOSITION_SEMANTICS:
+        raise ValueError(f"unknown deposition semantics {semantics!r}, expected one of {DEPOSITION_SEMANTICS}")
+    if len(x) == 0:
+        return
+    keys = lattice.flat_index(x, y, replica)
+    cells, ant_cell, ants_on_cell = np.unique(keys, return_inverse=True, return_counts=True)
+    cell_index = lattice.unflatten(cells)
+    cell_replica = cell_index[0] if replica is not None else None
+    pheromone = lattice.gather(cell_index[-2], cell_index[-1], replica=cell_replica)
+
+    #Ants on the same cell share a replica and so share tau and the saturation concentration
+    tau = np.broadcast_to(tau, keys.shape)
+    damping = np.broadcast_to(tau / sauturation_concentration, keys.shape)
+    cell_damping = np.empty(len(cells))
+    cell_damping[ant_cell] = damping
+
+    if semantics == "sequential":
+        #An ant's deposit is damped once by every ant that deposits after it on the same cell
+        ants_after = ants_on_cell[ant_cell] - 1 - rank_within_groups(keys)
+        weights = (1 - damping) ** ants_after
+        total_damping = np.where(ants_on_cell == 1, cell_damping, 1 - (1 - cell_damping) ** ants_on_cell)
+        pheromone = pheromone - total_damping * pheromone
+    else:
+        weights = np.ones(len(keys))
+        pheromone = np.maximum(pheromone - ants_on_cell * cell_damping * pheromone, 0)
+
+    pheromone = pheromone + np.bincount(ant_cell, weights=tau * weights, minlength=len(cells))
+    pheromone = pheromone + np.bincount(ant_cell, weights=food_seen * weights, minlength=len(cells))
+    lattice.scatter(cell_index[-2], cell_index[-1], pheromone, replica=cell_replica)
+
+
+class Colony():
+    """A struct-of-arrays population of ants
+    Every attribute holds one entry per ant, so the whole colony can be sensed,
+    turned and moved with a handful of array operations per time step.
+    Attributes:
+    x : np array of ints
+        ants x positions
+    y : np array of ints
+        ants y positions
+    direction : np array of ints (between 0 and 7)
+        the compass direction each ant is facing (see Ant)
+    food_seen : np array of ints
+        the amount food that was at a source when a retuning ant left it.
+    nest_x : np array of ints
+        the x position of each ant's nest
+    nest_y : np array of ints
+        the y position of each ant's nest
+    nest : np array of ints
+        the index of each ant's nest on the board (see Board.nests)
+    id : np array of ints
+        the number of each ant, unique on its board (see Board.released)
+    """
+    fields = ('x', 'y', 'direction', 'food_seen', 'nest_x', 'nest_y', 'nest', 'id')
+
+    #A single colony lives on one board; see replicas.ReplicaColony for stacked boards
+    replica = None
+
+    def __init__(self):
+        for field in self.fields:
+            setattr(self, field, np.zeros(0, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.x)
+
+    def append(self, **values):
+        """
+        Appends ants to the colony
+            Parameters:
+                values : one int or np array of ints per field, all arrays having the same length
+        """
+        count = max(np.size(value) for value in values.values())
+        for field in self.fields:
+            added = np.broadcast_to(values[field], (count,))
+            setattr(self, field, np.append(getattr(self, field), added))
+
+    def add(self, nest_location, direction, nest=0, ant_id=0):
+        """
+        Adds an ant standing on its nest
+            Parameters:
+                nest_location (int or tuple of ints) : the (x, y) position of the nest, or
+                    a single int when x and y are the same
+                direction (int) : the compass direction the new ant is facing
+                nest (int) : the index of the nest on the board
+                ant_id (int) : the number of the new ant
+        """
+        nest_x, nest_y = np.broadcast_to(nest_location, (2,))
+        self.append(
+            x = nest_x,
+            y = nest_y,
+            direction = direction,
+            food_seen = 0,
+            nest_x = nest_x,
+            nest_y = nest_y,
+            nest = nest,
+            id = ant_id,
+        )
+
+    def replica_of(self, ants):
+        """
+        Returns the replicas of some ants, or None for a single colony
+            Parameters:
+                ants (np array of ints or bools) : the ants to look up
+        """
+        return None if self.replica is None else self.replica[ants]
+
+    def per_ant(self, parameter):
+        """
+        Returns a board parameter as seen by each ant. A single colony shares every parameter.
+        """
+        return parameter
+
+    def count(self, mask):
+        """
+        Returns how many ants a mask selects
+        """
+        return int(np.count_nonzero(mask))
+
+    def remove(self, mask):
+        """
+        Removes ants from the colony
+            Parameters:
+                mask (np array of bools) : True for every ant to remove
+        """
+        keep = ~mask
+        for field in self.fields:
+            setattr(self, field, getattr(self, field)[keep])
+
+    def in_grid(self, size):
+        """
+        Returns a mask which is true for ants inside a square lattice
+            Parameters:
+                size (int) : the width and height of the lattice
+        """
+        return (self.x >= 0) & (self.x < size) & (self.y >= 0) & (self.y < size)
+
+    def find_nearby_values(self, lattice):
+        """
+        Finds the values of the three cells in front of every ant
+            Parameters:
+                lattice (Lattice) : the lattice to check
+            Returns
+                values (np array) : an (ants x 3) array of left, straight and right values
+                xs, ys (np arrays of ints) : the positions of those cells
+        """
+        directions = (self.direction[:, None] + AHEAD) % 8
+        xs = self.x[:, None] + MOVES[directions, 0]
+        ys = self.y[:, None] + MOVES[directions, 1]
+        replica = None if self.replica is None else self.replica[:, None]
+        return lattice.gather(xs, ys, replica=replica), xs, ys
+
+    def gather(self, board, gathering, nearby_food, food_xs, food_ys):
+        """
+        Takes one food from the richest cell in front of each gathering ant (see Ant.gather).
+        When more ants reach for a cell than it holds food, the first ones in colony order
+        take it, as they would in the per-object loop, and the rest do not gather this step.
+        Every food taken is added to the board's visit log, if it has one (see visits.VisitLog).
+            Parameters:
+                board (Board) : the board the colony lives on
+                gathering (np array of bools) : True for ants that see food
+                nearby_food (np array) : the food in front of each ant
+                food_xs, food_ys (np arrays of ints) : the positions of those cells
+            Returns
+                gathering (np array of bools) : True for ants that actually took food
+        """
+        gatherers = np.flatnonzero(gathering)
+        choice = nearby_food[gatherers].argmax(axis=1)
+        xs = food_xs[gatherers, choice]
+        ys = food_ys[gatherers, choice]
+        available = nearby_food[gatherers, choice]
+        replica = self.replica_of(gatherers)
+        rank = rank_within_groups(board.food.flat_index(xs, ys, replica))
+        took_food = rank < available
+        gatherers = gatherers[took_food]
+        visit_log = getattr(board, 'visit_log', None)
+        if visit_log is not None:
+            remaining = (available - rank - 1)[took_food]
+            visit_log.record(board.time, self.id[gatherers], xs[took_food], ys[took_food], remaining)
+
+        #sets ants to return to the nest with the food they saw at the source
+        self.food_seen[gatherers] = (available - rank)[took_food]
+        #removes the food from each location
+        replica = None if replica is None else replica[took_food]
+        board.food.scatter_add(xs[took_food], ys[took_food], -1, replica=replica)
+
+        gathering = np.zeros(len(self), dtype=bool)
+        gathering[gatherers] = True
+        return gathering
+
+    def take_food(self, board, gathering, nearby_food, food_xs, food_ys):
+        """
+        Lets the ants that see food gather it (see gather)
+            Returns
+                gathering (np array of bools) : True for ants that actually took food
+        """
+        if gathering.any():
+            return self.gather(board, gathering, nearby_food, food_xs, food_ys)
+        return gathering
+
+    def update(self, board):
+        """
+        Updates every ant's direction and position; the array equivalent of Board.update_ants
+            Parameters:
+                board (Board) : the board the colony lives on
+            Returns
+                explorers, followers, gatherers, returners (ints) : how many ants were in each mode
+                    (see count)
+        """
+        nearby_pheromones, _, _ = self.find_nearby_values(board.pheromones)
+        nearby_food, food_xs, food_ys = self.find_nearby_values(board.food)
+
+        #sets retuning ants at nest food_seen to 0
+        at_nest = (self.x == self.nest_x) & (self.y == self.nest_y)
+        self.food_seen[at_nest] = 0
+
+        returning = self.food_seen != 0
+        gathering = ~returning & nearby_food.any(axis=1)
+        gathering = self.take_food(board, gathering, nearby_food, food_xs, food_ys)
+
+        #Ants decide to follow a trail with the same probability as Board.ant_follows_trail
+        left, straight, right = nearby_pheromones.T
+        deciding = ~returning & ~gathering
+        no_trail = (straight == 0) & (left == right)
+        concentration = np.minimum(nearby_pheromones.max(axis=1), self.per_ant(board.sauturation_concentration))
+        probability = (self.per_ant(board.min_phi) + self.per_ant(board.delta_phi) * concentration) / 256
+        following = deciding & ~no_trail & (board.rng.random(len(self)) < probability)
+        exploring = deciding & ~following
+
+        #Followers go straight if the trail continues, otherwise toward the stronger side
+        turn = np.where(straight != 0, 0, np.sign(left - right))
+        self.direction[following] = (self.direction[following] + turn[following]) % 8
+
+        #Explorers turn according to the turning kernel (see Ant.explore)
+        turns = board.turning.sample(board.rng, np.count_nonzero(exploring), self.replica_of(exploring))
+        self.direction[exploring] = (self.direction[exploring] + turns) % 8
+
+        #Returners point towards their nest, looked up in the board's navigation field
+        self.direction[returning] = board.navigation.gather(self.x[returning], self.y[returning], self.nest[returning])
+
+        self.x += MOVES[self.direction, 0]
+        self.y += MOVES[self.direction, 1]
+        return self.count(exploring), self.count(following), self.count(gathering), self.count(returning)
@@ -0,0 +1,200 @@
+from collections import deque
+
+import numpy as np
+
+
+class FoodExhausted():
+    """Stops a run once every food source is empty
+    Nothing changes at the sources after that, so the rest of the run is known exactly:
+    the food remaining stays at 0 (see final).
+    """
+    #Whether the food remaining is known to stay the same after the detector fires
+    final = True
+
+    def start(self, board):
+        return
+
+    def state(self):
+        """
+        Returns what the detector has seen so far, for checkpoints (see restore)
+        """
+        return None
+
+    def restore(self, state):
+        """
+        Continues from a state() saved in a checkpoint, after start()
+        """
+        return
+
+    def check(self, board, remaining):
+        """
+        Returns why the run should stop, or None to let it go on
+            Parameters:
+                board (Board) : the board being run
+                remaining (np array) : the food remaining at each source at the end of this minute
+        """
+        if not remaining.any():
+            return "every food source is empty"
+        return None
+
+    def __repr__(self):
+        return "FoodExhausted()"
+
+
+class StationaryPopulation():
+    """Stops a run once the number of ants on the board has stopped changing
+    The population is stationary when it has stayed within tolerance (a fraction of its
+    mean) for window minutes in a row.
+    Attributes:
+    window : int
+        the number of minutes the population must stay within tolerance
+    tolerance : float
+        the largest allowed spread of the population, as a fraction of its mean
+    """
+    final = False
+
+    def __init__(self, window=5, tolerance=0.05):
+        if window < 2 or tolerance < 0:
+            raise ValueError(f"invalid detector: the window ({window}) must be at least 2 minutes and the tolerance ({tolerance}) positive")
+        self.window = window
+        self.tolerance = tolerance
+
+    def start(self, board):
+        self.populations = deque(maxlen=self.window)
+
+    def state(self):
+        return list(self.populations)
+
+    def restore(self, state):
+        self.populations.extend(state)
+
+    def check(self, board, remaining):
+        """
+        Returns why the run should stop, or None to let it go on (see FoodExhausted.check)
+        """
+        self.populations.append(len(board.ants))
+        if len(self.populations) < self.window:
+            return None
+        low, high = min(self.populations), max(self.populations)
+        if high - low <= self.tolerance * np.mean(self.populations):
+            return f"the ant population stayed between {low} and {high} for {self.window} minutes"
+        return None
+
+    def __repr__(self):
+        return f"StationaryPopulation(window={self.window}, tolerance={self.tolerance})"
+
+
+class SteadyVisits():
+    """Stops a run once the share of visits going to each food source has settled
+    The fraction of the visits each source received in the last window minutes is compared
+    with its fraction in the window before. The visits are steady when no fraction moved by
+    more than tolerance, and both windows hold at least min_visits visits (so runs that
+    have barely started, or whose sources are empty, are not taken as steady). Visits are
+    counted by the board's VisitLog when it has one (see visits.py), and otherwise from
+    the food taken from each source.
+    Attributes:
+    window : int
+        the number of minutes in each window
+    tolerance : float
+        the largest allowed change in any source's fraction of the visits
+    min_visits : int
+        the number of visits each window needs
+    """
+    final = False
+
+    def __init__(self, window=5, tolerance=0.02, min_visits=20):
+        if window < 1 or tolerance < 0:
+            raise ValueError(f"invalid detector: the window ({window}) must be at least 1 minute and the tolerance ({tolerance}) positive")
+        self.window = window
+        self.tolerance = tolerance
+        self.min_visits = min_visits
+
+    def start(self, board):
+        #The visits to each source in each of the last 2 * window minutes
+        self.visits = deque(maxlen=2 * self.window)
+        #The visits counted so far, which the next minute's visits are taken from
+        visit_log = getattr(board, 'visit_log', None)
+        self.from_food = visit_log is None
+        self.counted = None if visit_log is None else visit_log.totals.astype(np.float64)
+
+    def state(self):
+        #A restarted visit log counts its kept events again, so only the food taken is saved
+        return {
+            'visits' : [visits.tolist() for visits in self.visits],
+            'taken' : self.counted.tolist() if self.from_food and self.counted is not None else None,
+        }
+
+    def restore(self, state):
+        self.visits.extend(np.array(visits) for visits in state['visits'])
+        if self.counted is None and state['taken'] is not None:
+            self.counted = np.array(state['taken'])
+
+    def check(self, board, remaining):
+        """
+        Returns why the run should stop, or None to let it go on (see FoodExhausted.check)
+        """
+        if not self.from_food:
+            counted = board.visit_log.totals.astype(np.float64)
+        else:
+            #The food taken from each source so far, up to a constant
+            counted = -np.asarray(remaining, dtype=np.float64)
+        if self.counted is not None:
+            self.visits.append(counted - self.counted)
+        self.counted = counted
+        if len(self.visits) < self.visits.maxlen:
+            return None
+        earlier = sum(list(self.visits)[:self.window])
+        later = sum(list(self.visits)[self.window:])
+        if min(earlier.sum(), later.sum()) < max(self.min_visits, 1):
+            return None
+        change = np.abs(later / later.sum() - earlier / earlier.sum()).max()
+        if change <= self.tolerance:
+            return f"the fraction of visits to each source changed by at most {change:.3f} over {self.window} minutes"
+        return None
+
+    def __repr__(self):
+        return f"SteadyVisits(window={self.window}, tolerance={self.tolerance}, min_visits={self.min_visits})"
+
+
+#The detectors a config may name, with the keyword arguments each one takes
+DETECTORS = {
+    'food_exhausted' : FoodExhausted,
+    'stationary_population' : StationaryPopulation,
+    'steady_visits' : SteadyVisits,
+}
+
+
+def detectors(spec):
+    """
+    Builds detectors from a description, for example
+        {"food_exhausted" : {}, "steady_visits" : {"window" : 5, "tolerance" : 0.02}}
+        Parameters:
+            spec (dict, lst of names or None) : the detectors and their keyword arguments
+        Returns
+            detectors (lst) : the detectors, to pass to Board.run as stop
+    """
+    if spec is None:
+        return []
+    if not isinstance(spec, dict):
+        spec = {name : {} for name in spec}
+    unknown = set(spec) - set(DETECTORS)
+    if unknown:
+        raise ValueError(f"unknown detectors {sorted(unknown)}, expected some of {sorted(DETECTORS)}")
+    return [DETECTORS[name](**(options or {})) for name, options in spec.items()]
+
+
+def complete(remaining, minutes, stopped_by):
+    """
+    Extends the food remaining of a run that stopped early to the minutes it was asked to
+    run, when the detector that stopped it knows the rest (see FoodExhausted.final)
+        Parameters:
+            remaining (np array) : the food remaining at each source after each minute that ran
+            minutes (int) : the minutes the run was asked to simulate
+            stopped_by (detector or None) : the detector that stopped the run
+        Returns
+            remaining (np array) : the food remaining, with shape (minutes, locations) when known
+    """
+    if stopped_by is None or not stopped_by.final or len(remaining) == 0 or len(remaining) >= minutes:
+        return remaining
+    rest = np.repeat(remaining[-1:], minutes - len(remaining), axis=0)
+    return np.concatenate([remaining, rest])
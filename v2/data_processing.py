@@ -1,20 +1,319 @@
-import pandas as pd
+import argparse
+import csv
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
 import numpy as np
-import matplotlib.pyplot as plt
+from . import recorder
+from . import visits as visit_log
+
+
+def read_remaining(path, chunksize=1024):
+    """
+    Streams the food remaining at each source from a run output, a block of samples at a time
+        Parameters:
+            path (str) : a csv file written by Board.run, a .npy file of remaining food (as stored
+                by sweep.ResultCache) or a binary recording written by a Recorder
+            chunksize (int) : the number of samples read at once
+        Returns
+            locations (lst of str) : the name of each food source
+            chunks (generator of np arrays) : the remaining food, with shape (samples, locations)
+    """
+    if path.endswith('.csv'):
+        import pandas as pd
+        locations = [column for column in pd.read_csv(path, nrows=0).columns if column != 'step']
+        chunks = (chunk[locations].to_numpy() for chunk in pd.read_csv(path, chunksize=chunksize))
+        return locations, chunks
+    if path.endswith('.npy'):
+        remaining = np.load(path, mmap_mode='r')
+        #Named like the csv columns, so sweep results can be summarized with other outputs
+        known = read_info(path).get('locations')
+        if known is None:
+            locations = [f"source {i}" for i in range(remaining.shape[-1])]
+        else:
+            locations = [str(tuple(location)) for location in known]
+    else:
+        samples, header = recorder.load(path)
+        remaining = samples['food']
+        locations = [str(location) for location in header['locations']]
+    chunks = (np.asarray(remaining[start:start + chunksize]) for start in range(0, len(remaining), chunksize))
+    return locations, chunks
+
+
+def read_info(path):
+    """
+    Returns what sweep.ResultCache knows about a .npy run output (its food locations, the food
+    each source started with and why it stopped), kept in the .json file next to it
+    """
+    info_path = os.path.splitext(path)[0] + '.json'
+    if not path.endswith('.npy') or not os.path.exists(info_path):
+        return {}
+    with open(info_path) as file:
+        return json.load(file)
+
+
+def read_initial(path):
+    """
+    Returns the food each source of a .npy run output started with, or None if it is not known
+    """
+    initial = read_info(path).get('initial')
+    return None if initial is None else np.array(initial)
+
+
+def read_visits(path, chunksize=1024):
+    """
+    Streams the visits to each source per sample of a run output, from the first sample on.
+    A Recorder file holds the visits of every sample and a .visits log written by a
+    visits.VisitLog is counted exactly, one row per minute. Other outputs hold the food
+    remaining, whose differences are the visits. The csv files Board.run writes start with
+    a row for step 0 and sweep results come with the food their sources started with (see
+    read_initial), so the first sample's visits are counted too. Outputs that have neither
+    (csv files without a step column, .npy files without a .json file) lose the first sample.
+        Returns
+            locations (lst of str) : the name of each food source
+            chunks (generator of np arrays) : the visits, with shape (samples, locations) in total
+    """
+    if path.endswith('.visits'):
+        events, header = visit_log.load(path)
+        locations = [str(location) for location in header['locations']]
+        counts = visit_log.visits_per_interval(events, len(locations), steps=header.get('steps')).astype(np.float64)
+        return locations, (counts[start:start + chunksize] for start in range(0, len(counts), chunksize))
+    if not path.endswith(('.csv', '.npy')):
+        samples, header = recorder.load(path)
+        locations = [str(location) for location in header['locations']]
+        visits = samples['visits']
+        return locations, (np.asarray(visits[start:start + chunksize], dtype=np.float64) for start in range(0, len(visits), chunksize))
+    locations, chunks = read_remaining(path, chunksize)
+    initial = read_initial(path)
+
+    def visits():
+        previous = None if initial is None else initial[None, :].astype(np.float64)
+        for chunk in chunks:
+            chunk = chunk.astype(np.float64)
+            with_previous = chunk if previous is None else np.concatenate([previous, chunk])
+            if len(with_previous) > 1:
+                yield -np.diff(with_previous, axis=0)
+            previous = with_previous[-1:]
+    return locations, visits()
+
+
+def source_fractions(visits):
+    """
+    Returns the fraction of each sample's visits that went to each source (nan where there were
+    none, so those samples are left out of statistics rather than counted as 0)
+    """
+    totals = visits.sum(axis=1, keepdims=True)
+    return np.divide(visits, totals, out=np.full(visits.shape, np.nan), where=totals != 0)
+
+
+class RunningStatistics():
+    """The per-minute mean and variance of a quantity over many runs, updated one run at a time
+    Uses Welford's algorithm, so runs never need to be held in memory together, and partial
+    statistics computed in different processes can be combined with merge(). Runs may have
+    different lengths, and minutes holding nan are skipped; every minute keeps its own count.
+    Attributes:
+    count : np array of ints
+        the number of runs counted at each minute
+    mean : np array
+        the mean of each minute and source
+    m2 : np array
+        the sum of squared deviations from the mean of each minute and source
+    """
+    def __init__(self, locations):
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros((0, locations))
+        self.m2 = np.zeros((0, locations))
+
+    def grow(self, minutes):
+        """
+        Extends the statistics to cover a number of minutes
+        """
+        extra = minutes - len(self.count)
+        if extra > 0:
+            self.count = np.concatenate([self.count, np.zeros(extra, dtype=np.int64)])
+            self.mean = np.concatenate([self.mean, np.zeros((extra, self.mean.shape[1]))])
+            self.m2 = np.concatenate([self.m2, np.zeros((extra, self.m2.shape[1]))])
+
+    def add(self, values, start=0):
+        """
+        Adds one run's values for a block of minutes
+            Parameters:
+                values (np array) : the values, with shape (minutes, locations). Minutes with a
+                    nan value are not counted
+                start (int) : the minute the block starts at
+        """
+        self.grow(start + len(values))
+        known = ~np.isnan(values).any(axis=1)
+        minutes = start + np.flatnonzero(known)
+        values = values[known]
+        self.count[minutes] += 1
+        count = self.count[minutes]
+        delta = values - self.mean[minutes]
+        self.mean[minutes] += delta / count[:, None]
+        self.m2[minutes] += delta * (values - self.mean[minutes])
+
+    def merge(self, other):
+        """
+        Combines statistics computed over separate sets of runs (Chan et al.'s parallel update)
+        """
+        self.grow(len(other.count))
+        other.grow(len(self.count))
+        count = self.count + other.count
+        safe = np.maximum(count, 1)[:, None]
+        delta = other.mean - self.mean
+        self.m2 = self.m2 + other.m2 + delta ** 2 * (self.count * other.count)[:, None] / safe
+        self.mean = self.mean + delta * other.count[:, None] / safe
+        self.count = count
+
+    def variance(self):
+        """
+        Returns the sample variance of each minute and source (nan where fewer than two runs)
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count[:, None] > 1, self.m2 / (self.count[:, None] - 1), np.nan)
+
+    def confidence_band(self, level=0.95):
+        """
+        Returns a normal-approximation confidence band for the mean
+        """
+        z = NormalDist().inv_cdf((1 + level) / 2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            half_width = z * np.sqrt(self.variance() / self.count[:, None])
+        return self.mean - half_width, self.mean + half_width
+
+
+def summarize_files(paths, chunksize=1024):
+    """
+    Computes visit and source fraction statistics over some run outputs, streaming each file
+        Parameters:
+            paths (lst of str) : the run outputs (see read_remaining), which must all have the same sources
+            chunksize (int) : the number of samples read at once
+        Returns
+            locations (lst of str) : the name of each food source
+            visits, fractions (RunningStatistics) : the statistics of the visits per minute and
+                of the fraction of visits to each source
+    """
+    summary = None
+    for path in paths:
+        locations, chunks = read_visits(path, chunksize)
+        if summary is None:
+            summary = (locations, RunningStatistics(len(locations)), RunningStatistics(len(locations)))
+        elif locations != summary[0]:
+            raise ValueError(f"{path} has sources {locations}, expected {summary[0]}")
+        _, visits, fractions = summary
+        start = 0
+        for chunk in chunks:
+            visits.add(chunk, start)
+            fractions.add(source_fractions(chunk), start)
+            start += len(chunk)
+    return summary
+
+
+def summarize(paths, workers=None, chunksize=1024, files_per_task=16):
+    """
+    Computes visit and source fraction statistics over many run outputs in parallel. Each
+    worker streams a batch of files into partial statistics, which are merged, so memory
+    use does not depend on the number or length of the runs.
+        Parameters:
+            paths (lst of str) : the run outputs (see read_remaining)
+            workers (int or None) : the number of worker processes, None for one per core
+            chunksize (int) : the number of samples read at once
+            files_per_task (int) : the number of files each worker summarizes per task
+        Returns
+            locations, visits, fractions : as returned by summarize_files
+    """
+    if not paths:
+        raise ValueError("no run outputs to summarize")
+    batches = [paths[i:i + files_per_task] for i in range(0, len(paths), files_per_task)]
+    summary = None
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for partial in executor.map(summarize_files, batches, [chunksize] * len(batches)):
+            if summary is None:
+                summary = partial
+                continue
+            if partial[0] != summary[0]:
+                raise ValueError(f"run outputs have sources {partial[0]}, expected {summary[0]}")
+            for statistics, other in zip(summary[1:], partial[1:]):
+                statistics.merge(other)
+    return summary
+
+
+def write_summary(path, locations, visits, fractions, level=0.95):
+    """
+    Writes the statistics of the visits per minute and of the source fractions to a csv file
+    """
+    low, high = visits.confidence_band(level)
+    visit_variance = visits.variance()
+    fraction_variance = fractions.variance()
+    fraction_mean = np.where(fractions.count[:, None] > 0, fractions.mean, np.nan)
+    with open(path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        #Minutes without visits have no fractions, so fewer runs may count towards them
+        writer.writerow(['minute', 'location', 'runs', 'mean', 'variance', 'low', 'high', 'fraction_runs', 'fraction_mean', 'fraction_variance'])
+        for minute in range(len(visits.count)):
+            for i, location in enumerate(locations):
+                writer.writerow([
+                    minute + 1, location, visits.count[minute],
+                    visits.mean[minute, i], visit_variance[minute, i], low[minute, i], high[minute, i],
+                    fractions.count[minute], fraction_mean[minute, i], fraction_variance[minute, i],
+                ])
+
+
+def plot(locations, visits, level=0.95, path=None):
+    """
+    Plots the mean visits to each food source per minute with a confidence band, like
+    Figure 1 of Sumpter and Beekman (2003)
+        Parameters:
+            path (str or None) : the image file to save the plot to, None to show it
+    """
+    import matplotlib.pyplot as plt
+    minutes = np.arange(1, len(visits.count) + 1)
+    low, high = visits.confidence_band(level)
+    colors = ['r', 'g', 'b']
+    for i, location in enumerate(locations):
+        color = colors[i % len(colors)]
+        plt.plot(minutes, visits.mean[:, i], label=location, color=color)
+        if visits.count.max() > 1:
+            plt.fill_between(minutes, low[:, i], high[:, i], color=color, alpha=.2)
+
+    plt.legend(title='Food source')
+    plt.xlabel('Minute')
+    plt.ylabel('Visits per minute')
+    plt.title(f"Visits to each food source ({visits.count.max()} runs)")
+    if path is None:
+        plt.show()
+    else:
+        plt.savefig(path)
+
 
-raw_data = pd.read_csv('data.csv')
-visits_per_min =  raw_data.diff().abs()
-minutes = np.arange(visits_per_min.shape[0])
+def expand(patterns):
+    """
+    Returns the files matching some paths or glob patterns, in order and without duplicates
+    """
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        paths += [match for match in matches if match not in paths]
+    return paths
 
-colors = ['r', 'g', 'b']
-for i, col in enumerate(visits_per_min.columns):
-    plt.plot(minutes, visits_per_min[col], label=col, color=colors[i % len(colors)])
 
-# add legend, labels and title
-plt.legend()
-plt.xlabel('X axis label')
-plt.ylabel('Y axis label')
-plt.title('Title of the graph')
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize the visits to each food source over many runs")
+    parser.add_argument('paths', nargs='*', default=['data.csv'],
+                        help="run outputs: csv files from Board.run, .npy files from a sweep cache, Recorder files or .visits logs (globs allowed)")
+    parser.add_argument('--output', default=None, help="the csv file to write the statistics to")
+    parser.add_argument('--plot', default=None, help="the image file to save the plot to, instead of showing it")
+    parser.add_argument('--no-plot', action='store_true')
+    parser.add_argument('--level', type=float, default=0.95)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunksize', type=int, default=1024)
+    args = parser.parse_args()
 
-# show the graph
-plt.show()
\ No newline at end of file
+    locations, visits, fractions = summarize(expand(args.paths), workers=args.workers, chunksize=args.chunksize)
+    if args.output is not None:
+        write_summary(args.output, locations, visits, fractions, args.level)
+    if not args.no_plot:
+        plot(locations, visits, args.level, args.plot)
@@ -0,0 +1,193 @@
+import numpy as np
+
+#Kernels reaching at most this many cells to each side are applied as a direct stencil, wider ones by FFT
+STENCIL_RADIUS = 8
+
+#The width and height of the blocks of cells diffused at once
+TILE_SIZE = 64
+
+#The number of tiles read from the lattice and convolved at once, which bounds the size of
+#the temporary blocks (the diffused tiles themselves are all kept until every tile has been read)
+BATCH_TILES = 256
+
+
+def gaussian_kernel(variance):
+    """
+    Returns a normalized 1D gaussian kernel, wide enough to hold 3 standard deviations
+        Parameters:
+            variance (float) : the variance of the gaussian, in cells squared
+        Returns
+            kernel (np array) : the weights of the offsets -radius .. radius, summing to 1
+    """
+    radius = max(1, int(np.ceil(3 * np.sqrt(variance))))
+    offsets = np.arange(-radius, radius + 1)
+    kernel = np.exp(-offsets ** 2 / (2 * variance)) if variance > 0 else (offsets == 0).astype(np.float64)
+    return kernel / kernel.sum()
+
+
+def convolve_axis(blocks, kernel, axis, method="stencil"):
+    """
+    Convolves blocks of cells with a 1D kernel along one axis, keeping only the cells
+    whose whole neighbourhood is in the block
+        Parameters:
+            blocks (np array) : the cells, with length L along axis
+            kernel (np array) : the weights of the offsets -radius .. radius
+            axis (int) : the axis to convolve along
+            method (str) : "stencil" sums shifted copies of the blocks, "fft" multiplies
+                their Fourier transforms (cheaper for wide kernels)
+        Returns
+            convolved (np array) : the cells, with length L - 2 * radius along axis
+    """
+    radius = len(kernel) // 2
+    length = blocks.shape[axis]
+    kept = length - 2 * radius
+    if method == "stencil":
+        convolved = np.zeros(blocks.shape[:axis] + (kept,) + blocks.shape[axis + 1:])
+        window = [slice(None)] * blocks.ndim
+        for offset, weight in enumerate(kernel):
+            window[axis] = slice(offset, offset + kept)
+            convolved += weight * blocks[tuple(window)]
+        return convolved
+    #The kernel is symmetric, so convolution and correlation are the same and the
+    #circular wrap of the transform only reaches the cells that are dropped
+    spread = np.zeros(length)
+    spread[np.arange(-radius, radius + 1) % length] = kernel
+    shape = [1] * blocks.ndim
+    shape[axis] = -1
+    transformed = np.fft.rfft(blocks, axis=axis) * np.fft.rfft(spread).reshape(shape)
+    window = [slice(None)] * blocks.ndim
+    window[axis] = slice(radius, radius + kept)
+    return np.fft.irfft(transformed, n=length, axis=axis)[tuple(window)]
+
+
+class Diffusion():
+    """Spreads pheromone to the neighbouring cells, as if it diffused with a given coefficient
+    Diffusing for a time t with coefficient D spreads every cell by a gaussian with variance
+    2 * D * t along each axis. The gaussian is separable, so it is applied along x and then
+    along y, as a direct stencil for narrow kernels and by FFT for wide ones. Only the
+    tiles of cells that hold pheromone, and the tiles they can spread into, are diffused,
+    so the cost follows the size of the trails and not of the board. Tiled lattices know
+    which tiles they hold; on dense lattices the tiles are found from the lattice's change
+    tracking (see occupied_tiles), which costs one check per tile rather than per cell. Values that spread
+    below cutoff are dropped, so trails do not grow without bound. Pheromone that spreads
+    past the edges of the board is lost.
+    Attributes:
+    coefficient : float
+        the diffusion coefficient, in cells squared per time step
+    interval : int
+        the number of time steps between diffusions, each spreading for that many steps
+    cutoff : float
+        the value below which diffused cells are set to 0
+    kernel : np array
+        the 1D gaussian applied along each axis
+    radius : int
+        the number of cells the kernel reaches to each side
+    method : str ("stencil" or "fft")
+        how the kernel is applied
+    occupied : np array of bools or None
+        the tiles of a dense lattice that held pheromone after the last diffusion
+    since : int or None
+        the change tracking generation that started after the last diffusion
+    """
+    def __init__(self, coefficient, interval=1, cutoff=1e-3, tile_size=TILE_SIZE):
+        """
+            Parameters:
+                coefficient (float) : the diffusion coefficient, in cells squared per time step
+                interval (int) : the number of time steps between diffusions
+                cutoff (float) : the value below which diffused cells are set to 0
+                tile_size (int) : the width and height of the blocks diffused at once
+        """
+        if coefficient < 0 or interval < 1:
+            raise ValueError(f"invalid diffusion: the coefficient ({coefficient}) must be positive and the interval ({interval}) at least 1")
+        self.coefficient = coefficient
+        self.interval = interval
+        self.cutoff = cutoff
+        self.tile_size = tile_size
+        self.kernel = gaussian_kernel(2 * coefficient * interval)
+        self.radius = len(self.kernel) // 2
+        self.method = "stencil" if self.radius <= STENCIL_RADIUS else "fft"
+        self.occupied = None
+        self.since = None
+        self.tracking_id = None
+
+    def occupied_tiles(self, lattice):
+        """
+        Returns which tiles of a lattice hold pheromone (or may, as cells can decay to zero).
+        A dense lattice is scanned cell by cell only the first time. After that the tiles
+        are the ones the last diffusion left pheromone in, and the ones written since then
+        (see Lattice.track_changes), so only one entry per tile is checked.
+        """
+        if not lattice.dense:
+            return lattice.occupied_tiles(self.tile_size)
+        if lattice.tile_generation is None:
+            lattice.track_changes(self.tile_size)
+        if self.occupied is None or lattice.tile_size != self.tile_size or lattice.tracking_id != self.tracking_id:
+            return lattice.occupied_tiles(self.tile_size)
+        written = lattice.tile_generation >= self.since
+        return self.occupied | written.reshape((-1,) + written.shape[-2:]).any(axis=0)
+
+    def active_tiles(self, lattice):
+        """
+        Returns the tiles that hold pheromone and the tiles it can spread into
+            Returns
+                tiles (np array of ints) : the (tile x, tile y) of each tile to diffuse
+                occupied (np array of bools) : whether each tile holds pheromone now
+        """
+        size = self.tile_size
+        tile_grid = self.occupied_tiles(lattice)
+        tiles_x, tiles_y = tile_grid.shape
+        occupied = np.flatnonzero(tile_grid)
+        reach = -(-self.radius // size)
+        steps = np.arange(-reach, reach + 1)
+        tile_x = (occupied // tiles_y)[:, None, None] + steps[None, :, None]
+        tile_y = (occupied % tiles_y)[:, None, None] + steps[None, None, :]
+        tile_x, tile_y = np.broadcast_arrays(tile_x, tile_y)
+        inside = (tile_x >= 0) & (tile_x < tiles_x) & (tile_y >= 0) & (tile_y < tiles_y)
+        tiles = np.unique(tile_x[inside] * tiles_y + tile_y[inside])
+        return np.stack([tiles // tiles_y, tiles % tiles_y], axis=1), np.isin(tiles, occupied)
+
+    def apply(self, lattice):
+        """
+        Diffuses the pheromone of a lattice for interval time steps
+            Parameters:
+                lattice (Lattice) : a two dimensional lattice (dense or tiled)
+        """
+        tiles, occupied = self.active_tiles(lattice)
+        size = self.tile_size
+        cells = np.arange(size)
+        block = np.arange(-self.radius, size + self.radius)
+        writes = []
+        holding = []
+        #Every tile is read before any is written, as tiles read the edges of their neighbours
+        for start in range(0, len(tiles), BATCH_TILES):
+            origins = tiles[start:start + BATCH_TILES] * size
+            block_x = origins[:, 0, None, None] + block[None, :, None]
+            block_y = origins[:, 1, None, None] + block[None, None, :]
+            blocks = lattice.gather(*np.broadcast_arrays(block_x, block_y)).astype(np.float64)
+            diffused = convolve_axis(blocks, self.kernel, 1, self.method)
+            diffused = convolve_axis(diffused, self.kernel, 2, self.method)
+            diffused[diffused < self.cutoff] = 0
+
+            #Tiles that were empty and stay empty are not written, so tiled lattices do not allocate them
+            holds = diffused.any(axis=(1, 2))
+            holding.append(holds)
+            written = occupied[start:start + BATCH_TILES] | holds
+            x, y = np.broadcast_arrays(
+                origins[written, 0, None, None] + cells[None, :, None],
+                origins[written, 1, None, None] + cells[None, None, :],
+            )
+            inside = lattice.contains(x, y)
+            writes.append((x[inside], y[inside], diffused[written][inside]))
+        for x, y, values in writes:
+            lattice.scatter(x, y, values)
+
+        if lattice.dense and lattice.tile_size == size:
+            #The writes above belong to the finished generation, so only later writes count as new
+            tiles_x, tiles_y = lattice.tile_generation.shape[-2:]
+            self.occupied = np.zeros((tiles_x, tiles_y), dtype=bool)
+            if len(tiles):
+                held = tiles[np.concatenate(holding)]
+                self.occupied[held[:, 0], held[:, 1]] = True
+            lattice.generation += 1
+            self.since = lattice.generation
+            self.tracking_id = lattice.tracking_id
@@ -0,0 +1,260 @@
+import argparse
+import csv
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from statistics import NormalDist
+
+import numpy as np
+from .convergence import complete, detectors
+from .model import Board
+
+
+def trial_seeds(seed, trials):
+    """
+    Derives an independent seed for every trial of an ensemble
+        Parameters:
+            seed (int) : the seed of the whole ensemble
+            trials (int) : the number of trials
+        Returns
+            seeds (lst of ints) : one seed per trial, which only depends on seed and the trial's position
+    """
+    children = np.random.SeedSequence(seed).spawn(trials)
+    return [int(child.generate_state(1)[0]) for child in children]
+
+
+def simulate_trial(seed, minutes, food_locations, board_options, stop=None):
+    """
+    Runs one seeded trial of Board without writing any files, stopping early if it converges
+        Parameters:
+            seed (int) : the seed of the trial
+            minutes (int) : how many minutes to simulate
+            food_locations (dict) : the food layout passed to Board.run
+            board_options (dict) : keyword arguments for Board
+            stop (lst or None) : convergence detectors passed to Board.run (see convergence.py)
+        Returns
+            remaining (np array) : the food remaining at each location after each minute. A trial
+                stopped early has fewer minutes, unless the rest of the run is known (see convergence.complete)
+            stop_reason (str or None) : why the trial stopped early, None if it ran every minute
+    """
+    board = Board(seed=seed, **board_options)
+    remaining = board.run(minutes, food_locations, path=None, verbose=False, stop=stop)
+    return complete(remaining, minutes, board.stopped_by), board.stop_reason
+
+
+def run_trial(seed, minutes, food_locations, board_options, stop=None):
+    """
+    Runs one seeded trial of Board without writing any files (see simulate_trial)
+        Returns
+            remaining (np array) : the food remaining at each location after each minute
+    """
+    return simulate_trial(seed, minutes, food_locations, board_options, stop)[0]
+
+
+def run_chunk(chunk, minutes, food_locations, board_options, stop=None):
+    """
+    Runs several trials in one worker
+        Parameters:
+            chunk (lst of (int, int)) : the (trial, seed) pairs to run
+        Returns
+            results (lst of (int, np array, str or None)) : the trial number, remaining food and
+                stop reason of each trial
+    """
+    return [(trial, *simulate_trial(seed, minutes, food_locations, board_options, stop)) for trial, seed in chunk]
+
+
+def run_isolated_chunk(chunk, minutes, food_locations, board_options, stop=None):
+    """
+    Runs several trials in a worker process of their own, so that if it crashes no other chunk is lost
+    """
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(run_chunk, chunk, minutes, food_locations, board_options, stop).result()
+
+
+class Ensemble():
+    """The results of many independent trials with the same food layout
+    Attributes:
+    food_locations : dict
+        the food layout every trial was run with
+    seeds : dict
+        the seed of every trial, keyed by trial number
+    remaining : dict
+        the food remaining at each location after each minute, keyed by trial number
+    failed : lst of ints
+        the trial numbers that did not complete
+    stopped : dict
+        why each trial that converged early stopped, keyed by trial number
+    """
+    def __init__(self, food_locations, seeds):
+        self.food_locations = food_locations
+        self.seeds = seeds
+        self.remaining = {}
+        self.failed = []
+        self.stopped = {}
+
+    def __len__(self):
+        return len(self.remaining)
+
+    def visits(self):
+        """
+        Returns the visits to each food source per minute, with shape (trials, minutes, locations).
+        The first minute counts the visits made since the food was added. Minutes that a trial
+        stopped before are nan. If no trial completed (see failed), there are no trials or minutes.
+        """
+        initial = np.array(list(self.food_locations.values()))
+        minutes = max((len(remaining) for remaining in self.remaining.values()), default=0)
+        remaining = np.full((len(self.remaining), minutes, len(initial)), np.nan)
+        for row, trial in enumerate(sorted(self.remaining)):
+            remaining[row, :len(self.remaining[trial])] = self.remaining[trial]
+        with_start = np.concatenate([np.broadcast_to(initial, (len(remaining), 1, len(initial))), remaining], axis=1)
+        return -np.diff(with_start, axis=1)
+
+    def mean(self):
+        """
+        Returns the mean visits to each food source per minute over all completed trials
+        """
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return np.nanmean(self.visits(), axis=0)
+
+    def variance(self):
+        """
+        Returns the sample variance of the visits to each food source per minute
+        """
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return np.nanvar(self.visits(), axis=0, ddof=1)
+
+    def counts(self):
+        """
+        Returns the number of trials that ran each minute
+        """
+        return (~np.isnan(self.visits()[:, :, 0])).sum(axis=0)
+
+    def confidence_band(self, level=0.95):
+        """
+        Returns a normal-approximation confidence band for the mean visits per minute
+            Parameters:
+                level (float) : the confidence level
+            Returns
+                low, high (np arrays) : the bounds of the band, with shape (minutes, locations)
+        """
+        z = NormalDist().inv_cdf((1 + level) / 2)
+        half_width = z * np.sqrt(self.variance() / self.counts()[:, None])
+        mean = self.mean()
+        return mean - half_width, mean + half_width
+
+    def to_csv(self, path, level=0.95):
+        """
+        Writes the mean, variance and confidence band of the visits per minute to a csv file
+        """
+        mean = self.mean()
+        variance = self.variance()
+        low, high = self.confidence_band(level)
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['minute', 'location', 'mean', 'variance', 'low', 'high'])
+            for minute in range(mean.shape[0]):
+                for i, location in enumerate(self.food_locations):
+                    writer.writerow([minute + 1, location, mean[minute, i], variance[minute, i], low[minute, i], high[minute, i]])
+
+
+def run_ensemble(
+    trials,
+    minutes,
+    food_locations,
+    seed = 0,
+    workers = None,
+    chunksize = 1,
+    board_options = None,
+    on_trial = None,
+    retries = 1,
+    stop = None,
+    ):
+    """
+    Runs independent seeded trials of Board across a pool of worker processes
+    Each trial is handed back to the parent as soon as its chunk finishes. If a worker
+    crashes, the trials that already finished are kept and the unfinished chunks are
+    run again, each in a process of its own so a repeated crash only loses its own
+    chunk, up to retries times. Chunks that still fail are recorded in Ensemble.failed.
+        Parameters:
+            trials (int) : the number of trials
+            minutes (int) : how many minutes to simulate in each trial
+            food_locations (dict) : the food layout passed to Board.run
+            seed (int) : the seed of the whole ensemble
+            workers (int or None) : the number of worker processes, None for one per core
+            chunksize (int) : the number of trials each worker runs per task
+            board_options (dict or None) : keyword arguments for Board
+            on_trial (callable or None) : called as on_trial(trial, remaining) for each finished trial
+            retries (int) : how many times unfinished chunks are rerun after a failure
+            stop (lst or None) : convergence detectors that end a trial early (see convergence.py),
+                whose reasons are recorded in Ensemble.stopped
+        Returns
+            ensemble (Ensemble) : the results of every completed trial
+    """
+    board_options = board_options or {}
+    seeds = dict(enumerate(trial_seeds(seed, trials)))
+    ensemble = Ensemble(food_locations, seeds)
+    items = list(seeds.items())
+    pending = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+
+    workers = workers or os.cpu_count()
+    for attempt in range(retries + 1):
+        failed_chunks = []
+        if attempt == 0:
+            executor, task = ProcessPoolExecutor(max_workers=workers), run_chunk
+        else:
+            executor, task = ThreadPoolExecutor(max_workers=workers), run_isolated_chunk
+        with executor:
+            futures = {
+                executor.submit(task, chunk, minutes, food_locations, board_options, stop) : chunk
+                for chunk in pending
+            }
+            for future in as_completed(futures):
+                try:
+                    results = future.result()
+                except Exception:
+                    failed_chunks.append(futures[future])
+                    continue
+                for trial, remaining, stop_reason in results:
+                    ensemble.remaining[trial] = remaining
+                    if stop_reason is not None:
+                        ensemble.stopped[trial] = stop_reason
+                    if on_trial is not None:
+                        on_trial(trial, remaining)
+        pending = failed_chunks
+        if not pending:
+            break
+
+    ensemble.failed = sorted(trial for chunk in pending for trial, _ in chunk)
+    return ensemble
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many trials of the model and average the visits per minute")
+    parser.add_argument('--trials', type=int, default=10)
+    parser.add_argument('--minutes', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunksize', type=int, default=1)
+    parser.add_argument('--engine', default="arrays")
+    parser.add_argument('--output', default='ensemble.csv')
+    parser.add_argument('--stop', nargs='*', default=None,
+                        help="end trials early once one of these detectors fires (see convergence.DETECTORS)")
+    args = parser.parse_args()
+
+    food_locations ={(192,128) : 100, (64,128) : 10}
+    ensemble = run_ensemble(
+        args.trials,
+        args.minutes,
+        food_locations,
+        seed = args.seed,
+        workers = args.workers,
+        chunksize = args.chunksize,
+        board_options = {'engine' : args.engine},
+        on_trial = lambda trial, remaining: print(f"trial {trial} finished"),
+        stop = detectors(args.stop),
+    )
+    if ensemble.failed:
+        print(f"trials {ensemble.failed} failed")
+    ensemble.to_csv(args.output)
@@ -0,0 +1,248 @@
+import json
+import os
+
+import numpy as np
+from .lattice import Lattice
+
+#The lattices of a Board that are recorded by default
+LATTICES = ('pheromones', 'food')
+
+
+def index_dtype(channels, lattices):
+    """
+    Returns the structured dtype of one frame's index record
+        Parameters:
+            channels (lst of str) : the arrays stored per frame
+            lattices (lst of str) : the lattices recorded
+    """
+    return np.dtype(
+        [('step', np.int64), ('keyframe', np.bool_)]
+        + [(f"{lattice}_clock", np.int64) for lattice in lattices]
+        + [(f"{channel}_offset", np.int64) for channel in channels]
+        + [(f"{channel}_count", np.int64) for channel in channels]
+    )
+
+
+class History():
+    """Frames of a Board's lattices, appended to a file as sparse deltas
+    Every interval steps a frame of each lattice is recorded. A frame only stores the
+    cells that changed since the previous frame, as a block of flat cell indices followed
+    by a block of their new values, appended to the data file at path. Every
+    keyframe_interval frames a keyframe stores every nonzero cell instead, so reading a
+    frame never needs more than keyframe_interval deltas (see Replay).
+
+    Decaying lattices are stored as their raw values and last-update times (see Lattice),
+    which only change where ants are, and are decayed when a frame is read. This keeps
+    deltas small while pheromones evaporate everywhere.
+
+    The file at path + '.index' holds one fixed-size record per frame with the step, the
+    lattice clocks and where each block starts, and path + '.json' describes the lattices.
+    Attributes:
+    path : str
+        the data file
+    interval : int
+        the number of steps between frames
+    keyframe_interval : int
+        the number of frames between keyframes
+    lattices : lst of str
+        the Board attributes recorded
+    frames : int
+        the number of frames recorded so far
+    """
+    def __init__(self, path, interval=1, keyframe_interval=600, lattices=LATTICES):
+        """
+            Parameters:
+                path (str) : the data file to write
+                interval (int) : the number of steps between frames
+                keyframe_interval (int) : the number of frames between keyframes
+                lattices (lst of str) : the Board attributes to record
+        """
+        self.path = path
+        self.interval = interval
+        self.keyframe_interval = keyframe_interval
+        self.lattices = list(lattices)
+        self.frames = 0
+
+    def channels(self, board):
+        """
+        Returns the arrays recorded for each frame, keyed by channel name
+        """
+        channels = {}
+        for name in self.lattices:
+            lattice = getattr(board, name)
+            channels[name] = lattice.values
+            if lattice.last is not None:
+                channels[name + '_last'] = lattice.last
+        return channels
+
+    def start(self, board):
+        """
+        Starts a history of a board, truncating the files at path, and records its first frame
+        """
+        for name in self.lattices:
+            if not getattr(board, name).dense:
+                raise ValueError(f"cannot record the history of {name}, which is not stored densely (storage='dense' is required)")
+        channels = self.channels(board)
+        self.dtype = index_dtype(list(channels), self.lattices)
+        header = {
+            'interval' : self.interval,
+            'keyframe_interval' : self.keyframe_interval,
+            'lattices' : {
+                name : {
+                    'shape' : list(getattr(board, name).shape),
+                    'dtype' : getattr(board, name).dtype.str,
+                    'decay' : getattr(board, name).decay,
+                    'decay_rate' : getattr(board, name).decay_rate,
+                    'scale' : getattr(board, name).scale,
+                }
+                for name in self.lattices
+            },
+            'channels' : {name : array.dtype.str for name, array in channels.items()},
+        }
+        with open(self.path + '.json', 'w') as file:
+            json.dump(header, file)
+        self.data = open(self.path, 'wb')
+        self.index = open(self.path + '.index', 'wb')
+        self.frames = 0
+        self.previous = {name : np.zeros_like(array) for name, array in channels.items()}
+        self.record(board)
+
+    def observe(self, board, counts=None):
+        """
+        Called after every step of the board
+        """
+        if board.time % self.interval == 0:
+            self.record(board)
+
+    def record(self, board):
+        """
+        Appends a frame of the board now
+        """
+        keyframe = self.frames % self.keyframe_interval == 0
+        entry = np.zeros(1, dtype=self.dtype)
+        entry['step'] = board.time
+        entry['keyframe'] = keyframe
+        for name in self.lattices:
+            entry[f"{name}_clock"] = getattr(board, name).clock
+        for name, array in self.channels(board).items():
+            flat = array.reshape(-1)
+            previous = self.previous[name].reshape(-1)
+            if keyframe:
+                changed = np.flatnonzero(flat)
+            else:
+                changed = np.flatnonzero(flat != previous)
+            entry[f"{name}_offset"] = self.data.tell()
+            entry[f"{name}_count"] = len(changed)
+            self.data.write(changed.astype(np.int32).tobytes())
+            self.data.write(flat[changed].tobytes())
+            previous[...] = flat
+        self.index.write(entry.tobytes())
+        self.frames += 1
+
+    def close(self):
+        """
+        Finishes writing the history
+        """
+        self.data.close()
+        self.index.close()
+
+
+class Replay():
+    """A history written by History, read lazily
+    The data file is memory-mapped, so only the blocks of the frames that are read are
+    loaded. frame(i) decodes from the nearest keyframe at or before i; iterating over a
+    replay decodes each frame from the previous one.
+    Attributes:
+    header : dict
+        the description of the recorded lattices
+    index : np structured array
+        one record per frame (see index_dtype)
+    steps : np array of ints
+        the step of each frame
+    """
+    def __init__(self, path):
+        """
+            Parameters:
+                path (str) : the data file of the history
+        """
+        with open(path + '.json') as file:
+            self.header = json.load(file)
+        lattices = list(self.header['lattices'])
+        channels = self.header['channels']
+        dtype = index_dtype(list(channels), lattices)
+        frames = os.path.getsize(path + '.index') // dtype.itemsize
+        self.index = np.fromfile(path + '.index', dtype=dtype, count=frames)
+        self.steps = self.index['step']
+        self.data = np.memmap(path, dtype=np.uint8, mode='r') if os.path.getsize(path) else np.zeros(0, dtype=np.uint8)
+        self.decoders = {
+            name : Lattice(tuple(lattice['shape']), np.dtype(lattice['dtype']), lattice['decay'], lattice['decay_rate'], lattice.get('scale'))
+            for name, lattice in self.header['lattices'].items()
+        }
+
+    def __len__(self):
+        return len(self.index)
+
+    def block(self, entry, channel):
+        """
+        Returns the cell indices and values one frame stores for a channel
+        """
+        dtype = np.dtype(self.header['channels'][channel])
+        offset = int(entry[f"{channel}_offset"])
+        count = int(entry[f"{channel}_count"])
+        cells = self.data[offset:offset + 4 * count].view(np.int32)
+        start = offset + 4 * count
+        values = self.data[start:start + dtype.itemsize * count].view(dtype)
+        return cells, values
+
+    def apply(self, state, entry):
+        """
+        Updates the raw channel arrays of a frame to the next frame
+        """
+        for channel, array in state.items():
+            if entry['keyframe']:
+                array[...] = 0
+            cells, values = self.block(entry, channel)
+            array.reshape(-1)[cells] = values
+
+    def decode(self, state, entry):
+        """
+        Returns the lattices of a frame from its raw channel arrays
+        """
+        lattices = {}
+        for name, decoder in self.decoders.items():
+            values = state[name]
+            if decoder.decay is not None:
+                values = decoder.decayed(values, entry[f"{name}_clock"] - state[name + '_last'])
+            lattices[name] = decoder.decode(np.array(values, dtype=decoder.dtype))
+        return lattices
+
+    def empty_state(self):
+        shapes = {name : lattice['shape'] for name, lattice in self.header['lattices'].items()}
+        return {
+            channel : np.zeros(shapes[channel.removesuffix('_last')], dtype=np.dtype(dtype))
+            for channel, dtype in self.header['channels'].items()
+        }
+
+    def frame(self, i):
+        """
+        Reconstructs one frame
+            Parameters:
+                i (int) : the frame number (negative numbers count from the end)
+            Returns
+                lattices (dict) : the values of each lattice, keyed by name
+        """
+        i = range(len(self))[i]
+        keyframe = np.flatnonzero(self.index['keyframe'][:i + 1])[-1]
+        state = self.empty_state()
+        for entry in self.index[keyframe:i + 1]:
+            self.apply(state, entry)
+        return self.decode(state, self.index[i])
+
+    def __iter__(self):
+        """
+        Yields the lattices of every frame in order
+        """
+        state = self.empty_state()
+        for entry in self.index:
+            self.apply(state, entry)
+            yield self.decode(state, entry)
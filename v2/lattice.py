@@ -0,0 +1,389 @@
+import uuid
+
+import numpy as np
+
+DECAY_MODES = (None, "linear", "exponential")
+
+#The ways a lattice can store real values: the cell dtype and, for fixed-point cells, the
+#number of steps per unit (a uint16 cell with a scale of 16 holds 0 to 4095.9375 in steps of 1/16)
+PRECISIONS = {
+    "float64" : (np.float64, None),
+    "float32" : (np.float32, None),
+    "fixed16" : (np.uint16, 16),
+}
+
+class Lattice():
+    """A grid of cell values stored as a contiguous NumPy array
+    Cells are addressed as (x, y): the first array axis is x and the second is y,
+    which is the same order the old dataframes were indexed in (df[x][y]).
+
+    A lattice can decay its values every time step (evaporation). The decay is lazy:
+    tick() only advances a clock, each cell remembers the time it was last brought
+    up to date, and the decay a cell has accumulated since then is applied when the
+    cell is next read or written. The cost of decay is therefore proportional to the
+    cells that are actually used rather than the size of the lattice. values may be
+    stale for cells that have not been touched; call materialize() before reading it
+    directly.
+
+    A lattice can also hold a stack of independent grids (replicas) along a leading
+    axis. Every cell method then takes the replica of each position as well.
+
+    A lattice with a scale stores fixed-point values: cell values are integers counting
+    steps of 1 / scale. Every cell method takes and returns real values, which are
+    rounded to the nearest step and saturate at the range of the dtype when written,
+    and decay rounds down, so values can neither overflow nor stop short of 0.
+
+    Once track_changes() has been called, the lattice records which square tiles of
+    cells have been written since a given generation, so snapshots of it can be
+    updated incrementally (see checkpoint.py).
+    Attributes:
+    values : np array
+        the cell values, with shape (width, height) or (replicas, width, height)
+        (the fixed-point steps for lattices with a scale)
+    scale : int or None
+        the number of fixed-point steps per unit, None for cells that hold their value directly
+    decay : str or None ("linear" or "exponential")
+        linear decay subtracts decay_rate per time step (stopping at 0), exponential
+        decay multiplies by (1 - decay_rate) per time step, None disables decay
+    decay_rate : float
+        how fast the values decay
+    clock : int
+        the number of time steps that have passed
+    last : np array of ints or None
+        the clock value at which each cell was last brought up to date
+    generation : int
+        the current generation of change tracking
+    tile_generation : np array of ints or None
+        the generation in which each tile was last written, None if changes are not tracked
+    """
+    #Whether every cell is stored (see tiled.py for lattices that store only some)
+    dense = True
+
+    def __init__(self, shape, dtype=np.float64, decay=None, decay_rate=1, scale=None):
+        """
+            Parameters:
+                shape (int or tuple of ints) : the width and height of the lattice (an int for a square),
+                    optionally preceded by the number of replicas
+                dtype (np dtype) : the type of the cell values
+                decay (str or None) : "linear", "exponential" or None for no decay
+                decay_rate (float) : how fast the values decay
+                scale (int or None) : the number of fixed-point steps per unit, for integer dtypes
+        """
+        if decay not in DECAY_MODES:
+            raise ValueError(f"unknown decay {decay!r}, expected one of {DECAY_MODES}")
+        if isinstance(shape, (int, np.integer)):
+            shape = (shape, shape)
+        self.values = np.zeros(shape, dtype=dtype)
+        self.scale = scale
+        self.decay = decay
+        self.decay_rate = decay_rate
+        self.clock = 0
+        self.last = np.zeros(shape, dtype=np.int32) if decay else None
+        self.generation = 0
+        self.tile_size = None
+        self.tile_generation = None
+        self.tracking_id = None
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    def contains(self, x, y):
+        """
+        Returns true where the position is in the lattice and false if else
+            Parameters:
+                x (int or np array of ints) : x position
+                y (int or np array of ints) : y position
+        """
+        return (x >= 0) & (x < self.shape[-2]) & (y >= 0) & (y < self.shape[-1])
+
+    def index(self, x, y, replica=None):
+        """
+        Returns the numpy index of cells, given their positions and (for stacked lattices) replicas
+        """
+        return (x, y) if replica is None else (replica, x, y)
+
+    def flat_index(self, x, y, replica=None):
+        """
+        Returns a single integer per cell, unique within the lattice
+        """
+        return np.ravel_multi_index(self.index(x, y, replica), self.shape)
+
+    def unflatten(self, flat_index):
+        """
+        Returns the numpy index of the cells with the given flat indexes
+        """
+        return np.unravel_index(flat_index, self.shape)
+
+    def track_changes(self, tile_size=64):
+        """
+        Starts recording which tiles are written
+            Parameters:
+                tile_size (int) : the width and height of a tile
+        """
+        tiles = [-(-length // tile_size) for length in self.shape[-2:]]
+        self.tile_size = tile_size
+        self.tile_generation = np.zeros(self.shape[:-2] + tuple(tiles), dtype=np.int64)
+        self.tracking_id = uuid.uuid4().hex
+
+    def tile_index(self, position):
+        """
+        Returns the tile index of positions (ints, arrays of ints or slices) along one axis
+        """
+        if isinstance(position, slice):
+            start = None if position.start is None else position.start // self.tile_size
+            stop = None if position.stop is None else -(-position.stop // self.tile_size)
+            return slice(start, stop)
+        return np.asarray(position) // self.tile_size
+
+    def touch(self, x, y, replica=None):
+        """
+        Marks the tiles holding some cells as written in the current generation
+        """
+        if self.tile_generation is None:
+            return
+        self.tile_generation[self.index(self.tile_index(x), self.tile_index(y), replica)] = self.generation
+
+    def changed_tiles(self, since):
+        """
+        Returns the regions of the tiles written in or after a generation
+            Parameters:
+                since (int) : the first generation to include
+            Returns
+                regions (lst of tuples of slices) : the cells of each changed tile
+        """
+        size = self.tile_size
+        return [
+            tuple(slice(i * size, (i + 1) * size) for i in tile)
+            for tile in np.argwhere(self.tile_generation >= since)
+        ]
+
+    def encode(self, values):
+        """
+        Returns real values as cell values: fixed-point steps rounded to the nearest step
+        and saturated at the range of the dtype, or the values themselves without a scale
+        """
+        if self.scale is None:
+            return values
+        return np.clip(np.rint(np.asarray(values) * self.scale), 0, np.iinfo(self.dtype).max)
+
+    def decode(self, values):
+        """
+        Returns cell values as real values
+        """
+        if self.scale is None:
+            return values
+        return values / self.scale
+
+    def decayed(self, values, elapsed):
+        """
+        Returns values after they have decayed for a number of time steps
+            Parameters:
+                values (np array) : the cell values
+                elapsed (np array of ints) : the number of time steps each value has decayed for
+        """
+        if self.scale is not None:
+            #Rounding down guarantees that fixed-point values keep decaying to 0
+            if self.decay == "linear":
+                return np.maximum(values - np.ceil(self.decay_rate * self.scale * elapsed), 0)
+            return np.floor(values * (1 - self.decay_rate) ** elapsed)
+        if self.decay == "linear":
+            return np.maximum(values - self.decay_rate * elapsed, 0)
+        return values * (1 - self.decay_rate) ** elapsed
+
+    def settle(self, x, y, replica=None):
+        """
+        Applies the decay that cells have accumulated since they were last brought up to date
+            Parameters:
+                x (int or np array of ints) : x positions in the lattice
+                y (int or np array of ints) : y positions in the lattice
+                replica (int or np array of ints or None) : the replica of each position
+        """
+        if self.decay is None:
+            return
+        cells = self.index(x, y, replica)
+        elapsed = self.clock - self.last[cells]
+        self.values[cells] = self.decayed(self.values[cells], elapsed)
+        self.last[cells] = self.clock
+        self.touch(x, y, replica)
+
+    def tick(self, steps=1):
+        """
+        Advances the decay clock. Costs nothing per cell.
+        """
+        self.clock += steps
+
+    def materialize(self):
+        """
+        Brings every cell up to date so that values can be read directly
+        """
+        if self.decay is None:
+            return
+        self.values[...] = self.decayed(self.values, self.clock - self.last)
+        self.last[...] = self.clock
+        if self.tile_generation is not None:
+            self.tile_generation[...] = self.generation
+
+    def get(self, x, y, replica=None):
+        """
+        Returns the value of a single cell as a python scalar
+        """
+        self.settle(x, y, replica)
+        return self.decode(self.values[self.index(x, y, replica)]).item()
+
+    def set(self, x, y, value, replica=None):
+        """
+        Sets the value of a single cell
+        """
+        cell = self.index(x, y, replica)
+        self.values[cell] = self.encode(value)
+        if self.last is not None:
+            self.last[cell] = self.clock
+        self.touch(x, y, replica)
+
+    def add(self, x, y, amount, replica=None):
+        """
+        Adds an amount to a single cell
+        """
+        self.settle(x, y, replica)
+        cell = self.index(x, y, replica)
+        if self.scale is None:
+            self.values[cell] += amount
+        else:
+            self.values[cell] = self.encode(self.decode(self.values[cell]) + amount)
+        self.touch(x, y, replica)
+
+    def gather(self, x, y, fill=0, replica=None):
+        """
+        Reads many cells at once
+            Parameters:
+                x (np array of ints) : x positions
+                y (np array of ints) : y positions, the same shape as x
+                fill (scalar) : the value returned for positions outside the lattice
+                replica (np array of ints or None) : the replica of each position, for stacked lattices
+            Returns
+                values (np array) : the cell values, the same shape as x
+        """
+        x = np.asarray(x)
+        y = np.asarray(y)
+        inside = self.contains(x, y)
+        x = np.where(inside, x, 0)
+        y = np.where(inside, y, 0)
+        self.settle(x, y, replica)
+        return np.where(inside, self.decode(self.values[self.index(x, y, replica)]), fill)
+
+    def peek(self, x, y, fill=0, replica=None):
+        """
+        Reads many cells like gather, but computes their decay without storing it, so
+        nothing is written (for reading cells other processes may be reading too)
+        """
+        x = np.asarray(x)
+        y = np.asarray(y)
+        inside = self.contains(x, y)
+        cells = self.index(np.where(inside, x, 0), np.where(inside, y, 0), replica)
+        values = self.values[cells]
+        if self.decay is not None:
+            values = self.decayed(values, self.clock - self.last[cells])
+        return np.where(inside, self.decode(values), fill)
+
+    def scatter(self, x, y, values, replica=None):
+        """
+        Writes many cells at once. Positions must be in the lattice; when a position
+        is repeated the last value written wins.
+        """
+        cells = self.index(x, y, replica)
+        self.values[cells] = self.encode(values)
+        if self.last is not None:
+            self.last[cells] = self.clock
+        self.touch(x, y, replica)
+
+    def scatter_add(self, x, y, amounts, replica=None):
+        """
+        Adds to many cells at once. Positions must be in the lattice; repeated positions
+        accumulate every amount.
+        """
+        self.settle(x, y, replica)
+        if self.scale is None:
+            np.add.at(self.values, self.index(x, y, replica), amounts)
+        else:
+            #Summed in real values first, so the cells saturate instead of wrapping around
+            keys = self.flat_index(x, y, replica)
+            cells, cell_of = np.unique(keys, return_inverse=True)
+            totals = np.bincount(cell_of, weights=np.broadcast_to(amounts, keys.shape), minlength=len(cells))
+            cell_index = self.unflatten(cells)
+            self.values[cell_index] = self.encode(self.decode(self.values[cell_index]) + totals)
+        self.touch(x, y, replica)
+
+    def nonzero(self):
+        """
+        Returns the positions of the cells that hold a value (which may since have decayed to zero)
+            Returns
+                xs, ys (np arrays of ints) : the positions of the cells
+        """
+        return np.nonzero(self.values)[-2:]
+
+    def occupied_tiles(self, tile_size):
+        """
+        Returns which square tiles of cells hold a value (which may since have decayed to zero)
+            Parameters:
+                tile_size (int) : the width and height of a tile
+            Returns
+                occupied (np array of bools) : one entry per tile, indexed [tile x, tile y]
+        """
+        width, height = self.shape[-2:]
+        tiles_x, tiles_y = -(-width // tile_size), -(-height // tile_size)
+        padded = np.zeros(self.shape[:-2] + (tiles_x * tile_size, tiles_y * tile_size), dtype=bool)
+        padded[..., :width, :height] = self.values != 0
+        occupied = padded.reshape(self.shape[:-2] + (tiles_x, tile_size, tiles_y, tile_size)).any(axis=(-3, -1))
+        return occupied.reshape(-1, tiles_x, tiles_y).any(axis=0)
+
+    def state(self):
+        """
+        Returns the arrays that hold the lattice's cells, for saving (see restore)
+        """
+        arrays = {'values' : self.values}
+        if self.last is not None:
+            arrays['last'] = self.last
+        return arrays
+
+    def restore(self, arrays):
+        """
+        Replaces the lattice's cells with arrays returned by state()
+        """
+        for name, array in arrays.items():
+            getattr(self, name)[...] = array
+
+    def to_array(self):
+        """
+        Returns an up to date dense copy of the (real) cell values
+        """
+        self.materialize()
+        return self.decode(self.values.copy())
+
+    def count_nonzero(self):
+        """
+        Returns the number of cells whose up to date value is not zero, without bringing them up to date
+        """
+        if self.decay is None:
+            return int(np.count_nonzero(self.values))
+        return int(np.count_nonzero(self.decayed(self.values, self.clock - self.last)))
+
+    def window(self, min_x, max_x, min_y, max_y):
+        """
+        Returns a view of the cells with min_x <= x < max_x and min_y <= y < max_y
+        (a copy of their real values for lattices with a scale)
+        """
+        self.settle(slice(min_x, max_x), slice(min_y, max_y))
+        return self.decode(self.values[min_x:max_x, min_y:max_y])
+
+    def to_frame(self):
+        """
+        Returns a copy of the lattice as a pandas DataFrame laid out like the old
+        lattices: one column per x and one row per y, so that df[x][y] is cell (x, y)
+        """
+        import pandas as pd
+        return pd.DataFrame(self.to_array().T)
@@ -1,9 +1,13 @@
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import random
-import csv
-from ant import Ant
+from . import checkpoint
+from .ant import Ant
+from .colony import Colony, TurningKernel, deposit_pheromones
+from .diffusion import Diffusion
+from .lattice import Lattice, PRECISIONS
+from .tiled import TiledLattice, SparseLattice
+from .navigation import navigation_field
+from .pool import AntPool
+from .recorder import Recorder
 
 class Board():
     """The model containing the lattice and a set of ants
@@ -22,14 +26,65 @@ class Board():
         the amount of pheramone above which an ant cannot differentiate.  
     turning_kernal : list of floats
         the proabilitlies that an exploring ant will make a specfic turn
+    turning : TurningKernel
+        the turning kernel compiled into a sampling table (legacy_turning=True
+        reproduces the original sampling, which went straight too often)
+    deposition : str ("sequential" or "simultaneous")
+        how ants sharing a cell deposit pheromone (see colony.deposit_pheromones)
+    evaporation : str or None ("linear" or "exponential")
+        how pheromones evaporate each time step, None keeps them forever
+    evaporation_rate : float
+        how much pheromone evaporates per time step (an amount for linear
+        evaporation, a fraction for exponential evaporation)
+    engine : str ("objects" or "arrays")
+        "objects" keeps Ant objects in an AntPool, "arrays" keeps a vectorized Colony
+    max_ants : int or None
+        the largest number of ants on the board, None for no limit
+    nests : lst of tuples
+        the (x, y) position of every nest, each of which releases an ant every time step
+        (by default a single nest in the middle of the board)
+    navigation : NavigationField
+        the heading towards each nest from every cell, shared by boards of the same geometry
+    diffusion : Diffusion or None
+        spreads pheromone to neighbouring cells every diffusion_interval time steps, with
+        the diffusion coefficient the board was given (see diffusion.py), None for no diffusion
+    precision : str ("float64", "float32" or "fixed16")
+        how pheromone values are stored: in 8 or 4 byte floats, or in 2 byte fixed-point
+        steps of 1/16 that saturate at 4095.9375 (see lattice.PRECISIONS)
+    storage : str ("dense" or "tiled")
+        "dense" stores every cell of the lattices, "tiled" only the tiles of pheromone
+        ants have visited and the food cells (see tiled.py), for very large boards
+    seed_sequence : numpy SeedSequence
+        the seed of the board; spawn() it to seed further independent streams
+    rng : numpy Generator
+        the random number generator all of the board's randomness is drawn from
+    time : int
+        the number of time steps simulated so far
+    recording : tuple or None
+        the samples and recorder state of a run resumed from a checkpoint (see resume)
+    detection : lst or None
+        the state of the convergence detectors of a run resumed from a checkpoint (see resume)
+    profiler : Profiler or None
+        times and counts every step when set (see profiler.py)
+    released : int
+        the number of ants released so far, which numbers the next ant
+    visit_log : VisitLog or None
+        logs every food taken when set (see visits.py)
+    stop_reason : str or None
+        why the last run stopped before its last minute, None if it ran to the end
+    stopped_by : detector or None
+        the convergence detector that stopped the last run (see convergence.py)
 
-    pheromone : pandas Dataframe
+    pheromones : Lattice
         a lattice of pheromone values on board
-    food : pandas Dataframe
+    food : Lattice
         a lattice of food values on board
-    ant : lst of Ants
-        a list of all Ants on board 
+    ants : AntPool or Colony
+        all ants on board 
     """
+    #The methods a step calls, in order
+    phases = ('release_ant', 'deposit', 'evaporate', 'diffuse', 'update_ants', 'clean')
+
     def __init__(
         self, 
         size = 256, 
@@ -38,7 +93,25 @@ class Board():
         delta_phi = 0,
         sauturation_concentration=100,
         turning_kernel = [.36, .047, .008, .004],
+        engine = "objects",
+        seed = None,
+        evaporation = None,
+        evaporation_rate = 1,
+        deposition = "sequential",
+        legacy_turning = False,
+        max_ants = None,
+        nests = None,
+        storage = "dense",
+        precision = "float64",
+        diffusion = 0,
+        diffusion_interval = 1,
         ):
+        if engine not in ("objects", "arrays"):
+            raise ValueError(f"unknown engine {engine!r}, expected 'objects' or 'arrays'")
+        if storage not in ("dense", "tiled"):
+            raise ValueError(f"unknown storage {storage!r}, expected 'dense' or 'tiled'")
+        if precision not in PRECISIONS:
+            raise ValueError(f"unknown precision {precision!r}, expected one of {list(PRECISIONS)}")
 
         #constant variables
         self.size = size
@@ -48,11 +121,89 @@ class Board():
         self.delta_phi = delta_phi
         self.sauturation_concentration = sauturation_concentration
         self.turning_kernel = turning_kernel
+        self.turning = TurningKernel(turning_kernel, legacy=legacy_turning)
+        self.evaporation = evaporation
+        self.deposition = deposition
+        self.evaporation_rate = evaporation_rate
+        self.legacy_turning = legacy_turning
+        self.engine = engine
+        self.storage = storage
+        self.precision = precision
+        self.diffusion = Diffusion(diffusion, diffusion_interval) if diffusion else None
+        self.nests = [(size // 2, size // 2)] if nests is None else [tuple(nest) for nest in nests]
+        self.navigation = navigation_field(size, self.nests)
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        self.rng = np.random.default_rng(seed)
 
         #variable variables
-        self.pheromones = pd.DataFrame(np.zeros((size, size), dtype=np.int32))
-        self.food = pd.DataFrame(np.zeros((size, size), dtype=np.int32))
-        self.ants = []
+        dtype, scale = PRECISIONS[precision]
+        if storage == "tiled":
+            self.pheromones = TiledLattice(size, dtype=dtype, decay=evaporation, decay_rate=evaporation_rate, scale=scale)
+            self.food = SparseLattice(size, dtype=np.int32)
+        else:
+            self.pheromones = Lattice(size, dtype=dtype, decay=evaporation, decay_rate=evaporation_rate, scale=scale)
+            self.food = Lattice(size, dtype=np.int32)
+        self.max_ants = max_ants
+        self.ants = Colony() if engine == "arrays" else AntPool(cap=max_ants)
+        self.time = 0
+        self.recording = None
+        self.detection = None
+        self.profiler = None
+        self.released = 0
+        self.visit_log = None
+        self.stop_reason = None
+        self.stopped_by = None
+
+    def options(self):
+        """
+        Returns the keyword arguments the board was created with, other than its seed
+        """
+        return {
+            'size' : self.size,
+            'deposition_rate' : self.tau,
+            'min_phi' : self.min_phi,
+            'delta_phi' : self.delta_phi,
+            'sauturation_concentration' : self.sauturation_concentration,
+            'turning_kernel' : list(self.turning_kernel),
+            'engine' : self.engine,
+            'evaporation' : self.evaporation,
+            'evaporation_rate' : self.evaporation_rate,
+            'deposition' : self.deposition,
+            'legacy_turning' : self.legacy_turning,
+            'max_ants' : self.max_ants,
+            'nests' : [list(nest) for nest in self.nests],
+            'storage' : self.storage,
+            'precision' : self.precision,
+            'diffusion' : self.diffusion.coefficient if self.diffusion else 0,
+            'diffusion_interval' : self.diffusion.interval if self.diffusion else 1,
+        }
+
+    def checkpoint(self, path, recorder=None, detectors=None):
+        """
+        Saves the board so that resume(path) continues it exactly (see checkpoint.save)
+            Parameters:
+                path (str) : the checkpoint directory
+                recorder (Recorder or None) : the recorder of the current run
+                detectors (lst or None) : the convergence detectors of the current run
+        """
+        if self.visit_log is not None:
+            self.visit_log.flush()
+        checkpoint.save(self, path, recorder, detectors)
+
+    @classmethod
+    def resume(cls, path):
+        """
+        Rebuilds a board from its last checkpoint. Calling run() on it with the same
+        arguments as the interrupted run finishes that run, with the same results as if
+        it had never stopped.
+            Parameters:
+                path (str) : the checkpoint directory
+            Returns
+                board (Board) : the board as it was when the checkpoint was taken
+        """
+        return checkpoint.load(cls, path)
 
     def is_in_grid(self, x , y):
         """
@@ -70,32 +221,44 @@ class Board():
 
     def release_ant(self):
         """
-        Releases an ant from the nest
+        Releases an ant from every nest, unless the board already holds max_ants ants
         """
-        new_ant = Ant((self.size // 2))
-        self.ants.append(new_ant)
+        for nest, location in enumerate(self.nests):
+            if self.max_ants is not None and len(self.ants) >= self.max_ants:
+                return
+            if self.engine == "arrays":
+                self.ants.add(location, self.rng.integers(1, 8), nest, self.released)
+            else:
+                new_ant = Ant(location, self.rng, nest, self.released)
+                self.ants.append(new_ant)
+            self.released += 1
 
     def evaporate(self): 
         """
-        Subtracts a set amount of pheramones from all cells in pheromones
+        Evaporates pheromones from all cells in pheromones. The evaporation is applied
+        lazily, when a cell is next sensed or deposited on (see Lattice).
         """
-        self.pheromones.where(self.pheromones == 0, self.pheromones - 1)
+        self.pheromones.tick()
 
-    def deposit(self):
+    def diffuse(self):
         """
-        Adds of pheramones to the cell where the ant is presents
+        Spreads pheromones to neighbouring cells, every diffusion_interval time steps
         """
-        for ant in self.ants:
-            x = ant.x
-            y = ant.y
-            #Ant adds less pheromone on more saturated trails
-            self.pheromones[x][y] -= ((self.tau / self.sauturation_concentration) * self.pheromones[x][y]) 
-
-            #Ant adds normal amount of pheromones
-            self.pheromones[x][y] += self.tau 
+        if self.diffusion is not None and (self.time + 1) % self.diffusion.interval == 0:
+            self.diffusion.apply(self.pheromones)
 
-            #Ant adds more pheromone when returning to nest
-            self.pheromones[x][y] += ant.food_seen
+    def deposit(self):
+        """
+        Adds of pheramones to the cells where ants are present, for all ants at once.
+        Ants add less pheromone on more saturated trails, a normal amount (tau) of
+        pheromones, and more pheromone when returning to nest (see colony.deposit_pheromones)
+        """
+        if self.engine == "arrays":
+            x, y, food_seen = self.ants.x, self.ants.y, self.ants.food_seen
+        else:
+            states = [(ant.x, ant.y, ant.food_seen) for ant in self.ants]
+            x, y, food_seen = np.array(states, dtype=np.int64).reshape(-1, 3).T
+        deposit_pheromones(self.pheromones, x, y, food_seen, self.tau, self.sauturation_concentration, self.deposition)
 
     def add_food(self, food_locations):
         """
@@ -107,34 +270,31 @@ class Board():
         """
         for location, amount in food_locations.items():
             x,y = location 
-            self.food[x][y] = amount 
+            self.food.set(x, y, amount)
 
-    def find_nearby_values(self, ant, dataframe):
+    def find_nearby_values(self, ant, lattice):
         """
         Finds the values of the cells adjacent to the ant
             Parameters:
                 ant (lst) : the ant to check near
-                dataframe (df) : the dataframe to check
+                lattice (Lattice) : the lattice to check
             Returns
                 values (lst of floats) : the values of the adjecent cells
         """
-        values = []
+        xs = []
+        ys = []
         for i in range(ant.direction - 1, ant.direction + 2, 1):
             i = i % 8 
-            x = ant.x + self.possible_moves[i][0] 
-            y = ant.y + self.possible_moves[i][1]
-            is_in_grid = self.is_in_grid(x, y)
-            if is_in_grid:
-                values.append(dataframe[x][y])
-            else: 
-                values.append(0.0)
-        return values
+            xs.append(ant.x + self.possible_moves[i][0])
+            ys.append(ant.y + self.possible_moves[i][1])
+        return lattice.gather(xs, ys).tolist()
 
-    def ant_follows_trail(self, nearby_pheromones):
+    def ant_follows_trail(self, nearby_pheromones, draw):
         """
         Determines if ant explores or follows a trail at any one time step.
             Parameters:
                 nearby_pheromones (lst): the pheromone amount in the three cells in front of the ant
+                draw (float) : a uniform random number between 0 and 1
             Returns
                 True if ant will follow the trail
         """
@@ -144,32 +304,39 @@ class Board():
             #Ensures the concentration input is not greater than the saturation concentration
             concentration = min(max(nearby_pheromones), self.sauturation_concentration) 
             probability = (self.min_phi + self.delta_phi * concentration)/ 256
-            return random.random() < probability
+            return draw < probability
 
     def update_ants(self):
         """
         Updates ants directions and position 
         """
+        if self.engine == "arrays":
+            return self.ants.update(self)
         explorers = 0
         followers = 0
         gatherers = 0 
         returners = 0 
-        for ant in self.ants:
+        #The random numbers for every ant are drawn in one block per step
+        follow_draws = self.rng.random(len(self.ants))
+        turns = self.turning.sample(self.rng, len(self.ants))
+        for i, ant in enumerate(self.ants):
             nearby_pheromones = self.find_nearby_values(ant, self.pheromones)
             nearby_food = self.find_nearby_values(ant, self.food)
             ant.ant_at_nest()
 
             if ant.food_seen:
-                ant.go_to_nest(self.possible_moves)
+                ant.go_to_nest(self.navigation)
                 returners += 1
             elif any(nearby_food):
-                ant.gather(nearby_food, self.food, self.possible_moves)
+                food_x, food_y = ant.gather(nearby_food, self.food, self.possible_moves)
+                if self.visit_log is not None:
+                    self.visit_log.visit(self.time, ant.id, food_x, food_y, ant.food_seen - 1)
                 gatherers += 1
-            elif self.ant_follows_trail(nearby_pheromones):
+            elif self.ant_follows_trail(nearby_pheromones, follow_draws[i]):
                 ant.follow(nearby_pheromones)
                 followers += 1
             else:
-                ant.explore(self.turning_kernel)
+                ant.explore(turns[i])
                 explorers += 1
 
             ant.x += self.possible_moves[ant.direction][0]
@@ -180,53 +347,152 @@ class Board():
         """
         Deletes ants which have wandered off board
         """
-        for ant in self.ants.copy():
-            if not self.is_in_grid(ant.x, ant.y):
-                self.ants.remove(ant)
+        if self.engine == "arrays":
+            self.ants.remove(~self.ants.in_grid(self.size))
+            return
+        self.ants.remove_where(lambda ant: not self.is_in_grid(ant.x, ant.y))
 
     def step(self):
         """
         Simulates a single timestep (second)
+            Returns
+                explorers, followers, gatherers, returners (ints) : how many ants were in each mode
         """
+        if self.profiler is not None:
+            return self.profiler.profile_step(self)
         self.release_ant()
         self.deposit()
         self.evaporate()
-        self.update_ants()
+        self.diffuse()
+        counts = self.update_ants()
         self.clean()
+        self.time += 1
+        return counts
 
-    def run(self, minutes, food_locations):
+    def run(
+        self,
+        minutes,
+        food_locations,
+        path='data.csv',
+        verbose=True,
+        recorder=None,
+        checkpoint=None,
+        checkpoint_interval=5,
+        history=None,
+        observers=None,
+        stop=None,
+        ):
         """
         Runs the model for a specified number of minutes
+            Parameters:
+                minutes (int) : how many minutes to simulate
+                food_locations (dict) : 
+                    keys -> locations in (x,y) form
+                    vals -> amount of food to add
+                path (str or None) : the csv file the remaining food is exported to at the end,
+                    one row per sample, None to not write one
+                verbose (bool) : whether to print each minute as it finishes
+                recorder (Recorder or None) : records the run, by default a Recorder that keeps
+                    the food remaining every minute in memory
+                checkpoint (str or None) : the directory to checkpoint the run to, None to not checkpoint
+                checkpoint_interval (int) : how many minutes pass between checkpoints
+                history (History or None) : captures frames of the lattices for replay (see history.py)
+                observers (lst or None) : further objects with start(board), observe(board, counts)
+                    and close() methods, called like the recorder
+                stop (lst or None) : convergence detectors (see convergence.py), checked at the end
+                    of every minute. The run ends as soon as one of them fires, and stop_reason
+                    records why
+            Returns
+                remaining (np array) : the food remaining at each location at each sample,
+                    with shape (minutes, locations) for the default recorder (fewer minutes
+                    if the run stopped early)
+        """
+        if recorder is None:
+            recorder = Recorder(food_locations)
+        #A board resumed from a checkpoint carries on where its run stopped
+        if self.time == 0:
+            self.add_food(food_locations)
+        recorder.start(self)
+        if self.recording is not None:
+            recorder.restore(*self.recording)
+        observers = list(observers or []) + ([history] if history is not None else [])
+        for observer in observers:
+            observer.start(self)
+        if self.profiler is not None:
+            self.profiler.start(self)
+        stop = list(stop or [])
+        for detector in stop:
+            detector.start(self)
+        if self.detection is not None:
+            for detector, state in zip(stop, self.detection):
+                detector.restore(state)
+        self.stop_reason = None
+        self.stopped_by = None
+        location_xs, location_ys = np.array(list(food_locations), dtype=np.int64).reshape(-1, 2).T
+        while self.time < minutes * 60:
+            counts = self.step()
+            recorder.observe(self, counts)
+            for observer in observers:
+                observer.observe(self, counts)
+            if self.time % 60 == 0:
+                minute = self.time // 60 - 1
+                if verbose:
+                    print(minute)
+                #Checked before checkpointing, so the saved detectors have seen this minute
+                if stop and self.converged(stop, self.food.gather(location_xs, location_ys)):
+                    if verbose:
+                        print(f"stopped after minute {minute}: {self.stop_reason}")
+                    break
+                if checkpoint is not None and (minute + 1) % checkpoint_interval == 0:
+                    self.checkpoint(checkpoint, recorder, stop)
+        recorder.close()
+        for observer in observers:
+            observer.close()
+        if self.profiler is not None and verbose:
+            print(self.profiler.report())
+        if path is not None:
+            recorder.to_csv(path)
+        return np.array(recorder.samples()['food'])
+
+    def converged(self, detectors, remaining):
+        """
+        Checks whether any convergence detector fires, recording which one and why
+            Parameters:
+                detectors (lst) : the detectors of the run (see convergence.py)
+                remaining (np array) : the food remaining at each location now
+            Returns
+                (boolean) : True if the run should stop
         """
-        self.add_food(food_locations)
-        with open('data.csv', 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(food_locations.keys())
-        for minute in range(minutes): 
-            for seconds in range(60):
-                self.step()
-            print(minute)   
-            food_data = self.collect_food_data(food_locations)
-            with open('data.csv', 'a', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(food_data.values())
+        for detector in detectors:
+            reason = detector.check(self, remaining)
+            if reason is not None:
+                self.stop_reason = reason
+                self.stopped_by = detector
+                return True
+        return False
 
     def draw(self):
         """
         Draws the pheromones trails and the food
         """
+        #Imported here so that importing the model stays fast
+        import matplotlib.pyplot as plt
         ant_xs = []
         ant_ys = []
         center_x, center_y = self.pheromones.shape[0] // 2, self.pheromones.shape[1] // 2
-        pheromones = self.pheromones.copy()
-        food = self.food.copy()
+        pheromones = self.pheromones.to_frame()
+        food = self.food.to_frame().astype(float)
         food[food == 0] = np.nan
-        for ant in self.ants:
-            ant_xs.append((ant.x + .5))
-            ant_ys.append((ant.y + .5))
+        if self.engine == "arrays":
+            ant_xs = list(self.ants.x + .5)
+            ant_ys = list(self.ants.y + .5)
+        else:
+            for ant in self.ants:
+                ant_xs.append((ant.x + .5))
+                ant_ys.append((ant.y + .5))
         plt.pcolormesh(pheromones, cmap='Greys')
         plt.pcolormesh(food, cmap='jet')
-        cmap = plt.cm.get_cmap('jet')
+        cmap = plt.get_cmap('jet')
         cmap.set_bad(alpha=0)
 
         # plt.scatter(ant_xs, ant_ys) #this line is still in development
@@ -243,13 +509,14 @@ class Board():
         current_food_at_locations = {}
         for location, amount in food_locations.items():
             x,y = location 
-            current_food_at_locations[location] = self.food[x][y]
+            current_food_at_locations[location] = self.food.get(x, y)
         return current_food_at_locations
 
-            
-model = Board()
-food_locations ={(192,128) : 100, (64,128) : 10}
-model.run(minutes = 60, food_locations = food_locations)
-model.draw()
+
+if __name__ == "__main__":
+    model = Board()
+    food_locations ={(192,128) : 100, (64,128) : 10}
+    model.run(minutes = 60, food_locations = food_locations)
+    model.draw()
 
 
@@ -0,0 +1,141 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+from .colony import MOVES, DIRECTION_OF
+
+#Fields already built, keyed by board geometry, least recently used first (see navigation_field)
+FIELDS = OrderedDict()
+
+#The number of fields kept; fields with obstacles hold a grid the size of the board per nest
+MAX_FIELDS = 16
+
+
+def straight_headings(size, nest):
+    """
+    Returns the direction from every cell straight towards a nest, the same heading
+    Ant.go_to_nest used to compute from the signs of the distances
+        Parameters:
+            size (int) : the width and height of the board
+            nest (tuple of ints) : the (x, y) position of the nest
+        Returns
+            headings (np array of ints) : a (size x size) array of direction indexes
+    """
+    x = np.arange(size)[:, None]
+    y = np.arange(size)[None, :]
+    return DIRECTION_OF[np.sign(nest[0] - x) + 1, np.sign(nest[1] - y) + 1]
+
+
+def path_lengths(size, nest, obstacles):
+    """
+    Returns the length of the shortest path of moves from every cell to a nest
+        Parameters:
+            size (int) : the width and height of the board
+            nest (tuple of ints) : the (x, y) position of the nest
+            obstacles (np array of bools) : a (size x size) array which is True where ants cannot go
+        Returns
+            lengths (np array) : the number of moves, inf for cells that cannot reach the nest
+    """
+    lengths = np.full((size, size), np.inf)
+    lengths[nest] = 0
+    frontier = np.zeros((size, size), dtype=bool)
+    frontier[nest] = True
+    distance = 0
+    while frontier.any():
+        distance += 1
+        reached = np.zeros_like(frontier)
+        for dx, dy in MOVES:
+            #A cell is reached if one move from it lands on the frontier
+            reached[max(-dx, 0):size - max(dx, 0), max(-dy, 0):size - max(dy, 0)] |= \
+                frontier[max(dx, 0):size - max(-dx, 0), max(dy, 0):size - max(-dy, 0)]
+        frontier = reached & ~obstacles & np.isinf(lengths)
+        lengths[frontier] = distance
+    return lengths
+
+
+def shortest_path_headings(size, nest, obstacles):
+    """
+    Returns the direction from every cell along a shortest path to a nest that avoids
+    obstacles. Where several moves are equally short the straight heading is kept, so
+    without obstacles this matches straight_headings. Cells that cannot reach the nest
+    keep the straight heading.
+    """
+    lengths = path_lengths(size, nest, obstacles)
+    padded = np.pad(lengths, 1, constant_values=np.inf)
+    neighbours = np.stack([padded[1 + dx:1 + dx + size, 1 + dy:1 + dy + size] for dx, dy in MOVES])
+    straight = straight_headings(size, nest)
+    shortest = neighbours.min(axis=0)
+    keep = np.take_along_axis(neighbours, straight[None], axis=0)[0] == shortest
+    headings = np.where(keep, straight, neighbours.argmin(axis=0))
+    return np.where(np.isinf(lengths), straight, headings)
+
+
+class NavigationField():
+    """The direction returning ants take towards their nest from every cell
+    With obstacles the headings follow shortest paths around them and are computed once,
+    so pointing any number of ants home is a single gather. On an open board the heading
+    is straight towards the nest and is computed from the ants' positions instead, so
+    no grid the size of the board is stored.
+    Attributes:
+    size : int
+        the width and height of the board
+    nests : lst of tuples
+        the (x, y) position of each nest
+    locations : np array of ints
+        the nests as a (nests x 2) array
+    headings : np array of ints or None
+        a (nests x size x size) array, headings[nest, x, y] is the direction towards nest from (x, y),
+        None on an open board
+    """
+    def __init__(self, size, nests, obstacles=None):
+        """
+            Parameters:
+                size (int) : the width and height of the board
+                nests (lst of tuples) : the (x, y) position of each nest
+                obstacles (np array of bools or None) : True where ants cannot go, None for an open board
+        """
+        self.size = size
+        self.nests = [tuple(nest) for nest in nests]
+        self.locations = np.array(self.nests, dtype=np.int64).reshape(-1, 2)
+        self.headings = None
+        if obstacles is not None:
+            fields = [shortest_path_headings(size, nest, np.asarray(obstacles, dtype=bool)) for nest in self.nests]
+            self.headings = np.stack(fields).astype(np.int8)
+
+    def heading(self, x, y, nest=0):
+        """
+        Returns the direction towards a nest from one cell
+        """
+        if self.headings is None:
+            nest_x, nest_y = self.nests[nest]
+            return int(DIRECTION_OF[(nest_x > x) - (nest_x < x) + 1, (nest_y > y) - (nest_y < y) + 1])
+        return int(self.headings[nest, x, y])
+
+    def gather(self, x, y, nest):
+        """
+        Returns the directions towards the nests of many ants at once
+            Parameters:
+                x, y (np arrays of ints) : the positions of the ants, which must be on the board
+                nest (np array of ints) : the nest of each ant
+        """
+        if self.headings is None:
+            nest_x, nest_y = self.locations[nest, 0], self.locations[nest, 1]
+            return DIRECTION_OF[np.sign(nest_x - x) + 1, np.sign(nest_y - y) + 1].astype(np.int64)
+        return self.headings[nest, x, y].astype(np.int64)
+
+
+def navigation_field(size, nests, obstacles=None):
+    """
+    Returns the NavigationField of a board geometry, building it only the first time it is
+    asked for. Only the MAX_FIELDS most recently used fields are kept.
+    """
+    nests = tuple(tuple(int(value) for value in nest) for nest in nests)
+    obstacle_key = None if obstacles is None else hashlib.sha256(np.packbits(np.asarray(obstacles, dtype=bool)).tobytes()).hexdigest()
+    key = (size, nests, obstacle_key)
+    if key in FIELDS:
+        FIELDS.move_to_end(key)
+        return FIELDS[key]
+    FIELDS[key] = NavigationField(size, nests, obstacles)
+    while len(FIELDS) > MAX_FIELDS:
+        FIELDS.popitem(last=False)
+    return FIELDS[key]
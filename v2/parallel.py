@@ -0,0 +1,427 @@
+import multiprocessing
+import os
+import queue
+from multiprocessing import shared_memory
+from threading import BrokenBarrierError
+
+import numpy as np
+from .colony import Colony, AHEAD, MOVES
+from .lattice import Lattice, PRECISIONS
+from .model import Board
+from .recorder import Recorder
+
+
+def strip_bounds(size, workers):
+    """
+    Splits the x axis of a board into one strip per worker
+        Parameters:
+            size (int) : the width and height of the board
+            workers (int) : the number of strips
+        Returns
+            bounds (np array of ints) : strip i holds the cells with bounds[i] <= x < bounds[i + 1]
+    """
+    #Strips must be at least two cells wide, so strips two apart never reach the same cell
+    if workers < 1 or size < 2 * workers:
+        raise ValueError(f"cannot split a board of size {size} into {workers} strips at least 2 cells wide")
+    return np.linspace(0, size, workers + 1).astype(np.int64)
+
+
+def shared_lattice(blocks, name, size, dtype, decay=None, decay_rate=1, scale=None):
+    """
+    Returns a Lattice whose cells live in shared memory blocks
+        Parameters:
+            blocks (dict) : the SharedMemory blocks, keyed by name (name + '_last' for decay clocks)
+            name (str) : the name of the lattice's blocks
+            size (int) : the width and height of the lattice
+            dtype (np dtype) : the type of the cell values
+            decay (str or None) : "linear", "exponential" or None for no decay
+            decay_rate (float) : how fast the values decay
+            scale (int or None) : the number of fixed-point steps per unit, for integer dtypes
+    """
+    lattice = Lattice((0, 0), dtype=dtype, decay=decay, decay_rate=decay_rate, scale=scale)
+    lattice.values = np.ndarray((size, size), dtype=dtype, buffer=blocks[name].buf)
+    if decay is not None:
+        lattice.last = np.ndarray((size, size), dtype=np.int32, buffer=blocks[name + '_last'].buf)
+    return lattice
+
+
+class StripColony(Colony):
+    """The ants of one strip of a DomainBoard, updated by the strip's worker process
+    Ants sense the cells in front of them with Lattice.peek, which writes nothing, so
+    strips can read the cells along their neighbours' edges (the halo) straight from shared
+    memory while the neighbours do the same. Taking food does write, to cells up to one
+    cell outside the strip, so even strips gather first and odd strips second, each
+    seeing the food the other left.
+    Attributes:
+    worker : int
+        the index of the strip
+    barrier : multiprocessing Barrier
+        the barrier every worker waits at between the phases of a step
+    (and every attribute of Colony)
+    """
+    def __init__(self, worker, barrier):
+        super().__init__()
+        self.worker = worker
+        self.barrier = barrier
+
+    def find_nearby_values(self, lattice):
+        directions = (self.direction[:, None] + AHEAD) % 8
+        xs = self.x[:, None] + MOVES[directions, 0]
+        ys = self.y[:, None] + MOVES[directions, 1]
+        return lattice.peek(xs, ys), xs, ys
+
+    def take_food(self, board, gathering, nearby_food, food_xs, food_ys):
+        for colour in (0, 1):
+            self.barrier.wait()
+            if self.worker % 2 == colour:
+                #Ants in the neighbouring strips may have taken some of the food these ants saw
+                nearby_food = board.food.peek(food_xs, food_ys)
+                gathering = gathering & nearby_food.any(axis=1)
+                taken = super().take_food(board, gathering, nearby_food, food_xs, food_ys)
+        self.barrier.wait()
+        return taken
+
+    def update(self, board):
+        #Every strip has deposited before any strip senses
+        self.barrier.wait()
+        return super().update(board)
+
+
+class StripBoard(Board):
+    """The part of a DomainBoard one worker process simulates: the ants in one strip of
+    the board, on lattices shared with every other worker
+    Attributes:
+    worker : int
+        the index of the strip
+    lower, upper : int
+        the strip holds the cells with lower <= x < upper
+    inboxes : dict of multiprocessing Queues
+        the queue migrating ants are sent on, keyed by (sending strip, receiving strip)
+    (and every attribute of Board)
+    """
+    def __init__(self, worker, bounds, blocks, barrier, inboxes, seed, **options):
+        #Tiled storage allocates nothing, as the lattices are replaced by the shared ones
+        super().__init__(engine="arrays", storage="tiled", seed=seed, **options)
+        self.worker = worker
+        self.lower, self.upper = int(bounds[worker]), int(bounds[worker + 1])
+        self.strips = len(bounds) - 1
+        self.neighbours = [neighbour for neighbour in (worker - 1, worker + 1) if 0 <= neighbour < len(bounds) - 1]
+        self.inboxes = inboxes
+        dtype, scale = PRECISIONS[self.precision]
+        self.pheromones = shared_lattice(blocks, 'pheromones', self.size, dtype, self.evaporation, self.evaporation_rate, scale)
+        self.food = shared_lattice(blocks, 'food', self.size, np.int32)
+        self.ants = StripColony(worker, barrier)
+
+    def release_ant(self):
+        """
+        Releases an ant from every nest in the strip. Each worker numbers its ants
+        apart from the others, so ant ids stay unique across the board.
+        """
+        for nest, location in enumerate(self.nests):
+            if self.lower <= location[0] < self.upper:
+                self.ants.add(location, self.rng.integers(1, 8), nest, self.released * self.strips + self.worker)
+                self.released += 1
+
+    def clean(self):
+        """
+        Deletes ants which have wandered off board and hands ants which have crossed
+        into a neighbouring strip over to its worker
+        """
+        ants = self.ants
+        on_board = ants.in_grid(self.size)
+        for neighbour in self.neighbours:
+            lower, upper = (self.lower - 1, self.lower) if neighbour < self.worker else (self.upper, self.upper + 1)
+            leaving = on_board & (ants.x >= lower) & (ants.x < upper)
+            self.inboxes[(self.worker, neighbour)].put({field : getattr(ants, field)[leaving] for field in ants.fields})
+        ants.remove(~on_board | (ants.x < self.lower) | (ants.x >= self.upper))
+        #Every neighbour sends exactly one batch per step, possibly empty, on a queue of its
+        #own, so the batches are appended in the same order however they arrive
+        for neighbour in self.neighbours:
+            ants.append(**self.inboxes[(neighbour, self.worker)].get())
+
+
+def work(worker, bounds, block_names, options, seed, barrier, inboxes, commands, results):
+    """
+    The loop of a worker process: runs its strip for as many steps as each command asks
+        Parameters:
+            worker (int) : the index of the strip
+            bounds (np array of ints) : the strip boundaries (see strip_bounds)
+            block_names (dict) : the names of the shared memory blocks, keyed by lattice
+            options (dict) : keyword arguments for Board
+            seed (numpy SeedSequence) : the seed of the strip's random number generator
+            barrier (multiprocessing Barrier) : shared by every worker
+            inboxes (dict of multiprocessing Queues) : one per pair of neighbouring workers, for migrating ants
+            commands (multiprocessing Queue) : the numbers of steps to run, dicts of ants to add to
+                the strip (see DomainBoard.add_ants) or None to stop
+            results (multiprocessing Queue) : receives (worker, counts, ants) after every command
+    """
+    blocks = {name : shared_memory.SharedMemory(name=block_name) for name, block_name in block_names.items()}
+    try:
+        board = StripBoard(worker, bounds, blocks, barrier, inboxes, seed, **options)
+        while True:
+            steps = commands.get()
+            if steps is None:
+                break
+            if isinstance(steps, dict):
+                board.ants.append(**steps)
+                steps = 0
+            counts = np.array([board.step() for _ in range(steps)], dtype=np.int64).reshape(-1, 4)
+            ants = {field : getattr(board.ants, field) for field in board.ants.fields}
+            results.put((worker, counts, ants))
+    except BrokenBarrierError:
+        results.put((worker, RuntimeError(f"worker {worker} stopped because another worker failed"), None))
+    except Exception as error:
+        #Releases the other workers, which would otherwise wait at the barrier forever
+        barrier.abort()
+        results.put((worker, error, None))
+    finally:
+        #Views of the blocks must be gone before they can be closed
+        board = None
+        for block in blocks.values():
+            block.close()
+
+
+class DomainBoard():
+    """A single board simulated by several worker processes, one per strip of the board
+    The board is split along x into strips, and each worker process steps the ants in its
+    strip on pheromone and food lattices held in shared memory. Ants sense the cells next
+    to them straight from the neighbouring strips (see StripColony), and ants that step
+    out of their strip are handed over to the neighbouring worker at the end of every step.
+    Every step, each worker waits at four barriers (before its ants sense, before each of
+    the two gathering passes and after them) and passes one batch of migrating ants to each
+    neighbour through a queue. A barrier wait costs a few microseconds once every worker has
+    arrived, and a handoff from tens of microseconds up to a few hundred for thousands of
+    ants, so synchronising should cost well under a millisecond per step. That is small next
+    to a step of a large board (about 0.1 s on one core for 100000 ants), but a step still
+    takes as long as the busiest strip, so the throughput should grow with the number of
+    workers only when the ants are spread evenly, for example over several nests.
+    benchmark.py --preset scaling times 1, 2 and 4 workers; so far it has only been run
+    on a single core, where the workers share the core and cannot be faster.
+
+    It runs the "arrays" engine with dense lattices. Every strip draws from its own random
+    number generator, spawned from the board's seed, so a run is reproducible for a
+    given seed and number of workers, and follows the same rules as Board, but does not
+    repeat a single-process run step by step.
+
+    Call close() (or use the board in a with statement) to stop the workers and free the
+    shared memory.
+    Attributes:
+    size : int
+        the width and height of the board
+    workers : int
+        the number of worker processes
+    bounds : np array of ints
+        strip i holds the cells with bounds[i] <= x < bounds[i + 1]
+    options : dict
+        the keyword arguments every worker creates its Board with
+    pheromones, food : Lattice
+        the shared lattices; only read or write them between steps
+    ants : Colony
+        every ant on the board, as of the last time the workers stopped
+    time : int
+        the number of time steps simulated so far
+    """
+    def __init__(
+        self,
+        size = 4096,
+        workers = None,
+        deposition_rate=8,
+        min_phi = 247,
+        delta_phi = 0,
+        sauturation_concentration=100,
+        turning_kernel = [.36, .047, .008, .004],
+        seed = None,
+        evaporation = None,
+        evaporation_rate = 1,
+        deposition = "sequential",
+        legacy_turning = False,
+        nests = None,
+        precision = "float64",
+        ):
+        if precision not in PRECISIONS:
+            raise ValueError(f"unknown precision {precision!r}, expected one of {list(PRECISIONS)}")
+        self.size = size
+        self.workers = os.cpu_count() if workers is None else workers
+        self.bounds = strip_bounds(size, self.workers)
+        self.options = {
+            'size' : size,
+            'deposition_rate' : deposition_rate,
+            'min_phi' : min_phi,
+            'delta_phi' : delta_phi,
+            'sauturation_concentration' : sauturation_concentration,
+            'turning_kernel' : list(turning_kernel),
+            'evaporation' : evaporation,
+            'evaporation_rate' : evaporation_rate,
+            'deposition' : deposition,
+            'legacy_turning' : legacy_turning,
+            'nests' : nests,
+            'precision' : precision,
+        }
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+
+        cells = size * size
+        dtype, scale = PRECISIONS[precision]
+        sizes = {'pheromones' : cells * np.dtype(dtype).itemsize, 'food' : cells * 4}
+        if evaporation is not None:
+            sizes['pheromones_last'] = cells * 4
+        #Fresh shared memory is zero filled
+        self.blocks = {name : shared_memory.SharedMemory(create=True, size=block_size) for name, block_size in sizes.items()}
+        self.pheromones = shared_lattice(self.blocks, 'pheromones', size, dtype, evaporation, evaporation_rate, scale)
+        self.food = shared_lattice(self.blocks, 'food', size, np.int32)
+        self.ants = Colony()
+        self.time = 0
+
+        context = multiprocessing.get_context("spawn")
+        #Kept on the board, as they must outlive the start of every worker
+        self.barrier = context.Barrier(self.workers)
+        self.inboxes = {
+            (sender, receiver) : context.Queue()
+            for sender in range(self.workers) for receiver in (sender - 1, sender + 1) if 0 <= receiver < self.workers
+        }
+        self.commands = [context.Queue() for _ in range(self.workers)]
+        self.results = context.Queue()
+        block_names = {name : block.name for name, block in self.blocks.items()}
+        self.processes = [
+            context.Process(
+                target=work,
+                args=(worker, self.bounds, block_names, self.options, child, self.barrier, self.inboxes, self.commands[worker], self.results),
+                daemon=True,
+            )
+            for worker, child in enumerate(seed.spawn(self.workers))
+        ]
+        for process in self.processes:
+            process.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def add_food(self, food_locations):
+        """
+        Adds food to the board
+            Parameters:
+                food (dict) :
+                    keys -> locations in (x,y) form
+                    vals -> amount of food to add
+        """
+        for (x, y), amount in food_locations.items():
+            self.food.set(x, y, amount)
+
+    def advance(self, steps):
+        """
+        Simulates a number of time steps on every strip
+            Returns
+                counts (np array of ints) : a (steps x 4) array of how many ants were
+                    explorers, followers, gatherers and returners at every step
+        """
+        for commands in self.commands:
+            commands.put(steps)
+        counts = self.collect(steps)
+        self.time += steps
+        self.pheromones.clock += steps
+        return counts
+
+    def add_ants(self, **values):
+        """
+        Places ants on the board, each in the strip that holds it (see Colony.append)
+            Parameters:
+                values : one int or np array of ints per field of Colony, all arrays having the
+                    same length. Ant ids are taken as given, so they should not clash with the
+                    ids of released ants
+        """
+        x = np.asarray(values['x'])
+        strip = np.searchsorted(self.bounds, x, side='right') - 1
+        fields = {field : np.broadcast_to(values[field], x.shape) for field in Colony.fields}
+        for worker, commands in enumerate(self.commands):
+            commands.put({field : value[strip == worker] for field, value in fields.items()})
+        self.collect(0)
+
+    def collect(self, steps):
+        """
+        Waits for every worker to finish a command, and gathers their counts and ants
+            Returns
+                counts (np array of ints) : a (steps x 4) array of the ants in each mode at every step
+        """
+        counts = np.zeros((steps, 4), dtype=np.int64)
+        strips = [None] * self.workers
+        errors = []
+        for _ in range(self.workers):
+            worker, strip_counts, ants = self.receive()
+            if isinstance(strip_counts, Exception):
+                errors.append(strip_counts)
+                continue
+            counts += strip_counts
+            strips[worker] = ants
+        if errors:
+            self.close()
+            raise RuntimeError("a worker failed while stepping the board") from errors[0]
+        self.ants = Colony()
+        for ants in strips:
+            self.ants.append(**ants)
+        return counts
+
+    def receive(self):
+        """
+        Returns the next result a worker sent, raising an error if a worker died instead
+        """
+        while True:
+            try:
+                return self.results.get(timeout=1)
+            except queue.Empty:
+                if any(process.exitcode is not None for process in self.processes):
+                    self.close()
+                    raise RuntimeError("a worker process exited unexpectedly")
+
+    def step(self):
+        """
+        Simulates a single timestep (second)
+            Returns
+                explorers, followers, gatherers, returners (ints) : how many ants were in each mode
+        """
+        return tuple(self.advance(1)[0])
+
+    def run(self, minutes, food_locations, path='data.csv', verbose=True, recorder=None):
+        """
+        Runs the model for a specified number of minutes (see Board.run). The workers
+        run recorder.interval steps at a time between samples.
+            Returns
+                remaining (np array) : the food remaining at each location at each sample
+        """
+        if recorder is None:
+            recorder = Recorder(food_locations)
+        if self.time == 0:
+            self.add_food(food_locations)
+        recorder.start(self)
+        while self.time < minutes * 60:
+            steps = min(recorder.interval - self.time % recorder.interval, minutes * 60 - self.time)
+            for counts in self.advance(steps):
+                recorder.observe(self, counts)
+            if verbose and self.time % 60 == 0:
+                print(self.time // 60 - 1)
+        recorder.close()
+        if path is not None:
+            recorder.to_csv(path)
+        return np.array(recorder.samples()['food'])
+
+    def close(self):
+        """
+        Stops the workers and frees the shared memory
+        """
+        if self.blocks is None:
+            return
+        for process, commands in zip(self.processes, self.commands):
+            if process.is_alive():
+                commands.put(None)
+        for process in self.processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self.pheromones = self.food = None
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks = None
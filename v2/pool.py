@@ -0,0 +1,84 @@
+class AntPool():
+    """A preallocated, compact collection of Ant objects
+    The living ants occupy the first len(pool) slots of a list that grows by doubling, so
+    adding an ant is amortized O(1). Each ant remembers its slot, and removing an ant moves
+    the last living ant into its slot (swap-remove), which is O(1) and keeps the living
+    ants contiguous. Removed ants are released, so memory follows the living population
+    rather than the number of ants ever released. The order of the ants changes when ants
+    are removed.
+
+    Iterating over a pool visits the ants that were alive when the iteration started, so
+    ants can be removed while iterating (as v1's Model.update_ants does).
+    Attributes:
+    slots : lst
+        the ants, followed by empty slots
+    cap : int or None
+        the largest number of ants the pool holds, None for no limit
+    """
+    def __init__(self, capacity=64, cap=None):
+        """
+            Parameters:
+                capacity (int) : the number of slots to preallocate
+                cap (int or None) : the largest number of ants the pool holds, None for no limit
+        """
+        self.slots = [None] * capacity
+        self.count = 0
+        self.cap = cap
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.slots[:self.count])
+
+    def __getitem__(self, i):
+        return self.slots[range(self.count)[i]]
+
+    def __contains__(self, ant):
+        slot = getattr(ant, 'slot', None)
+        return slot is not None and slot < self.count and self.slots[slot] is ant
+
+    def full(self):
+        """
+        Returns True if the pool holds cap ants
+        """
+        return self.cap is not None and self.count >= self.cap
+
+    def add(self, ant):
+        """
+        Adds an ant, unless the pool is full
+            Returns
+                added (bool) : whether the ant was added
+        """
+        if self.full():
+            return False
+        if self.count == len(self.slots):
+            self.slots.extend([None] * max(len(self.slots), 1))
+        ant.slot = self.count
+        self.slots[self.count] = ant
+        self.count += 1
+        return True
+
+    append = add
+
+    def remove(self, ant):
+        """
+        Removes an ant by moving the last ant into its slot
+        """
+        if ant not in self:
+            raise ValueError("the ant is not in the pool")
+        self.count -= 1
+        last = self.slots[self.count]
+        self.slots[ant.slot] = last
+        last.slot = ant.slot
+        self.slots[self.count] = None
+        ant.slot = None
+
+    def remove_where(self, condition):
+        """
+        Removes every ant for which condition(ant) is true, in one pass
+        """
+        for slot in range(self.count - 1, -1, -1):
+            ant = self.slots[slot]
+            if condition(ant):
+                self.remove(ant)
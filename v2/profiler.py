@@ -0,0 +1,109 @@
+import time
+
+import numpy as np
+
+#The counters a Profiler keeps for every step
+COUNTERS = ('explorers', 'followers', 'gatherers', 'returners', 'ants', 'active_cells', 'food_collected')
+
+
+class Profiler():
+    """Opt-in instrumentation of Board.step
+    Attach a profiler by setting board.profiler. Board.step then hands each step to
+    profile_step(), which times every phase of the step and counts the ants in each mode,
+    the ants on the board, the pheromone cells that are not empty and the food collected.
+    Without a profiler Board.step only pays for one attribute check.
+
+    Every callback is called after each step as callback(board, sample), where sample is
+    a dict with the seconds spent in each phase and every counter of that step.
+    Attributes:
+    phases : tuple of str
+        the Board methods timed, in the order a step calls them
+    callbacks : lst of callables
+        called after every step
+    active_cells : bool
+        whether to count the non-empty pheromone cells, which scans the whole lattice every step
+    steps : int
+        the number of steps profiled
+    seconds : dict
+        the total seconds spent in each phase
+    totals : dict
+        the total of each counter
+    """
+    def __init__(self, callbacks=(), active_cells=True):
+        self.callbacks = list(callbacks)
+        self.active_cells = active_cells
+        self.phases = ()
+        self.reset()
+
+    def reset(self):
+        """
+        Clears the timings and counters
+        """
+        self.steps = 0
+        self.seconds = {phase : 0.0 for phase in self.phases}
+        self.totals = {counter : 0 for counter in COUNTERS}
+        self.sources = None
+
+    def subscribe(self, callback):
+        """
+        Calls callback(board, sample) after every step from now on
+        """
+        self.callbacks.append(callback)
+
+    def start(self, board):
+        """
+        Starts profiling a board, finding where its food is so the food collected can be
+        counted from those cells alone
+        """
+        self.phases = board.phases
+        self.reset()
+        self.sources = board.food.nonzero()
+        self.food = int(board.food.gather(*self.sources).sum())
+
+    def profile_step(self, board):
+        """
+        Simulates and measures a single step of a board (see Board.step)
+            Returns
+                explorers, followers, gatherers, returners : how many ants were in each mode
+        """
+        if self.sources is None:
+            self.start(board)
+        sample = {}
+        counts = None
+        for phase in self.phases:
+            start = time.perf_counter()
+            result = getattr(board, phase)()
+            sample[phase] = time.perf_counter() - start
+            if phase == 'update_ants':
+                counts = result
+        board.time += 1
+
+        food = int(board.food.gather(*self.sources).sum())
+        sample.update(zip(('explorers', 'followers', 'gatherers', 'returners'), (int(np.sum(count)) for count in counts)))
+        sample['ants'] = len(board.ants)
+        sample['active_cells'] = board.pheromones.count_nonzero() if self.active_cells else 0
+        sample['food_collected'] = self.food - food
+        self.food = food
+
+        self.steps += 1
+        for phase in self.phases:
+            self.seconds[phase] += sample[phase]
+        for counter in COUNTERS:
+            self.totals[counter] += sample[counter]
+        for callback in self.callbacks:
+            callback(board, sample)
+        return counts
+
+    def report(self):
+        """
+        Returns a summary of the time spent in each phase and of each counter
+        """
+        steps = max(self.steps, 1)
+        total = sum(self.seconds.values())
+        lines = [f"{self.steps} steps in {total:.3f} s ({self.steps / total if total else 0:.1f} steps/s)"]
+        for phase, seconds in self.seconds.items():
+            share = seconds / total if total else 0
+            lines.append(f"  {phase:<12} {seconds:9.3f} s {1e6 * seconds / steps:10.1f} us/step {share:6.1%}")
+        for counter, value in self.totals.items():
+            lines.append(f"  {counter:<14} {value / steps:10.1f} per step {value:12d} in total")
+        return "\n".join(lines)
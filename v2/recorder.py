@@ -0,0 +1,216 @@
+import csv
+import json
+
+import numpy as np
+
+#The ant mode counts returned by Board.update_ants, in order
+MODES = ('explorers', 'followers', 'gatherers', 'returners')
+
+
+def record_dtype(n_locations):
+    """
+    Returns the structured dtype of one sample
+        Parameters:
+            n_locations (int) : the number of food locations recorded
+    """
+    return np.dtype(
+        [('step', np.int64), ('food', np.int64, (n_locations,)), ('visits', np.int64, (n_locations,))]
+        + [(mode, np.int64) for mode in MODES]
+        + [('ants', np.int64)]
+    )
+
+
+def load(path):
+    """
+    Memory-maps a recording written by a Recorder
+        Parameters:
+            path (str) : the recording (its header is path + '.json')
+        Returns
+            samples (np memmap) : one record per sample (see Recorder)
+            header (dict) : the food locations and sampling interval of the recording
+    """
+    with open(path + '.json') as file:
+        header = json.load(file)
+    header['locations'] = [tuple(location) for location in header['locations']]
+    dtype = record_dtype(len(header['locations']))
+    if header['samples'] == 0:
+        return np.zeros(0, dtype=dtype), header
+    return np.memmap(path, dtype=dtype, mode='r', shape=(header['samples'],)), header
+
+
+class Recorder():
+    """A buffered, columnar time series of a Board run
+    Every interval steps the recorder takes a sample of
+        step : the number of steps simulated so far
+        food : the food remaining at each location
+        visits : the food taken from each location since the previous sample
+        explorers, followers, gatherers, returners : the number of ant-steps spent in each mode
+            since the previous sample
+        ants : the number of ants on the board
+    Samples are written into a preallocated structured array. When it is full it is flushed
+    in one write to an append-only binary file of fixed-size records (see load), so memory
+    stays constant however long the run is. Without a path, flushed samples are kept in memory.
+    Attributes:
+    locations : lst of (x, y)
+        the food locations recorded
+    interval : int
+        the number of steps between samples
+    path : str or None
+        the binary file samples are flushed to
+    buffer : np structured array
+        the samples not yet flushed
+    initial : np array
+        the food at each location when the run started
+    """
+    def __init__(self, food_locations, path=None, interval=60, capacity=1024):
+        """
+            Parameters:
+                food_locations (dict or lst) : the food locations to record
+                path (str or None) : the binary file to flush samples to, None to keep them in memory
+                interval (int) : the number of steps between samples
+                capacity (int) : the number of samples buffered between flushes
+        """
+        self.locations = list(food_locations)
+        self.path = path
+        self.interval = interval
+        self.buffer = np.zeros(capacity, dtype=record_dtype(len(self.locations)))
+        self.buffered = 0
+        self.flushed = 0
+        self.chunks = []
+        self.location_xs, self.location_ys = np.array(self.locations, dtype=np.int64).reshape(-1, 2).T
+
+    def start(self, board):
+        """
+        Starts a recording of a board, truncating the file at path
+        """
+        self.steps = 0
+        self.mode_steps = [0] * len(MODES)
+        self.last_food = board.food.gather(self.location_xs, self.location_ys)
+        self.initial = self.last_food.copy()
+        if self.path is not None:
+            open(self.path, 'wb').close()
+            self.write_header()
+
+    def observe(self, board, counts):
+        """
+        Called after every step of the board, with the mode counts it returned
+        """
+        self.steps += 1
+        self.mode_steps = [total + count for total, count in zip(self.mode_steps, counts)]
+        if self.steps % self.interval == 0:
+            self.sample(board)
+
+    def sample(self, board):
+        """
+        Records a sample of the board now
+        """
+        if self.buffered == len(self.buffer):
+            self.flush()
+        food = board.food.gather(self.location_xs, self.location_ys)
+        record = self.buffer[self.buffered]
+        record['step'] = self.steps
+        record['food'] = food
+        record['visits'] = self.last_food - food
+        for mode, total in zip(MODES, self.mode_steps):
+            record[mode] = total
+        record['ants'] = len(board.ants)
+        self.buffered += 1
+        self.last_food = food
+        self.mode_steps = [0] * len(MODES)
+
+    def flush(self):
+        """
+        Writes the buffered samples out in bulk
+        """
+        samples = self.buffer[:self.buffered]
+        if self.path is None:
+            self.chunks.append(samples.copy())
+        else:
+            with open(self.path, 'ab') as file:
+                file.write(samples.tobytes())
+        self.flushed += self.buffered
+        self.buffered = 0
+        if self.path is not None:
+            self.write_header()
+
+    def write_header(self):
+        header = {'locations' : self.locations, 'interval' : self.interval, 'samples' : self.flushed}
+        with open(self.path + '.json', 'w') as file:
+            json.dump(header, file)
+
+    def state(self):
+        """
+        Returns the progress of the recording between samples, for checkpoints
+        """
+        return {
+            'steps' : self.steps,
+            'mode_steps' : list(self.mode_steps),
+            'last_food' : self.last_food.tolist(),
+            'initial' : self.initial.tolist(),
+        }
+
+    def restore(self, samples, state):
+        """
+        Continues a recording from a checkpoint, after start()
+            Parameters:
+                samples (np structured array) : the samples taken before the checkpoint
+                state (dict) : the recorder's state() at the checkpoint
+        """
+        if self.path is None:
+            self.chunks = [np.array(samples, dtype=self.buffer.dtype)]
+        else:
+            with open(self.path, 'wb') as file:
+                file.write(np.asarray(samples, dtype=self.buffer.dtype).tobytes())
+        self.flushed = len(samples)
+        if self.path is not None:
+            self.write_header()
+        self.steps = state['steps']
+        self.mode_steps = list(state['mode_steps'])
+        self.last_food = np.array(state['last_food'], dtype=self.last_food.dtype)
+        self.initial = np.array(state['initial'], dtype=self.last_food.dtype)
+
+    def close(self):
+        """
+        Flushes the remaining samples
+        """
+        self.flush()
+
+    def samples(self):
+        """
+        Returns every sample taken so far, memory-mapped from the file if there is one
+        """
+        self.flush()
+        if self.path is not None:
+            return load(self.path)[0]
+        if not self.chunks:
+            return self.buffer[:0].copy()
+        return np.concatenate(self.chunks)
+
+    def to_csv(self, path, fields=('step', 'food')):
+        """
+        Exports samples to a csv file, after a first row for step 0 that holds the food the
+        sources started with (and nothing else), so the visits of the first sample can be
+        counted from the file. Location fields get one column per location, named by the
+        location alone for food (the layout data_processing.py reads) and prefixed by the
+        field name otherwise.
+            Parameters:
+                path (str) : the csv file to write
+                fields (lst of str) : the fields to export
+        """
+        start = np.zeros(1, dtype=self.buffer.dtype)
+        start['food'] = self.initial
+        samples = np.concatenate([start, self.samples()])
+        header = []
+        columns = []
+        for field in fields:
+            if samples.dtype[field].shape:
+                prefix = '' if field == 'food' else field + ' '
+                header += [f"{prefix}{location}" for location in self.locations]
+                columns.append(samples[field])
+            else:
+                header.append(field)
+                columns.append(samples[field][:, None])
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(header)
+            writer.writerows(np.concatenate(columns, axis=1).tolist() if columns else [])
@@ -0,0 +1,212 @@
+import numpy as np
+from .colony import Colony, TurningKernel, deposit_pheromones
+from .lattice import Lattice, PRECISIONS
+from .navigation import navigation_field
+
+
+class ReplicaColony(Colony):
+    """The ants of many independent boards, kept in one set of arrays
+    Attributes:
+    replicas : int
+        the number of boards
+    replica : np array of ints
+        the board each ant lives on
+    (and every attribute of Colony)
+    """
+    fields = Colony.fields + ('replica',)
+
+    def __init__(self, replicas):
+        super().__init__()
+        self.replicas = replicas
+
+    def add(self, nest_location, direction, ant_id=0):
+        """
+        Adds one ant standing on the nest of every replica
+            Parameters:
+                nest_location (int) : the x and y position of the nest (assumed to be the same)
+                direction (np array of ints) : the compass direction each new ant is facing
+                ant_id (int) : the number of the new ants, the same in every replica
+        """
+        self.append(
+            x = nest_location,
+            y = nest_location,
+            direction = direction,
+            food_seen = 0,
+            nest_x = nest_location,
+            nest_y = nest_location,
+            nest = 0,
+            id = ant_id,
+            replica = np.arange(self.replicas),
+        )
+
+    def per_ant(self, parameter):
+        """
+        Returns a per-replica board parameter as seen by each ant
+        """
+        return np.asarray(parameter)[self.replica]
+
+    def count(self, mask):
+        """
+        Returns how many ants a mask selects in each replica
+        """
+        return np.bincount(self.replica[mask], minlength=self.replicas)
+
+
+class ReplicaBoard():
+    """Many independent boards of the same size, stepped together
+    The pheromone and food lattices of every replica are stacked along a leading axis and
+    all ants are kept in one ReplicaColony, so one step() advances every replica with the
+    same handful of array operations a single "arrays" Board uses. This amortizes the
+    interpreter overhead that dominates Board.step on small boards.
+
+    Each of deposition_rate, min_phi, delta_phi, sauturation_concentration and
+    turning_kernel can be a single value or one value per replica. The replicas draw from one shared random
+    number generator, seeded like Board's, so they are independent runs of the model
+    but a replica's trajectory depends on the seed of the whole batch, not on a seed
+    of its own. Pheromones are stored with the given precision, as in Board.
+    Attributes:
+    replicas : int
+        the number of boards
+    size : int
+        the width and height of each square lattice
+    tau, min_phi, delta_phi, sauturation_concentration : np arrays
+        the parameters of each replica (see Board)
+    turning : TurningKernel
+        the turning kernel of every replica compiled into a sampling table
+    navigation : NavigationField
+        the headings towards the nest shared by every replica
+    pheromones : Lattice
+        a (replicas, size, size) lattice of pheromone values
+    food : Lattice
+        a (replicas, size, size) lattice of food values
+    ants : ReplicaColony
+        all ants on every board
+    """
+    def __init__(
+        self,
+        replicas,
+        size = 128,
+        deposition_rate=8,
+        min_phi = 247,
+        delta_phi = 0,
+        sauturation_concentration=100,
+        turning_kernel = [.36, .047, .008, .004],
+        seed = None,
+        evaporation = None,
+        evaporation_rate = 1,
+        deposition = "sequential",
+        legacy_turning = False,
+        precision = "float64",
+        ):
+        if precision not in PRECISIONS:
+            raise ValueError(f"unknown precision {precision!r}, expected one of {list(PRECISIONS)}")
+
+        self.replicas = replicas
+        self.size = size
+        self.tau = self.per_replica(deposition_rate)
+        self.min_phi = self.per_replica(min_phi)
+        self.delta_phi = self.per_replica(delta_phi)
+        self.sauturation_concentration = self.per_replica(sauturation_concentration)
+        self.turning = TurningKernel(np.broadcast_to(turning_kernel, (replicas, np.shape(turning_kernel)[-1])), legacy=legacy_turning)
+        self.deposition = deposition
+        self.rng = np.random.default_rng(seed)
+
+        dtype, scale = PRECISIONS[precision]
+        self.pheromones = Lattice((replicas, size, size), dtype=dtype, decay=evaporation, decay_rate=evaporation_rate, scale=scale)
+        self.food = Lattice((replicas, size, size), dtype=np.int32)
+        self.ants = ReplicaColony(replicas)
+        self.released = 0
+        self.navigation = navigation_field(size, [(size // 2, size // 2)])
+
+    def per_replica(self, value):
+        """
+        Returns a parameter as an array with one value per replica
+        """
+        return np.array(np.broadcast_to(value, (self.replicas,)), dtype=np.float64)
+
+    def release_ant(self):
+        """
+        Releases an ant from the nest of every replica
+        """
+        self.ants.add(self.size // 2, self.rng.integers(1, 8, size=self.replicas), self.released)
+        self.released += 1
+
+    def deposit(self):
+        """
+        Adds pheramones to the cells where ants are present (see Board.deposit)
+        """
+        ants = self.ants
+        deposit_pheromones(
+            self.pheromones, ants.x, ants.y, ants.food_seen,
+            ants.per_ant(self.tau), ants.per_ant(self.sauturation_concentration),
+            self.deposition, replica=ants.replica,
+        )
+
+    def evaporate(self):
+        """
+        Evaporates pheromones on every replica (lazily, see Lattice)
+        """
+        self.pheromones.tick()
+
+    def update_ants(self):
+        """
+        Updates ants directions and position
+            Returns
+                explorers, followers, gatherers, returners (np arrays) : the ants in each mode per replica
+        """
+        return self.ants.update(self)
+
+    def clean(self):
+        """
+        Deletes ants which have wandered off their board
+        """
+        self.ants.remove(~self.ants.in_grid(self.size))
+
+    def step(self):
+        """
+        Simulates a single timestep (second) on every replica
+        """
+        self.release_ant()
+        self.deposit()
+        self.evaporate()
+        counts = self.update_ants()
+        self.clean()
+        return counts
+
+    def add_food(self, food_locations):
+        """
+        Adds the same food to every replica
+            Parameters:
+                food (dict) :
+                    keys -> locations in (x,y) form
+                    vals -> amount of food to add
+        """
+        for (x, y), amount in food_locations.items():
+            self.food.values[:, x, y] = amount
+
+    def collect_food_data(self, food_locations):
+        """
+        Finds the food remaining at each location, like Board.collect_food_data for every replica
+            Returns
+                food_data (lst of dicts) : one {location : food} dict per replica
+        """
+        return [
+            {location : self.food.get(*location, replica=replica) for location in food_locations}
+            for replica in range(self.replicas)
+        ]
+
+    def run(self, minutes, food_locations):
+        """
+        Runs every replica for a specified number of minutes
+            Returns
+                remaining (np array) : the food remaining at each location after each minute,
+                    with shape (replicas, minutes, locations)
+        """
+        self.add_food(food_locations)
+        locations = np.array(list(food_locations.keys()))
+        remaining = np.zeros((self.replicas, minutes, len(locations)), dtype=np.int64)
+        for minute in range(minutes):
+            for seconds in range(60):
+                self.step()
+            remaining[:, minute] = self.food.values[:, locations[:, 0], locations[:, 1]]
+        return remaining
@@ -0,0 +1,259 @@
+import glob
+import hashlib
+import itertools
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from .ensemble import simulate_trial
+
+#The Board arguments a sweep may vary, besides the food layout
+SWEEP_PARAMETERS = ('min_phi', 'delta_phi', 'deposition_rate', 'sauturation_concentration', 'turning_kernel')
+
+
+def grid_design(**axes):
+    """
+    Returns every combination of the given parameter values
+        Parameters:
+            axes : a list of values per parameter, e.g. min_phi=[240, 247], food_locations=[layout_a, layout_b]
+        Returns
+            points (lst of dicts) : one {parameter : value} dict per combination
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+def random_design(samples, seed=None, **ranges):
+    """
+    Returns randomly drawn parameter combinations
+        Parameters:
+            samples (int) : the number of combinations
+            seed (int or None) : the seed used to draw them
+            ranges : per parameter either a (low, high) tuple, drawn uniformly (as ints if
+                both bounds are ints, including high), or a list of values to choose from
+        Returns
+            points (lst of dicts) : one {parameter : value} dict per combination
+    """
+    rng = np.random.default_rng(seed)
+    points = [{} for sample in range(samples)]
+    for name, values in ranges.items():
+        if isinstance(values, tuple):
+            low, high = values
+            if isinstance(low, int) and isinstance(high, int):
+                drawn = rng.integers(low, high + 1, size=samples).tolist()
+            else:
+                drawn = rng.uniform(low, high, size=samples).tolist()
+        else:
+            drawn = [values[i] for i in rng.integers(len(values), size=samples)]
+        for point, value in zip(points, drawn):
+            point[name] = value
+    return points
+
+
+def code_version():
+    """
+    Returns a hash of the model's source code, so cached results are not reused after it changes
+    """
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        with open(path, 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+
+def run_key(parameters, food_locations, seed, minutes, board_options, version, stop=None):
+    """
+    Returns the cache key of a single run
+        Parameters:
+            parameters (dict) : the swept Board arguments of the run
+            food_locations (dict) : the food layout of the run
+            seed (int) : the seed of the run
+            minutes (int) : how many minutes the run simulates
+            board_options (dict) : the Board arguments shared by the whole sweep
+            version (str) : the code version (see code_version)
+            stop (lst or None) : the convergence detectors of the run
+    """
+    description = {
+        'parameters' : parameters,
+        'food_locations' : sorted([x, y, amount] for (x, y), amount in food_locations.items()),
+        'seed' : seed,
+        'minutes' : minutes,
+        'board_options' : board_options,
+        'code_version' : version,
+    }
+    if stop:
+        description['stop'] = [repr(detector) for detector in stop]
+    encoded = json.dumps(description, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class ResultCache():
+    """Run outputs stored on disk, one .npy file per run
+    Files are written atomically, so an interrupted sweep never leaves a partial result
+    behind, and reading a result marks it as recently used. A .json file next to each
+    result keeps the food locations, the food each source started with and, for runs that
+    stopped early, why.
+    Attributes:
+    directory : str
+        the directory holding the results
+    max_bytes : int or None
+        the size above which the least recently used results are evicted, None for no limit
+    """
+    def __init__(self, directory, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def info_path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def get(self, key):
+        """
+        Returns a cached result, or None if it is not cached
+        """
+        try:
+            result = np.load(self.path(key))
+        except FileNotFoundError:
+            return None
+        os.utime(self.path(key))
+        return result
+
+    def stop_reason(self, key):
+        """
+        Returns why a cached run stopped early, or None if it ran every minute
+        """
+        try:
+            with open(self.info_path(key)) as file:
+                return json.load(file).get('stop_reason')
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, result, stop_reason=None, initial=None, locations=None):
+        """
+        Stores a result and evicts old results if the cache grew too large
+            Parameters:
+                key (str) : the run's key (see run_key)
+                result (np array) : the food remaining at each source after each minute
+                stop_reason (str or None) : why the run stopped early, None if it ran every minute
+                initial (lst of ints or None) : the food each source started with
+                locations (lst of (x, y) or None) : the location of each source
+        """
+        if stop_reason is not None or initial is not None or locations is not None:
+            temporary = self.info_path(key) + '.tmp'
+            with open(temporary, 'w') as file:
+                json.dump({'stop_reason' : stop_reason, 'initial' : initial, 'locations' : locations}, file)
+            os.replace(temporary, self.info_path(key))
+        temporary = self.path(key) + '.tmp'
+        with open(temporary, 'wb') as file:
+            np.save(file, result)
+        os.replace(temporary, self.path(key))
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes)
+
+    def evict(self, max_bytes):
+        """
+        Deletes the least recently used results until the cache is no larger than max_bytes
+        """
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.npy')):
+            status = os.stat(path)
+            entries.append((status.st_mtime, status.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            os.remove(path)
+            info_path = os.path.splitext(path)[0] + '.json'
+            if os.path.exists(info_path):
+                os.remove(info_path)
+            total -= size
+
+
+def run_sweep(
+    design,
+    minutes,
+    cache,
+    seeds = (0,),
+    food_locations = None,
+    board_options = None,
+    workers = None,
+    stop = None,
+    ):
+    """
+    Runs every point of a design for every seed, computing only the runs missing from the cache
+    Each run is stored in the cache as soon as it finishes, so an interrupted sweep resumes
+    where it stopped when it is run again.
+        Parameters:
+            design (lst of dicts) : the points to run (see grid_design and random_design). A point's
+                food_locations entry, if any, overrides the sweep's food_locations
+            minutes (int) : how many minutes each run simulates
+            cache (ResultCache) : where the outputs are stored
+            seeds (lst of ints) : the seeds to run every point with
+            food_locations (dict or None) : the food layout of points that do not set their own
+            board_options (dict or None) : Board arguments shared by the whole sweep (e.g. size, engine)
+            workers (int or None) : the number of worker processes, None for one per core
+            stop (lst or None) : convergence detectors that end a run early (see convergence.py)
+        Returns
+            results (lst of dicts) : per run, its point, seed, the food remaining after each
+                minute and why it stopped early (or None), in the order of design and seeds.
+                Runs that failed have no "remaining" entry, and their exception in "error"
+    """
+    board_options = board_options or {}
+    version = code_version()
+    results = []
+    missing = []
+    for point in design:
+        parameters = {name : value for name, value in point.items() if name != 'food_locations'}
+        unknown = set(parameters) - set(SWEEP_PARAMETERS)
+        if unknown:
+            raise ValueError(f"cannot sweep {sorted(unknown)}, expected some of {SWEEP_PARAMETERS}")
+        layout = point.get('food_locations', food_locations)
+        if layout is None:
+            raise ValueError(f"no food_locations for {point}: pass them to run_sweep or set them in the point")
+        for seed in seeds:
+            key = run_key(parameters, layout, seed, minutes, board_options, version, stop)
+            result = {'point' : point, 'seed' : seed, 'key' : key}
+            remaining = cache.get(key)
+            if remaining is None:
+                missing.append((result, parameters, layout))
+            else:
+                result['remaining'] = remaining
+                result['stop_reason'] = cache.stop_reason(key)
+            results.append(result)
+
+    if missing:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            futures = {
+                executor.submit(simulate_trial, result['seed'], minutes, layout, {**board_options, **parameters}, stop) : (result, layout)
+                for result, parameters, layout in missing
+            }
+            for future in as_completed(futures):
+                result, layout = futures[future]
+                try:
+                    result['remaining'], result['stop_reason'] = future.result()
+                except Exception as error:
+                    result['error'] = repr(error)
+                    warnings.warn(f"run {result['point']} with seed {result['seed']} failed: {error!r}", RuntimeWarning)
+                    continue
+                cache.put(
+                    result['key'], result['remaining'], result['stop_reason'],
+                    initial=[int(amount) for amount in layout.values()],
+                    locations=[[int(x), int(y)] for x, y in layout],
+                )
+    return results
+
+
+if __name__ == "__main__":
+    food_locations ={(192,128) : 100, (64,128) : 10}
+    design = grid_design(min_phi=[240, 244, 247, 250], deposition_rate=[4, 8])
+    results = run_sweep(design, 60, ResultCache('sweep_cache'), seeds=range(4), food_locations=food_locations, board_options={'engine' : "arrays"})
+    for result in results:
+        print(result['point'], result['seed'], result.get('remaining', [None])[-1])
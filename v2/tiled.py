@@ -0,0 +1,402 @@
+import numpy as np
+from .lattice import Lattice, DECAY_MODES
+
+#The width and height of the tiles of a TiledLattice
+TILE_SIZE = 64
+
+
+def square(shape):
+    """
+    Returns the (width, height) of a lattice that only supports a single grid
+    """
+    if isinstance(shape, (int, np.integer)):
+        return (int(shape), int(shape))
+    if len(shape) != 2:
+        raise ValueError(f"a sparse lattice must be two dimensional, not {shape}")
+    return tuple(int(length) for length in shape)
+
+
+class TiledLattice(Lattice):
+    """A lattice that only stores the square tiles of cells that have been written
+    The board is divided into tiles of tile_size x tile_size cells. A tile is allocated
+    (filled with zeros) the first time one of its cells is written, and cells of tiles that
+    were never written read as 0, so memory is proportional to the area ants have visited
+    rather than the size of the board. A table with one entry per tile maps each tile to
+    its slot in a stack of allocated tiles, so reading and writing many cells stays a
+    handful of array operations. Decay works as in Lattice, per allocated cell.
+
+    It supports the cell methods of Lattice for a single grid (no replicas). values builds
+    a dense copy of the whole lattice, so it should only be used on small boards.
+    Attributes:
+    tile_size : int
+        the width and height of a tile
+    tile_table : np array of ints
+        the slot of each tile, -1 for tiles that are not allocated
+    tiles : np array
+        the values of the allocated tiles, with shape (slots, tile_size, tile_size)
+    lasts : np array of ints or None
+        the clock value at which each cell of the allocated tiles was last brought up to date
+    origins : np array of ints
+        the (tile x, tile y) of each slot
+    allocated : int
+        the number of allocated tiles
+    """
+    dense = False
+
+    def __init__(self, shape, dtype=np.float64, decay=None, decay_rate=1, scale=None, tile_size=TILE_SIZE):
+        """
+            Parameters:
+                shape (int or tuple of ints) : the width and height of the lattice (an int for a square)
+                dtype (np dtype) : the type of the cell values
+                decay (str or None) : "linear", "exponential" or None for no decay
+                decay_rate (float) : how fast the values decay
+                scale (int or None) : the number of fixed-point steps per unit, for integer dtypes
+                tile_size (int) : the width and height of a tile
+        """
+        if decay not in DECAY_MODES:
+            raise ValueError(f"unknown decay {decay!r}, expected one of {DECAY_MODES}")
+        self.size = square(shape)
+        self.cell_dtype = np.dtype(dtype)
+        self.scale = scale
+        self.decay = decay
+        self.decay_rate = decay_rate
+        self.clock = 0
+        self.last = None
+        self.generation = 0
+        self.tile_generation = None
+        self.tracking_id = None
+        self.tile_size = tile_size
+        self.tile_table = np.full([-(-length // tile_size) for length in self.size], -1, dtype=np.int64)
+        self.tiles = np.zeros((0, tile_size, tile_size), dtype=self.cell_dtype)
+        self.lasts = np.zeros((0, tile_size, tile_size), dtype=np.int32) if decay else None
+        self.origins = np.zeros((0, 2), dtype=np.int64)
+        self.allocated = 0
+
+    @property
+    def shape(self):
+        return self.size
+
+    @property
+    def dtype(self):
+        return self.cell_dtype
+
+    @property
+    def values(self):
+        return self.dense_values()
+
+    def allocate(self, tile_x, tile_y):
+        """
+        Allocates the tiles that are not allocated yet among some tiles
+        """
+        missing = self.tile_table[tile_x, tile_y] < 0
+        if not missing.any():
+            return
+        new = np.unique(np.stack([tile_x[missing], tile_y[missing]], axis=1), axis=0)
+        needed = self.allocated + len(new)
+        if needed > len(self.tiles):
+            #Capacity grows by doubling, so allocating a tile is amortized O(1)
+            capacity = max(needed, 2 * len(self.tiles), 1)
+            extra = capacity - len(self.tiles)
+            self.tiles = np.concatenate([self.tiles, np.zeros((extra,) + self.tiles.shape[1:], dtype=self.tiles.dtype)])
+            self.origins = np.concatenate([self.origins, np.zeros((extra, 2), dtype=np.int64)])
+            if self.lasts is not None:
+                self.lasts = np.concatenate([self.lasts, np.zeros((extra,) + self.lasts.shape[1:], dtype=self.lasts.dtype)])
+        slots = np.arange(self.allocated, needed)
+        self.tile_table[new[:, 0], new[:, 1]] = slots
+        self.origins[slots] = new
+        if self.lasts is not None:
+            self.lasts[slots] = self.clock
+        self.allocated = needed
+
+    def locate(self, x, y, allocate=False):
+        """
+        Returns where cells are stored
+            Parameters:
+                x, y (np arrays of ints) : positions in the lattice
+                allocate (bool) : whether to allocate the tiles that hold them
+            Returns
+                slot (np array of ints) : the slot of each cell's tile, -1 if it is not allocated
+                cell_x, cell_y (np arrays of ints) : the position of each cell in its tile
+        """
+        x = np.asarray(x, dtype=np.int64)
+        y = np.asarray(y, dtype=np.int64)
+        tile_x, cell_x = np.divmod(x, self.tile_size)
+        tile_y, cell_y = np.divmod(y, self.tile_size)
+        if allocate:
+            self.allocate(tile_x.reshape(-1), tile_y.reshape(-1))
+        return self.tile_table[tile_x, tile_y], cell_x, cell_y
+
+    def settle(self, x, y, replica=None):
+        if self.decay is None:
+            return
+        slot, cell_x, cell_y = self.locate(x, y)
+        stored = slot >= 0
+        cells = (slot[stored], cell_x[stored], cell_y[stored])
+        elapsed = self.clock - self.lasts[cells]
+        self.tiles[cells] = self.decayed(self.tiles[cells], elapsed)
+        self.lasts[cells] = self.clock
+
+    def materialize(self):
+        if self.decay is None:
+            return
+        live = slice(0, self.allocated)
+        self.tiles[live] = self.decayed(self.tiles[live], self.clock - self.lasts[live])
+        self.lasts[live] = self.clock
+
+    def get(self, x, y, replica=None):
+        return self.gather(np.array([x]), np.array([y]))[0].item()
+
+    def set(self, x, y, value, replica=None):
+        self.scatter(np.array([x]), np.array([y]), value)
+
+    def add(self, x, y, amount, replica=None):
+        self.scatter_add(np.array([x]), np.array([y]), amount)
+
+    def gather(self, x, y, fill=0, replica=None):
+        x = np.asarray(x)
+        y = np.asarray(y)
+        inside = self.contains(x, y)
+        x = np.where(inside, x, 0)
+        y = np.where(inside, y, 0)
+        self.settle(x, y)
+        slot, cell_x, cell_y = self.locate(x, y)
+        if self.allocated == 0:
+            return np.where(inside, np.zeros(x.shape, dtype=self.dtype), fill)
+        stored = self.decode(self.tiles[np.maximum(slot, 0), cell_x, cell_y])
+        return np.where(inside, np.where(slot >= 0, stored, 0), fill)
+
+    def peek(self, x, y, fill=0, replica=None):
+        x = np.asarray(x)
+        y = np.asarray(y)
+        inside = self.contains(x, y)
+        slot, cell_x, cell_y = self.locate(np.where(inside, x, 0), np.where(inside, y, 0))
+        if self.allocated == 0:
+            return np.where(inside, np.zeros(x.shape, dtype=self.dtype), fill)
+        cells = (np.maximum(slot, 0), cell_x, cell_y)
+        stored = self.tiles[cells]
+        if self.decay is not None:
+            stored = self.decayed(stored, self.clock - self.lasts[cells])
+        return np.where(inside, np.where(slot >= 0, self.decode(stored), 0), fill)
+
+    def scatter(self, x, y, values, replica=None):
+        slot, cell_x, cell_y = self.locate(x, y, allocate=True)
+        self.tiles[slot, cell_x, cell_y] = self.encode(values)
+        if self.lasts is not None:
+            self.lasts[slot, cell_x, cell_y] = self.clock
+
+    def scatter_add(self, x, y, amounts, replica=None):
+        self.settle(x, y)
+        slot, cell_x, cell_y = self.locate(x, y, allocate=True)
+        if self.scale is None:
+            np.add.at(self.tiles, (slot, cell_x, cell_y), amounts)
+            return
+        #Summed in real values first, so the cells saturate instead of wrapping around
+        keys = np.ravel_multi_index((slot, cell_x, cell_y), self.tiles.shape)
+        cells, cell_of = np.unique(keys, return_inverse=True)
+        totals = np.bincount(cell_of, weights=np.broadcast_to(amounts, keys.shape), minlength=len(cells))
+        cell_index = np.unravel_index(cells, self.tiles.shape)
+        self.tiles[cell_index] = self.encode(self.decode(self.tiles[cell_index]) + totals)
+
+    def nonzero(self):
+        slot, cell_x, cell_y = np.nonzero(self.tiles[:self.allocated])
+        origins = self.origins[slot] * self.tile_size
+        return origins[:, 0] + cell_x, origins[:, 1] + cell_y
+
+    def occupied_tiles(self, tile_size):
+        if tile_size != self.tile_size:
+            return super().occupied_tiles(tile_size)
+        origins = self.origins[:self.allocated]
+        occupied = np.zeros(self.tile_table.shape, dtype=bool)
+        occupied[origins[:, 0], origins[:, 1]] = self.tiles[:self.allocated].any(axis=(1, 2))
+        return occupied
+
+    def count_nonzero(self):
+        live = slice(0, self.allocated)
+        if self.decay is None:
+            return int(np.count_nonzero(self.tiles[live]))
+        return int(np.count_nonzero(self.decayed(self.tiles[live], self.clock - self.lasts[live])))
+
+    def window(self, min_x, max_x, min_y, max_y):
+        """
+        Returns a copy (not a view) of the cells with min_x <= x < max_x and min_y <= y < max_y
+        """
+        x, y = np.meshgrid(np.arange(min_x, max_x), np.arange(min_y, max_y), indexing='ij')
+        return self.gather(x, y)
+
+    def to_array(self):
+        self.materialize()
+        return self.decode(self.dense_values())
+
+    def dense_values(self):
+        """
+        Returns a dense copy of the stored cell values, which may not be up to date
+        """
+        width, height = self.size
+        tiles_x, tiles_y = self.tile_table.shape
+        dense = np.zeros((tiles_x, self.tile_size, tiles_y, self.tile_size), dtype=self.dtype)
+        origins = self.origins[:self.allocated]
+        dense[origins[:, 0], :, origins[:, 1], :] = self.tiles[:self.allocated]
+        return dense.reshape(tiles_x * self.tile_size, tiles_y * self.tile_size)[:width, :height]
+
+    def state(self):
+        arrays = {
+            'tile_table' : self.tile_table,
+            'tiles' : self.tiles[:self.allocated],
+            'origins' : self.origins[:self.allocated],
+        }
+        if self.lasts is not None:
+            arrays['lasts'] = self.lasts[:self.allocated]
+        return arrays
+
+    def restore(self, arrays):
+        self.tile_table = np.array(arrays['tile_table'])
+        self.tiles = np.array(arrays['tiles'])
+        self.origins = np.array(arrays['origins'])
+        if self.lasts is not None:
+            self.lasts = np.array(arrays['lasts'])
+        self.allocated = len(self.tiles)
+
+    def memory(self):
+        """
+        Returns the number of bytes the allocated tiles take up
+        """
+        return self.tile_table.nbytes + sum(
+            array[:self.allocated].nbytes for array in (self.tiles, self.lasts, self.origins) if array is not None
+        )
+
+
+class SparseLattice(Lattice):
+    """A lattice that only stores its nonzero cells, for food
+    The stored cells are kept as a sorted array of flat cell indexes with a matching
+    array of values, which is a dictionary of cells that can be looked up for many
+    positions at once. Writing a cell that is not stored inserts it, which costs time in
+    proportion to the number of stored cells, so it suits a few food sources that are
+    read and decremented often but rarely added. Cells are never removed, even when they
+    reach 0. A sparse lattice does not decay.
+
+    It supports the cell methods of Lattice for a single grid (no replicas).
+    Attributes:
+    cells : np array of ints
+        the sorted flat indexes of the stored cells
+    amounts : np array
+        the value of each stored cell
+    """
+    dense = False
+
+    def __init__(self, shape, dtype=np.int32, decay=None, decay_rate=1):
+        if decay is not None:
+            raise ValueError("a SparseLattice does not decay")
+        self.size = square(shape)
+        self.cell_dtype = np.dtype(dtype)
+        self.scale = None
+        self.decay = None
+        self.decay_rate = decay_rate
+        self.clock = 0
+        self.last = None
+        self.generation = 0
+        self.tile_generation = None
+        self.tracking_id = None
+        self.cells = np.zeros(0, dtype=np.int64)
+        self.amounts = np.zeros(0, dtype=self.cell_dtype)
+
+    @property
+    def shape(self):
+        return self.size
+
+    @property
+    def dtype(self):
+        return self.cell_dtype
+
+    @property
+    def values(self):
+        return self.to_array()
+
+    def sources(self):
+        """
+        Returns the stored cells as a {(x, y) : value} dict
+        """
+        xs, ys = np.unravel_index(self.cells, self.shape)
+        return {(int(x), int(y)) : amount.item() for x, y, amount in zip(xs, ys, self.amounts)}
+
+    def locate(self, x, y, insert=False):
+        """
+        Returns the position of cells in amounts
+            Parameters:
+                x, y (np arrays of ints) : positions in the lattice
+                insert (bool) : whether to store the cells that are not stored yet
+            Returns
+                position (np array of ints) : where each cell is in amounts
+                stored (np array of bools) : whether each cell is stored
+        """
+        flat = np.ravel_multi_index((np.asarray(x), np.asarray(y)), self.shape)
+        position = np.searchsorted(self.cells, flat)
+        stored = position < len(self.cells)
+        stored[stored] = self.cells[position[stored]] == flat[stored]
+        if insert and not stored.all():
+            new = np.unique(flat[~stored])
+            self.cells = np.insert(self.cells, np.searchsorted(self.cells, new), new)
+            self.amounts = np.insert(self.amounts, np.searchsorted(self.cells, new) - np.arange(len(new)), 0)
+            return self.locate(x, y)
+        return position, stored
+
+    def settle(self, x, y, replica=None):
+        return
+
+    def materialize(self):
+        return
+
+    def get(self, x, y, replica=None):
+        return self.gather(np.array([x]), np.array([y]))[0].item()
+
+    def set(self, x, y, value, replica=None):
+        self.scatter(np.array([x]), np.array([y]), value)
+
+    def add(self, x, y, amount, replica=None):
+        self.scatter_add(np.array([x]), np.array([y]), amount)
+
+    def gather(self, x, y, fill=0, replica=None):
+        x = np.asarray(x)
+        y = np.asarray(y)
+        inside = self.contains(x, y)
+        position, stored = self.locate(np.where(inside, x, 0), np.where(inside, y, 0))
+        if len(self.cells) == 0:
+            return np.where(inside, np.zeros(x.shape, dtype=self.dtype), fill)
+        values = self.amounts[np.minimum(position, len(self.cells) - 1)]
+        return np.where(inside, np.where(stored, values, 0), fill)
+
+    def peek(self, x, y, fill=0, replica=None):
+        #Nothing decays, so reading writes nothing
+        return self.gather(x, y, fill)
+
+    def scatter(self, x, y, values, replica=None):
+        position, _ = self.locate(x, y, insert=True)
+        self.amounts[position] = values
+
+    def scatter_add(self, x, y, amounts, replica=None):
+        position, _ = self.locate(x, y, insert=True)
+        np.add.at(self.amounts, position, amounts)
+
+    def nonzero(self):
+        return np.unravel_index(self.cells[self.amounts != 0], self.shape)
+
+    def count_nonzero(self):
+        return int(np.count_nonzero(self.amounts))
+
+    def window(self, min_x, max_x, min_y, max_y):
+        """
+        Returns a copy (not a view) of the cells with min_x <= x < max_x and min_y <= y < max_y
+        """
+        x, y = np.meshgrid(np.arange(min_x, max_x), np.arange(min_y, max_y), indexing='ij')
+        return self.gather(x, y)
+
+    def to_array(self):
+        dense = np.zeros(self.shape, dtype=self.dtype)
+        dense.reshape(-1)[self.cells] = self.amounts
+        return dense
+
+    def state(self):
+        return {'cells' : self.cells, 'amounts' : self.amounts}
+
+    def restore(self, arrays):
+        self.cells = np.array(arrays['cells'])
+        self.amounts = np.array(arrays['amounts'], dtype=self.dtype)
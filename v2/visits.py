@@ -0,0 +1,238 @@
+import json
+import os
+
+import numpy as np
+
+#One visit: an ant taking one food from a source
+EVENT_DTYPE = np.dtype([('step', np.int64), ('ant', np.int64), ('source', np.int32), ('remaining', np.int32)])
+
+
+def load(path):
+    """
+    Memory-maps a visit log written by a VisitLog
+        Parameters:
+            path (str) : the log (its header is path + '.json')
+        Returns
+            events (np memmap) : one record per visit, in order of step (see EVENT_DTYPE)
+            header (dict) : the food locations of the log, whose positions are the source ids,
+                and the number of steps it covers
+    """
+    with open(path + '.json') as file:
+        header = json.load(file)
+    header['locations'] = [tuple(location) for location in header['locations']]
+    if header['events'] == 0:
+        return np.zeros(0, dtype=EVENT_DTYPE), header
+    return np.memmap(path, dtype=EVENT_DTYPE, mode='r', shape=(header['events'],)), header
+
+
+def visits_per_interval(events, sources, interval=60, steps=None):
+    """
+    Counts the visits to each source in every interval of steps
+        Parameters:
+            events (np structured array) : visit events (see EVENT_DTYPE)
+            sources (int) : the number of sources
+            interval (int) : the number of steps per count
+            steps (int or None) : the length of the run, by default up to the last event
+        Returns
+            visits (np array of ints) : the visits, with shape (intervals, sources)
+    """
+    known = events[events['source'] >= 0]
+    if steps is None:
+        steps = int(known['step'].max()) + 1 if len(known) else 0
+    intervals = -(-steps // interval)
+    cells = (known['step'] // interval) * sources + known['source']
+    return np.bincount(cells, minlength=intervals * sources)[:intervals * sources].reshape(intervals, sources)
+
+
+class SourceIndex():
+    """The source id of every food location, looked up by cell
+    Single cells are looked up in a dict; many cells at once are looked up by binary
+    search in the sorted cell keys, so neither scans the food lattice.
+    Attributes:
+    locations : lst of (x, y)
+        the food locations, whose positions are their source ids
+    ids : dict
+        the source id of each location
+    keys : np array of ints
+        the sorted keys of the locations (see key)
+    """
+    def __init__(self, locations):
+        self.locations = [tuple(int(value) for value in location) for location in locations]
+        self.ids = {location : source for source, location in enumerate(self.locations)}
+        xs, ys = np.array(self.locations, dtype=np.int64).reshape(-1, 2).T
+        keys = self.key(xs, ys)
+        self.order = np.argsort(keys)
+        self.keys = keys[self.order]
+
+    @staticmethod
+    def key(x, y):
+        """
+        Returns a single int per cell
+        """
+        return (np.asarray(x, dtype=np.int64) << 32) + np.asarray(y, dtype=np.int64)
+
+    def source_of(self, x, y):
+        """
+        Returns the source id of one cell, -1 if it is not a food location
+        """
+        return self.ids.get((x, y), -1)
+
+    def lookup(self, x, y):
+        """
+        Returns the source ids of many cells, -1 for cells that are not food locations
+        """
+        keys = self.key(x, y)
+        position = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+        if len(self.keys) == 0:
+            return np.full(keys.shape, -1, dtype=np.int32)
+        return np.where(self.keys[position] == keys, self.order[position], -1).astype(np.int32)
+
+
+class VisitLog():
+    """Every visit to a food source, as it happens
+    While a board runs with a visit log (pass it to Board.run in observers), every ant that
+    takes food adds an event: the step, the ant's id, the source and the food left there.
+    Events are written into a preallocated buffer, which is flushed in one write to an
+    append-only binary file of fixed-size records (see load) whenever it fills up, so
+    logging costs a few array writes per step. Without a path, flushed events are kept in
+    memory. Visit rates can then be counted exactly, at any resolution (see visits_per_interval),
+    instead of from the differences of the food remaining.
+    Attributes:
+    sources : SourceIndex
+        the source id of every food location
+    path : str or None
+        the binary file events are flushed to
+    buffer : np structured array
+        the events not yet flushed
+    totals : np array of ints
+        the visits logged to each source so far
+    """
+    def __init__(self, food_locations, path=None, capacity=4096):
+        """
+            Parameters:
+                food_locations (dict or lst) : the food locations, in source id order
+                path (str or None) : the binary file to flush events to, None to keep them in memory
+                capacity (int) : the number of events buffered between flushes
+        """
+        self.sources = SourceIndex(food_locations)
+        self.path = path
+        self.buffer = np.zeros(capacity, dtype=EVENT_DTYPE)
+        self.buffered = 0
+        self.flushed = 0
+        self.chunks = []
+        self.board = None
+        self.steps = 0
+        self.totals = np.zeros(len(self.sources.locations), dtype=np.int64)
+
+    def start(self, board):
+        """
+        Starts logging the visits of a board. A board resumed from a checkpoint keeps the
+        events logged before the checkpoint and drops any logged after it.
+        """
+        self.board = board
+        board.visit_log = self
+        self.buffered = 0
+        self.steps = board.time
+        self.totals[:] = 0
+        if self.path is None:
+            self.chunks = [chunk[chunk['step'] < board.time] for chunk in self.chunks]
+            self.flushed = sum(len(chunk) for chunk in self.chunks)
+            for chunk in self.chunks:
+                self.count(chunk['source'])
+            return
+        kept = 0
+        if board.time > 0 and os.path.exists(self.path + '.json'):
+            events, _ = load(self.path)
+            kept = int(np.searchsorted(events['step'], board.time))
+            self.count(events['source'][:kept])
+            del events
+        with open(self.path, 'ab') as file:
+            file.truncate(kept * EVENT_DTYPE.itemsize)
+        self.flushed = kept
+        self.write_header()
+
+    def count(self, sources):
+        """
+        Adds visits to the totals of their sources
+        """
+        sources = np.asarray(sources)
+        self.totals += np.bincount(sources[sources >= 0], minlength=len(self.totals))
+
+    def observe(self, board, counts):
+        return
+
+    def record(self, step, ants, xs, ys, remaining):
+        """
+        Adds the visits of many ants at once
+            Parameters:
+                step (int) : the step the visits happened in
+                ants (np array of ints) : the id of each ant
+                xs, ys (np arrays of ints) : the cell each ant took food from
+                remaining (np array of ints) : the food left on each cell after the ant took its food
+        """
+        count = len(ants)
+        if self.buffered + count > len(self.buffer):
+            self.flush()
+        if count > len(self.buffer):
+            self.buffer = np.zeros(count, dtype=EVENT_DTYPE)
+        events = self.buffer[self.buffered:self.buffered + count]
+        events['step'] = step
+        events['ant'] = ants
+        events['source'] = self.sources.lookup(xs, ys)
+        events['remaining'] = remaining
+        self.count(events['source'])
+        self.buffered += count
+
+    def visit(self, step, ant, x, y, remaining):
+        """
+        Adds the visit of a single ant
+        """
+        if self.buffered == len(self.buffer):
+            self.flush()
+        source = self.sources.source_of(x, y)
+        self.buffer[self.buffered] = (step, ant, source, remaining)
+        if source >= 0:
+            self.totals[source] += 1
+        self.buffered += 1
+
+    def flush(self):
+        """
+        Writes the buffered events out in bulk
+        """
+        events = self.buffer[:self.buffered]
+        if self.board is not None:
+            self.steps = self.board.time
+        if self.path is None:
+            self.chunks.append(events.copy())
+        else:
+            with open(self.path, 'ab') as file:
+                file.write(events.tobytes())
+        self.flushed += self.buffered
+        self.buffered = 0
+        if self.path is not None:
+            self.write_header()
+
+    def write_header(self):
+        header = {'locations' : self.sources.locations, 'events' : self.flushed, 'steps' : self.steps}
+        with open(self.path + '.json', 'w') as file:
+            json.dump(header, file)
+
+    def close(self):
+        """
+        Flushes the remaining events and stops logging
+        """
+        self.flush()
+        if self.board is not None:
+            self.board.visit_log = None
+            self.board = None
+
+    def events(self):
+        """
+        Returns every event logged so far, memory-mapped from the file if there is one
+        """
+        self.flush()
+        if self.path is not None:
+            return load(self.path)[0]
+        if not self.chunks:
+            return self.buffer[:0].copy()
+        return np.concatenate(self.chunks)